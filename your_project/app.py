@@ -1,387 +1,220 @@
-from flask import Flask, render_template, redirect, url_for, request, flash
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import (
-    LoginManager,
-    login_user,
-    login_required,
-    logout_user,
-    current_user,
-    UserMixin,
-)
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your_secret_key_here'  # Change in production!
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///checklist_app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
-
-
-# ----- Models -----
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(150), unique=True, nullable=False)
-    password_hash = db.Column(db.String(150), nullable=False)
-    
-    tasks = db.relationship('Task', backref='owner', lazy=True)
-
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-    
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
-
-class Task(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    call_type = db.Column(db.String(50), nullable=False)
-    checklist_type = db.Column(db.String(50), nullable=False)
-    text = db.Column(db.String(250), nullable=False)
-    done = db.Column(db.Boolean, default=False)
-    parent_task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=True)
-    # Relationship for subtasks (if any)
-    subtasks = db.relationship('Task', backref=db.backref('parent', remote_side=[id]), lazy=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-
-# ----- Default Tasks Data -----
-DEFAULT_VOICEMAIL = [
-    {'text': 'Purpose', 'done': False},
-    {'text': 'Call to Action', 'done': False},
-    {'text': 'Timeframe', 'done': False}
-]
-
-DEFAULT_SALES_START = [
-    {'text': 'Rapport Question', 'done': False},
-    {'text': '2nd Open Question', 'done': False},
-    {'text': 'Value Add Item', 'done': False},
-    {'text': 'Great Ask for Sale', 'done': False},
-    {'text': 'Objection', 'done': False},
-    {'text': 'Implement Sale Now or "How & When"', 'done': False},
-    {'text': 'Anything Else they want to Ask?', 'done': False},
-    {'text': 'Summarise Call', 'done': False},
-    {'text': 'Book Followup or Next Steps', 'done': False}
-]
-
-DEFAULT_INTRODUCTION_START = [
-    {'text': 'Repport Question', 'done': False},
-    {'text': '2nd Open Question', 'done': False},
-    {'text': 'Value Add Item', 'done': False},
-    {'text': 'Learn their Current Situation', 'done': False},
-    {'text': 'Learn their Desired Situation', 'done': False},
-    {'text': 'Identify their Gap (& Problem Solve or Connect to Us)', 'done': False},
-    {'text': 'Additional Support Required?', 'done': False},
-    {'text': 'Anything Else they want to Ask?', 'done': False},
-    {'text': 'Summarise Call', 'done': False},
-    {'text': 'Book Next Call or Followup Steps', 'done': False}
-]
-
-DEFAULT_FOLLOWUP_START = [
-    {'text': 'Rapport Question', 'done': False},
-    {'text': '2nd Open Question', 'done': False},
-    {'text': 'Value Add Item', 'done': False},
-    {'text': 'Extra Support Required?', 'done': False},
-    {'text': 'Anything they want to Ask?', 'done': False},
-    {'text': 'Summarise Call', 'done': False},
-    {'text': 'Book Followup or Next Steps', 'done': False}
-]
-
-DEFAULT_AT_RISK_START = [
-    {'text': 'Rapport Question', 'done': False},
-    {'text': '2nd Open Question', 'done': False},
-    {'text': 'Uncover the Problem', 'done': False},
-    {'text': 'Problem Solve', 'done': False},
-    {'text': 'Objection', 'done': False},
-    {'text': 'Connect course to Motivation/Their Gap', 'done': False},
-    {'text': 'Great Ask for Sale', 'done': False},
-    {'text': 'Additional Support Required', 'done': False},
-    {'text': 'Summarise Call', 'done': False},
-    {'text': 'Book Followup or Next Steps', 'done': False}
-]
-
-DEFAULT_SUPPORT_START = [
-    {'text': 'Rapport Question', 'done': False},
-    {'text': '2nd Open Question', 'done': False},
-    {'text': 'Followup on Support Given Previously', 'done': False},
-    {'text': 'Value Add Item', 'done': False},
-    {'text': 'Objection', 'done': False},
-    {'text': 'Further Support Required?', 'done': False},
-    {'text': 'Anything Else they want to Ask?', 'done': False},
-    {'text': 'Summarise Call', 'done': False},
-    {'text': 'Book Followup or Next Steps', 'done': False}
-]
-
-DEFAULT_TASKS = {
-    ("sales", "voicemail"): DEFAULT_VOICEMAIL,
-    ("sales", "start call"): DEFAULT_SALES_START,
-    ("reengagement", "voicemail"): DEFAULT_VOICEMAIL,
-    ("reengagement", "start call"): DEFAULT_SALES_START,
-    ("followup", "voicemail"): DEFAULT_VOICEMAIL,
-    ("followup", "start call"): DEFAULT_FOLLOWUP_START,
-    ("at-risk", "voicemail"): DEFAULT_VOICEMAIL,
-    ("at-risk", "start call"): DEFAULT_AT_RISK_START,
-    ("support", "voicemail"): DEFAULT_VOICEMAIL,
-    ("support", "start call"): DEFAULT_SUPPORT_START,
-    ("introduction", "voicemail"): DEFAULT_VOICEMAIL,
-    ("introduction", "start call"): DEFAULT_INTRODUCTION_START,
-}
-
-DEFAULT_OBJECTION_SUBTASKS = [
-    {'text': 'Listen & Acknowledge', 'done': False},
-    {'text': 'Clarify & Question', 'done': False},
-    {'text': 'Address the Objection', 'done': False},
-    {'text': 'Confirm & Close', 'done': False}
-]
-
-
-# ----- Helper to Prepopulate Tasks -----
-def populate_default_tasks(user, call_type, checklist_type):
-    # Only populate if the user has no tasks (ignoring subtasks) for this combo
-    existing = Task.query.filter_by(
-        user_id=user.id, call_type=call_type, checklist_type=checklist_type, parent_task_id=None
-    ).first()
-    if existing is None:
-        defaults = DEFAULT_TASKS.get((call_type, checklist_type), [])
-        for task_def in defaults:
-            new_task = Task(
-                user_id=user.id,
-                call_type=call_type,
-                checklist_type=checklist_type,
-                text=task_def['text'],
-                done=task_def['done']
-            )
-            db.session.add(new_task)
-        db.session.commit()
-
-    # For Sales/Support Start Call, add the objection task and its sub‑checklist
-    if checklist_type.lower() == "start call" and call_type.lower() in ["sales", "support"]:
-        # Create the main objection task
-        objection_task = Task(
-            user_id=user.id,
-            call_type=call_type,
-            checklist_type=checklist_type,
-            text="Objection",
-            done=False
-        )
-        db.session.add(objection_task)
-        db.session.flush()  # flush so we get objection_task.id for the subtasks
-        
-        # Create the objection sub‑checklist using the items from example.py
-        objection_subtasks = [
-            Task(user_id=user.id, call_type=call_type, checklist_type=checklist_type, 
-                 text="Listen & Acknowledge", done=False, parent_task_id=objection_task.id),
-            Task(user_id=user.id, call_type=call_type, checklist_type=checklist_type, 
-                 text="Clarify & Question", done=False, parent_task_id=objection_task.id),
-            Task(user_id=user.id, call_type=call_type, checklist_type=checklist_type, 
-                 text="Address the Objection", done=False, parent_task_id=objection_task.id),
-            Task(user_id=user.id, call_type=call_type, checklist_type=checklist_type, 
-                 text="Confirm & Close", done=False, parent_task_id=objection_task.id)
-        ]
-        db.session.add_all(objection_subtasks)
-        db.session.commit()
-
-
-# ----- Routes -----
-@app.route("/")
-@login_required
-def home():
-    call_types = ["sales", "reengagement", "followup", "at-risk", "support", "introduction"]
-    return render_template("home.html", call_types=call_types)
-
-
-@app.route("/call/<call_type>")
-@login_required
-def call_sub_menu(call_type):
-    checklist_options = ["voicemail", "start call"]
-    return render_template("call_sub_menu.html", call_type=call_type, checklist_options=checklist_options)
-
-
-@app.route("/checklist/<call_type>/<checklist_type>")
-@login_required
-def checklist(call_type, checklist_type):
-    populate_default_tasks(current_user, call_type, checklist_type)
-    tasks = Task.query.filter_by(
-        user_id=current_user.id,
-        call_type=call_type,
-        checklist_type=checklist_type,
-        parent_task_id=None
-    ).order_by(Task.id).all()
-    return render_template("checklist.html", call_type=call_type, checklist_type=checklist_type, tasks=tasks)
-
-
-@app.route("/toggle_task/<int:task_id>")
-@login_required
-def toggle_task(task_id):
-    task = Task.query.get_or_404(task_id)
-    if task.owner.id != current_user.id:
-        flash("Unauthorized", "danger")
-        return redirect(url_for("home"))
-    # For Objection tasks in Sales or Support (Start Call), initialize sub-checklist if needed.
-    if task.text == "Objection" and task.call_type in ["sales", "support"] and task.checklist_type == "start call":
-        if not task.subtasks:
-            for sub in DEFAULT_OBJECTION_SUBTASKS:
-                subtask = Task(
-                    user_id=current_user.id,
-                    call_type=task.call_type,
-                    checklist_type=task.checklist_type,
-                    text=sub['text'],
-                    done=sub['done'],
-                    parent_task_id=task.id
-                )
-                db.session.add(subtask)
-            db.session.commit()
-            flash("Objection sub-checklist initialized", "info")
-            return redirect(url_for("checklist", call_type=task.call_type, checklist_type=task.checklist_type))
-    else:
-        task.done = not task.done
-        db.session.commit()
-    return redirect(url_for("checklist", call_type=task.call_type, checklist_type=task.checklist_type))
-
-
-@app.route("/toggle_subtask/<int:subtask_id>")
-@login_required
-def toggle_subtask(subtask_id):
-    subtask = Task.query.get_or_404(subtask_id)
-    if subtask.owner.id != current_user.id:
-        flash("Unauthorized", "danger")
-        return redirect(url_for("home"))
-    subtask.done = not subtask.done
-    db.session.commit()
-    parent_task = Task.query.get(subtask.parent_task_id)
-    return redirect(url_for("checklist", call_type=parent_task.call_type, checklist_type=parent_task.checklist_type))
-
-
-@app.route("/add_task/<call_type>/<checklist_type>", methods=["POST"])
-@login_required
-def add_task(call_type, checklist_type):
-    text = request.form.get("task_text", "").strip()
-    if not text:
-        flash("Task cannot be empty", "warning")
-    else:
-        new_task = Task(
-            user_id=current_user.id,
-            call_type=call_type,
-            checklist_type=checklist_type,
-            text=text,
-            done=False
-        )
-        db.session.add(new_task)
-        db.session.commit()
-        flash("Task added", "success")
-    return redirect(url_for("checklist", call_type=call_type, checklist_type=checklist_type))
-
-
-@app.route("/delete_task/<int:task_id>")
-@login_required
-def delete_task(task_id):
-    task = Task.query.get_or_404(task_id)
-    if task.owner.id != current_user.id:
-        flash("Unauthorized", "danger")
-        return redirect(url_for("home"))
-    if task.subtasks:
-        for sub in task.subtasks:
-            db.session.delete(sub)
-    db.session.delete(task)
-    db.session.commit()
-    flash("Task deleted", "info")
-    return redirect(url_for("checklist", call_type=task.call_type, checklist_type=task.checklist_type))
-
-
-@app.route("/edit_task/<int:task_id>", methods=["GET", "POST"])
-@login_required
-def edit_task(task_id):
-    task = Task.query.get_or_404(task_id)
-    if task.owner.id != current_user.id:
-        flash("Unauthorized", "danger")
-        return redirect(url_for("home"))
-    if request.method == "POST":
-        new_text = request.form.get("task_text", "").strip()
-        if new_text:
-            task.text = new_text
-            db.session.commit()
-            flash("Task updated", "success")
-            return redirect(url_for("checklist", call_type=task.call_type, checklist_type=task.checklist_type))
-        else:
-            flash("Task cannot be empty", "warning")
-    return render_template("edit_task.html", task=task)
-
-
-@app.route('/new_call/<call_type>/<checklist_type>', methods=['GET'])
-@login_required
-def new_call(call_type, checklist_type):
-    # Delete all tasks for the current user with the provided call type and checklist type.
-    tasks = Task.query.filter_by(user_id=current_user.id, call_type=call_type, checklist_type=checklist_type).all()
-    for task in tasks:
-        db.session.delete(task)
-    db.session.commit()
-
-    # Re-populate the default tasks (which includes the Objection task and its sub‑checklist if applicable)
-    populate_default_tasks(current_user, call_type, checklist_type)
-    
-    flash("Checklist has been refreshed for a new call.", "success")
-    return redirect(url_for('checklist', call_type=call_type, checklist_type=checklist_type))
-
-
-# ----- Authentication Routes -----
-@app.route("/register", methods=["GET", "POST"])
-def register():
-    if current_user.is_authenticated:
-        return redirect(url_for("home"))
-    if request.method == "POST":
-        username = request.form.get("username", "").strip()
-        password = request.form.get("password", "").strip()
-        if not username or not password:
-            flash("Username and password required", "warning")
-            return redirect(url_for("register"))
-        existing = User.query.filter_by(username=username).first()
-        if existing:
-            flash("Username already taken", "warning")
-            return redirect(url_for("register"))
-        new_user = User(username=username)
-        new_user.set_password(password)
-        db.session.add(new_user)
-        db.session.commit()
-        flash("Registration successful. Please log in.", "success")
-        return redirect(url_for("login"))
-    return render_template("register.html")
-
-
-@app.route("/login", methods=["GET", "POST"])
-def login():
-    if current_user.is_authenticated:
-        return redirect(url_for("home"))
-    if request.method == "POST":
-        username = request.form.get("username", "").strip()
-        password = request.form.get("password", "").strip()
-        user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
-            login_user(user)
-            flash("Logged in successfully", "success")
-            return redirect(url_for("home"))
-        else:
-            flash("Invalid username or password", "danger")
-    return render_template("login.html")
-
-
-@app.route("/logout")
-@login_required
-def logout():
-    logout_user()
-    flash("You have been logged out", "info")
-    return redirect(url_for("login"))
+from flask import Flask, current_app, g, request
+from flask.cli import with_appcontext
+from flask.sessions import SecureCookieSessionInterface
+import click
+import functools
+import hashlib
+import os
+
+import database
+from extensions import db, login_manager
+
+
+def default_config():
+    """Settings read from the environment when an app is created."""
+    uri = os.environ.get('DATABASE_URL', database.DEFAULT_DATABASE_URI)
+    return {
+        'SECRET_KEY': 'your_secret_key_here',  # Change in production!
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Identity cache used by load_user (seconds / entries)
+        'USER_CACHE_TTL': int(os.environ.get('USER_CACHE_TTL', 60)),
+        'USER_CACHE_SIZE': int(os.environ.get('USER_CACHE_SIZE', 1024)),
+        # Rendered checklist fragments: in-process byte budget, or a shared Redis URL
+        'FRAGMENT_CACHE_BYTES': int(os.environ.get('FRAGMENT_CACHE_BYTES', 16 * 1024 * 1024)),
+        'FRAGMENT_CACHE_URL': os.environ.get('FRAGMENT_CACHE_URL'),
+        # Browser/CDN lifetime of the home and call menu shells (seconds)
+        'MENU_CACHE_SECONDS': int(os.environ.get('MENU_CACHE_SECONDS', 3600)),
+        # Password hashing policy (werkzeug method with cost) and its pool;
+        # see passwords.py. Workers default to the CPU count, 0 hashes inline.
+        'PASSWORD_HASH_METHOD': os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        'PASSWORD_HASH_WORKERS': int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)),
+        'PASSWORD_HASH_QUEUE': int(os.environ.get('PASSWORD_HASH_QUEUE', 64)),
+        # Request threads per process (asgi.py sets it from ASGI_THREADS;
+        # 0: unknown). Hashing may hold at most half of them.
+        'SERVER_THREADS': int(os.environ.get('SERVER_THREADS', 0)),
+        # Live updates (see live.py): Redis URL for several processes, how
+        # long to gather a burst of changes, keepalive and stream lifetime
+        'PUBSUB_URL': os.environ.get('PUBSUB_URL'),
+        'LIVE_COALESCE_SECONDS': float(os.environ.get('LIVE_COALESCE_SECONDS', 0.25)),
+        'LIVE_HEARTBEAT_SECONDS': float(os.environ.get('LIVE_HEARTBEAT_SECONDS', 15)),
+        'LIVE_STREAM_SECONDS': float(os.environ.get('LIVE_STREAM_SECONDS', 300)),
+        # Call event log (see events.py): batch size and flush interval
+        'EVENT_BATCH_SIZE': int(os.environ.get('EVENT_BATCH_SIZE', 500)),
+        'EVENT_FLUSH_SECONDS': float(os.environ.get('EVENT_FLUSH_SECONDS', 2)),
+        # Task compaction (see compaction.py): retention before archiving,
+        # rows per write transaction and the pause between transactions
+        'COMPACTION_RETENTION_DAYS': int(os.environ.get('COMPACTION_RETENTION_DAYS', 365)),
+        'COMPACTION_BATCH_SIZE': int(os.environ.get('COMPACTION_BATCH_SIZE', 500)),
+        'COMPACTION_PAUSE_SECONDS': float(os.environ.get('COMPACTION_PAUSE_SECONDS', 0.05)),
+        # Request and SQL metrics at /metrics (see metrics.py): on/off,
+        # the statement time that gets logged, and a scrape token
+        'METRICS_ENABLED': os.environ.get('METRICS_ENABLED', '1') == '1',
+        'SLOW_QUERY_MS': float(os.environ.get('SLOW_QUERY_MS', 200)),
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN'),
+        # Apply pending schema migrations in create_app; turn off when a
+        # release step runs `flask --app app upgrade-db` instead
+        'UPGRADE_DB': os.environ.get('UPGRADE_DB', '1') == '1',
+    }
+
+
+def create_app(config=None):
+    """Build a checklist app; ``config`` overrides the environment defaults.
+
+    This is the entry point for production servers, e.g.
+    ``uvicorn asgi:application`` (see asgi.py) or, with a thread per open
+    checklist page, ``gunicorn -k gthread --threads 32 'app:create_app()'``.
+    The blueprints and caches are imported here rather than at module
+    level, so importing this module stays cheap.
+    """
+    from cache import TTLCache, make_fragment_cache
+    from passwords import PasswordHasher
+    import auth
+    import checklists
+    import events
+    import live
+    import metrics
+    import migrations
+    import supervisor
+
+    app = Flask(__name__)
+    app.session_interface = SessionInterface()
+    app.config.update(default_config())
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          database.engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('RENDER_VERSION', render_digest(app))
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    app.extensions['user_cache'] = TTLCache(maxsize=app.config['USER_CACHE_SIZE'],
+                                            ttl=app.config['USER_CACHE_TTL'])
+    app.extensions['fragment_cache'] = make_fragment_cache(app.config['FRAGMENT_CACHE_URL'],
+                                                           app.config['FRAGMENT_CACHE_BYTES'])
+    app.extensions['password_hasher'] = PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'], workers=app.config['PASSWORD_HASH_WORKERS'],
+        queue=app.config['PASSWORD_HASH_QUEUE'], threads=app.config['SERVER_THREADS'])
+    # Rendered menu shells: key -> (html, etag)
+    app.extensions['menu_shells'] = {}
+
+    # First, so the SQL of the other after_request hooks is counted
+    metrics.init_app(app)
+    live.init_app(app)
+    events.init_app(app)
+    app.register_blueprint(auth.bp)
+    app.register_blueprint(checklists.bp)
+    app.register_blueprint(supervisor.bp)
+    app.url_defaults(hashed_static_url)
+    app.after_request(cache_hashed_static)
+    app.cli.add_command(upgrade_db_command)
+    app.cli.add_command(compact_command)
+
+    if app.config['UPGRADE_DB']:
+        with app.app_context():
+            migrations.upgrade(db)
+    return app
+
+
+def render_digest(app):
+    """Short hash of the Jinja templates and static assets, so cached pages change on deploy.
+
+    Pages link assets by content hash (see hashed_static_url), so a page
+    cached before an asset changed would still load the old one.
+    """
+    digest = hashlib.sha1()
+    folder = os.path.join(app.root_path, app.template_folder)
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            digest.update(name.encode() + f.read())
+    for root, _dirs, files in sorted(os.walk(app.static_folder)):
+        for name in sorted(files):
+            filename = os.path.relpath(os.path.join(root, name), app.static_folder)
+            digest.update(filename.encode() + static_file_hash(app.static_folder, filename).encode())
+    return digest.hexdigest()[:12]
+
+
+class SessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions that stay out of responses shared by all users.
+
+    Flask-Login reads the session on every request, which adds "Vary:
+    Cookie" and keeps shared caches from storing a page. Views that serve
+    the same page to everyone (see checklists.static_shell) set
+    g.shared_response, and their responses carry no session.
+    """
+
+    def save_session(self, app, session, response):
+        if not g.get('shared_response'):
+            return super().save_session(app, session, response)
+        if 'Set-Cookie' in response.headers:
+            # Something set a cookie anyway: keep the page out of shared caches
+            response.cache_control.public = None
+            response.cache_control.private = True
+
+
+# ----- Static Assets -----
+@functools.lru_cache(maxsize=None)
+def static_file_hash(static_folder, filename):
+    path = os.path.join(static_folder, filename)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()[:10]
+
+
+def hashed_static_url(endpoint, values):
+    # url_for('static', ...) gets a content hash, so assets can be cached forever
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        file_hash = static_file_hash(current_app.static_folder, values['filename'])
+        if file_hash:
+            values['v'] = file_hash
+
+
+def cache_hashed_static(response):
+    if request.endpoint == 'static' and 'v' in request.args and response.status_code == 200:
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+@click.command("upgrade-db")
+@with_appcontext
+def upgrade_db_command():
+    """Create missing tables and apply pending schema migrations."""
+    import migrations
+    version = migrations.upgrade(db)
+    print(f"Database schema at version {version}")
+
+
+@click.command("compact")
+@click.option("--retention-days", type=int, help="archive tasks older than this (default COMPACTION_RETENTION_DAYS)")
+@click.option("--batch-size", type=int, help="rows per transaction (default COMPACTION_BATCH_SIZE)")
+@click.option("--pause", type=float, help="seconds between transactions (default COMPACTION_PAUSE_SECONDS)")
+@click.option("--max-seconds", type=float, help="stop after this long; the next run resumes")
+@click.option("--enable-incremental-vacuum", is_flag=True,
+              help="switch SQLite to auto_vacuum=INCREMENTAL first (one full VACUUM, locks the database)")
+@with_appcontext
+def compact_command(retention_days, batch_size, pause, max_seconds, enable_incremental_vacuum):
+    """Deduplicate, prune and archive old tasks in short batches."""
+    import compaction
+    config = current_app.config
+    if enable_incremental_vacuum:
+        compaction.enable_incremental_vacuum()
+    compactor = compaction.Compactor(
+        retention_days=config['COMPACTION_RETENTION_DAYS'] if retention_days is None else retention_days,
+        batch_size=batch_size or config['COMPACTION_BATCH_SIZE'],
+        pause=config['COMPACTION_PAUSE_SECONDS'] if pause is None else pause,
+        max_seconds=max_seconds,
+    )
+    for name, count in compactor.run().items():
+        print(f"{name}: {count}")
+    if compactor.out_of_time():
+        print("Stopped at --max-seconds; run again to continue")
 
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
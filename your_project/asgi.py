@@ -0,0 +1,41 @@
+"""
+ASGI entry point for the checklist app.
+
+    uvicorn asgi:application --workers 4
+
+Needs the optional ``a2wsgi`` package and an ASGI server such as uvicorn.
+The Flask views stay synchronous. Each request runs on one of the
+adapter's worker threads, so the blocking database reads on the
+checklist page never stall the event loop. One process serves up to
+ASGI_THREADS requests at once. Live update streams are the exception:
+they are sent from the event loop (see live.asgi_app), so open checklist
+pages don't take up those threads.
+
+Scaling:
+
+    --workers        one process per CPU core. SQLite serialises writers
+                     (see database.py), so more processes mainly add read
+                     throughput; on PostgreSQL use 2 x cores.
+    ASGI_THREADS     threads per worker process (default 10). On server
+                     databases keep workers x ASGI_THREADS at or below
+                     DB_POOL_SIZE + DB_MAX_OVERFLOW per process.
+                     Logins hash passwords on at most half of these
+                     threads and answer 503 beyond that (see passwords.py).
+
+Each worker applies pending schema migrations as it starts (see
+migrations.py); to upgrade once in a release step instead, run
+``flask --app app upgrade-db`` and start the workers with UPGRADE_DB=0.
+
+The same app runs under a WSGI server with threaded workers, e.g.
+``gunicorn -k gthread --threads 32 'app:create_app()'``. There every open
+checklist page holds a thread for its live update stream, so give the
+workers more threads in total than agents keep checklists open, and set
+SERVER_THREADS to the thread count.
+"""
+import os
+
+from app import create_app
+from live import asgi_app
+
+threads = int(os.environ.get('ASGI_THREADS', 10))
+application = asgi_app(create_app({'SERVER_THREADS': threads}), threads=threads)
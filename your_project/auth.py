@@ -0,0 +1,117 @@
+"""
+Registration, login and logout.
+"""
+from flask import Blueprint, current_app, render_template, redirect, url_for, request, flash
+from flask_login import login_user, login_required, logout_user, current_user
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db, login_manager, serialized_transaction
+from models import User, CachedUser
+from passwords import PasswordPoolBusy
+
+bp = Blueprint('auth', __name__)
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    identity = current_app.extensions['user_cache'].get(user_id)
+    if identity is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = CachedUser(user.id, user.username, user.is_supervisor)
+        current_app.extensions['user_cache'].set(user_id, identity)
+    return identity
+
+
+@bp.route("/register", methods=["GET", "POST"])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for("checklists.home"))
+    if request.method == "POST":
+        username = request.form.get("username", "").strip()
+        password = request.form.get("password", "").strip()
+        if not username or not password:
+            flash("Username and password required", "warning")
+            return redirect(url_for("auth.register"))
+        if User.query.filter_by(username=username).first():
+            return username_taken()
+        # Hash before taking the write lock, so other writers don't wait on
+        # it, and release the connection meanwhile, as login does
+        db.session.rollback()
+        try:
+            pwhash = current_app.extensions['password_hasher'].hash(password)
+        except PasswordPoolBusy:
+            return hashing_busy("register.html")
+        with serialized_transaction():
+            # The name may have been taken while the hash ran
+            if User.query.filter_by(username=username).first():
+                return username_taken()
+            db.session.add(User(username=username, password_hash=pwhash))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                return username_taken()
+        flash("Registration successful. Please log in.", "success")
+        return redirect(url_for("auth.login"))
+    return render_template("register.html")
+
+
+@bp.route("/login", methods=["GET", "POST"])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for("checklists.home"))
+    if request.method == "POST":
+        username = request.form.get("username", "").strip()
+        password = request.form.get("password", "").strip()
+        user = User.query.filter_by(username=username).first()
+        identity = CachedUser(user.id, user.username, user.is_supervisor) if user else None
+        pwhash = user.password_hash if user else None
+        # Release the connection while the hash runs on the password pool
+        db.session.rollback()
+        hasher = current_app.extensions['password_hasher']
+        try:
+            if identity and hasher.verify(pwhash, password):
+                if hasher.needs_rehash(pwhash):
+                    rehash_password(identity.id, pwhash, hasher.hash(password))
+                current_app.extensions['user_cache'].set(identity.id, identity)
+                login_user(identity)
+                flash("Logged in successfully", "success")
+                return redirect(url_for("checklists.home"))
+        except PasswordPoolBusy:
+            return hashing_busy("login.html")
+        flash("Invalid username or password", "danger")
+    return render_template("login.html")
+
+
+def username_taken():
+    flash("Username already taken", "warning")
+    return redirect(url_for("auth.register"))
+
+
+def rehash_password(user_id, old_hash, new_hash):
+    """Store a hash made under the current policy, unless the password changed meanwhile."""
+    with serialized_transaction():
+        db.session.execute(db.update(User).where(User.id == user_id, User.password_hash == old_hash).values(
+            password_hash=new_hash
+        ))
+        db.session.commit()
+
+
+def hashing_busy(template):
+    flash("Too many sign-ins at once. Please try again in a moment.", "warning")
+    response = current_app.make_response((render_template(template), 503))
+    response.headers['Retry-After'] = '2'
+    return response
+
+
+@bp.route("/logout")
+@login_required
+def logout():
+    current_app.extensions['user_cache'].invalidate(current_user.id)
+    logout_user()
+    flash("You have been logged out", "info")
+    return redirect(url_for("auth.login"))
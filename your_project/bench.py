@@ -0,0 +1,721 @@
+"""
+Benchmarks for the checklist app.
+
+Run from this directory, e.g.:
+
+    python bench.py provision --users 200
+    python bench.py concurrency --processes 4 --threads 4 --seconds 5
+    python bench.py serve --workers 2 --threads 16 --seconds 10
+    python bench.py startup --runs 20 --max-ms 1500
+    python bench.py login --users 300 --threads 32
+    python bench.py delete --subtasks 5000 --runs 5
+    python bench.py replay --users 20 --calls 5 --threads 4 --transport http --baseline baselines/replay.json
+
+Every benchmark runs against a throwaway SQLite database, so it never
+touches instance/checklist_app.db.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def _setup_database(config=None):
+    path = os.path.join(tempfile.mkdtemp(prefix="checklist-bench-"), "bench.db")
+    # Exported so servers started by a benchmark use the same database
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    from app import create_app
+    return create_app(config)
+
+
+def _create_users(count):
+    from extensions import db
+    from models import User
+    users = [User(username=f"agent{i}", password_hash="x") for i in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+def _percentile(sorted_timings, fraction):
+    return sorted_timings[min(len(sorted_timings) - 1, int(len(sorted_timings) * fraction))]
+
+
+def _report(name, timings):
+    timings = sorted(timings)
+    print(f"{name:<28} n={len(timings):<6} mean={statistics.mean(timings) * 1000:.3f}ms "
+          f"p50={statistics.median(timings) * 1000:.3f}ms p95={_percentile(timings, 0.95) * 1000:.3f}ms")
+
+
+# ----- Benchmarks -----
+def bench_provision(args):
+    """Time checklist setup: shared template on first use, then one session per agent."""
+    from defaults import DEFAULT_TASKS
+    from extensions import db
+    from models import Task, TemplateItem, CallSession
+    from services import provision_template, start_call_session
+    app = _setup_database()
+    with app.app_context():
+        user_ids = _create_users(args.users)
+        for label in ("setup (first call)", "setup (next call)"):
+            timings = []
+            for user_id in user_ids:
+                for call_type, checklist_type in DEFAULT_TASKS:
+                    start = time.perf_counter()
+                    template = provision_template(call_type, checklist_type)
+                    start_call_session(user_id, template)
+                    db.session.commit()
+                    timings.append(time.perf_counter() - start)
+            _report(label, timings)
+        print(f"template items: {TemplateItem.query.count()}, "
+              f"call sessions: {CallSession.query.count()}, task rows: {Task.query.count()}")
+
+
+def _task_tree(user_id, session_id, size):
+    """Insert a task with ``size`` subtasks, in two levels; returns the root's id."""
+    from extensions import db
+    from models import Task
+    fields = dict(user_id=user_id, call_type="sales", checklist_type="start call", session_id=session_id)
+    root = Task(text="Objection", **fields)
+    db.session.add(root)
+    db.session.flush()
+    children = [Task(text=f"subtask {i}", parent_task_id=root.id, **fields) for i in range(max(1, size // 10))]
+    db.session.add_all(children)
+    db.session.flush()
+    db.session.add_all(Task(text=f"detail {i}", parent_task_id=children[i % len(children)].id, **fields)
+                       for i in range(size - len(children)))
+    db.session.commit()
+    return root.id
+
+
+def _orm_delete(task):
+    # The previous delete_custom_task: load every subtask and delete it in Python
+    from extensions import db
+    for sub in task.subtasks:
+        _orm_delete(sub)
+    db.session.delete(task)
+
+
+def bench_delete(args):
+    """Time deleting a task tree: ORM object by object, then one DELETE with ON DELETE CASCADE."""
+    from extensions import db
+    from models import Task
+    from services import delete_custom_task, provision_template, start_call_session
+    app = _setup_database()
+    with app.app_context():
+        user_id = _create_users(1)[0]
+        session_id = start_call_session(user_id, provision_template("sales", "start call")).id
+        db.session.commit()
+        # Write the call_started event now, not in the middle of a timed delete
+        app.extensions["event_writer"].flush()
+        size = 10
+        while size <= args.subtasks:
+            for label, delete in (("orm", _orm_delete), ("cascade", delete_custom_task)):
+                timings = []
+                for _run in range(args.runs):
+                    root = db.session.get(Task, _task_tree(user_id, session_id, size))
+                    start = time.perf_counter()
+                    delete(root)
+                    db.session.commit()
+                    timings.append(time.perf_counter() - start)
+                    db.session.expunge_all()
+                _report(f"{label} ({size} subtasks)", timings)
+            size *= 10
+        print(f"task rows left: {Task.query.count()}")
+
+
+def _concurrency_setup(path, tuning, users):
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    os.environ["SQLITE_TUNING"] = tuning
+    from app import create_app
+    from extensions import db
+    from services import provision_template, start_call_session
+    with create_app().app_context():
+        user_ids = _create_users(users)
+        template = provision_template("sales", "start call")
+        for user_id in user_ids:
+            start_call_session(user_id, template)
+        db.session.commit()
+        item_ids = [item.id for item in template.items]
+    return user_ids, item_ids
+
+
+def _concurrency_worker(path, tuning, user_ids, item_ids, seconds, threads):
+    os.environ["DATABASE_URL"] = "sqlite:///" + path
+    os.environ["SQLITE_TUNING"] = tuning
+    from sqlalchemy.exc import OperationalError
+    from app import create_app
+    app = create_app({"PROPAGATE_EXCEPTIONS": True})
+    counts = {"ops": 0, "locked": 0, "errors": 0}
+    counts_lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def agent(user_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+        ops = locked = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                # Half writes, half reads of the checklist page
+                if random.random() < 0.5:
+                    response = client.post(f"/api/items/{random.choice(item_ids)}/toggle")
+                else:
+                    response = client.get("/checklist/sales/start call")
+                if response.status_code == 200:
+                    ops += 1
+                else:
+                    errors += 1
+            except OperationalError as exc:
+                if "locked" in str(exc):
+                    locked += 1
+                else:
+                    errors += 1
+        with counts_lock:
+            counts["ops"] += ops
+            counts["locked"] += locked
+            counts["errors"] += errors
+
+    agents = [threading.Thread(target=agent, args=(user_id,)) for user_id in user_ids[:threads]]
+    for thread in agents:
+        thread.start()
+    for thread in agents:
+        thread.join()
+    return counts
+
+
+def bench_concurrency(args):
+    """Toggle and read checklists from several processes at once, with and without SQLite tuning."""
+    # Each worker imports the app afresh, so the engine settings come from its environment
+    ctx = multiprocessing.get_context("spawn")
+    agents = args.processes * args.threads
+    for label, tuning in (("sqlite defaults", "0"), ("sqlite tuned", "1")):
+        path = os.path.join(tempfile.mkdtemp(prefix="checklist-bench-"), "bench.db")
+        with ctx.Pool(1) as pool:
+            user_ids, item_ids = pool.apply(_concurrency_setup, (path, tuning, agents))
+        jobs = [(path, tuning, user_ids[i * args.threads:(i + 1) * args.threads], item_ids,
+                 args.seconds, args.threads) for i in range(args.processes)]
+        with ctx.Pool(args.processes) as pool:
+            results = pool.starmap(_concurrency_worker, jobs)
+        ops = sum(result["ops"] for result in results)
+        locked = sum(result["locked"] for result in results)
+        errors = sum(result["errors"] for result in results)
+        print(f"{label:<28} agents={agents:<4} ops/s={ops / args.seconds:.1f} "
+              f"database-locked={locked} other-errors={errors}")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            urllib.request.urlopen(url + "/login", timeout=1).read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _login(url, username, password):
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args):
+            return None
+
+    opener = urllib.request.build_opener(NoRedirect)
+    data = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    try:
+        opener.open(url + "/login", data)
+    except urllib.error.HTTPError as response:
+        return response.headers["Set-Cookie"].split(";", 1)[0]
+    raise RuntimeError("login did not redirect")
+
+
+def _load(url, cookie, threads, seconds):
+    counts = {"ok": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    page = url + "/checklist/sales/" + urllib.parse.quote("start call")
+
+    def client():
+        ok = errors = 0
+        while time.perf_counter() < deadline:
+            request = urllib.request.Request(page, headers={"Cookie": cookie})
+            try:
+                urllib.request.urlopen(request, timeout=10).read()
+                ok += 1
+            except OSError:
+                errors += 1
+        with lock:
+            counts["ok"] += ok
+            counts["errors"] += errors
+
+    clients = [threading.Thread(target=client) for _ in range(threads)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return counts
+
+
+def bench_serve(args):
+    """Load-test the checklist page through the dev server, gunicorn and uvicorn (ASGI)."""
+    from extensions import db
+    from models import User
+    app = _setup_database()
+    with app.app_context():
+        user = User(username="agent")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+    servers = [
+        ("flask dev server", None,
+         [sys.executable, "-c", "import sys, app; app.create_app().run(port=int(sys.argv[1]))", "{port}"]),
+        (f"gunicorn x{args.workers}", "gunicorn",
+         [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-b", "127.0.0.1:{port}",
+          "--log-level", "warning", "app:create_app()"]),
+        (f"uvicorn asgi x{args.workers}", "uvicorn",
+         [sys.executable, "-m", "uvicorn", "--workers", str(args.workers), "--port", "{port}",
+          "--log-level", "warning", "asgi:application"]),
+    ]
+    for label, module, command in servers:
+        if module and subprocess.run([sys.executable, "-c", f"import {module}"],
+                                     capture_output=True).returncode:
+            print(f"{label:<28} skipped ({module} not installed)")
+            continue
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        process = subprocess.Popen([part.format(port=port) for part in command],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not _wait_for_server(url, process):
+                print(f"{label:<28} failed to start")
+                continue
+            counts = _load(url, _login(url, "agent", "secret"), args.threads, args.seconds)
+            print(f"{label:<28} clients={args.threads:<4} req/s={counts['ok'] / args.seconds:.1f} "
+                  f"errors={counts['errors']}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+_STARTUP_PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+application.test_client().get("/login")
+served = time.perf_counter()
+print(json.dumps({"import": imported - start, "create_app": created - imported,
+                  "first request": served - created, "total": served - start}))
+"""
+
+
+def bench_startup(args):
+    """Cold start of a worker: import, create_app and first request, each in a fresh interpreter."""
+    _setup_database()  # migrated once, as after a deploy's upgrade-db step
+    phases = {}
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", _STARTUP_PROBE], capture_output=True,
+                                text=True, check=True).stdout
+        interpreter = time.perf_counter() - start
+        for phase, seconds in json.loads(output.splitlines()[-1]).items():
+            phases.setdefault(phase, []).append(seconds)
+        phases.setdefault("process (with interpreter)", []).append(interpreter)
+    for phase, timings in phases.items():
+        _report(phase, timings)
+    if args.max_ms:
+        p95 = sorted(phases["total"])[min(args.runs - 1, int(args.runs * 0.95))] * 1000
+        if p95 > args.max_ms:
+            sys.exit(f"startup p95 {p95:.0f}ms is over the {args.max_ms:.0f}ms budget")
+
+
+def bench_login(args):
+    """Shift change: every agent logs in at once, while other pages keep being served."""
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from extensions import db
+    from models import User
+    _setup_database()
+    # One precomputed hash keeps setup fast; verifying it costs the same
+    pwhash = generate_password_hash("secret", args.method)
+    pools = [("inline (no pool)", 0), (f"pool x{os.cpu_count()}", os.cpu_count())]
+    for label, workers in pools:
+        # The agents and the browsing thread are the server's request threads
+        app = create_app({"PASSWORD_HASH_METHOD": args.method, "PASSWORD_HASH_WORKERS": workers,
+                          "SERVER_THREADS": args.threads + 1})
+        with app.app_context():
+            db.session.execute(db.delete(User))
+            db.session.execute(db.insert(User), [{"username": f"agent{i}", "password_hash": pwhash}
+                                                 for i in range(args.users)])
+            db.session.commit()
+        usernames = iter(f"agent{i}" for i in range(args.users))
+        names_lock = threading.Lock()
+        logins, other, shed = [], [], []
+        done = threading.Event()
+
+        def agent():
+            client = app.test_client()
+            while True:
+                with names_lock:
+                    username = next(usernames, None)
+                if username is None:
+                    return
+                start = time.perf_counter()
+                response = client.post("/login", data={"username": username, "password": "secret"})
+                while response.status_code == 503:
+                    # Shed by a full hashing pool: try again, as the page asks
+                    shed.append(1)
+                    time.sleep(0.25)
+                    response = client.post("/login", data={"username": username, "password": "secret"})
+                if response.status_code == 302:
+                    logins.append(time.perf_counter() - start)
+                client.get("/logout")
+
+        def browse():
+            # A page that needs no hashing, to see whether logins starve it
+            client = app.test_client()
+            while not done.is_set():
+                start = time.perf_counter()
+                client.get("/login")
+                other.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+        browser = threading.Thread(target=browse)
+        browser.start()
+        start = time.perf_counter()
+        agents = [threading.Thread(target=agent) for _ in range(args.threads)]
+        for thread in agents:
+            thread.start()
+        for thread in agents:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        browser.join()
+        app.extensions["password_hasher"].shutdown()
+        print(f"{label}: {len(logins)}/{args.users} logins in {elapsed:.1f}s "
+              f"= {len(logins) / elapsed:.1f} logins/s, {len(shed)} shed and retried")
+        _report("  login", logins)
+        _report("  other page", other)
+
+
+class _TestClientAgent:
+    """One simulated browser, calling the app in-process through Flask's test client."""
+
+    def __init__(self, app, url):
+        self.client = app.test_client()
+
+    def request(self, method, path, step, form=None, json_body=None):
+        response = self.client.open(path, method=method, data=form, json=json_body,
+                                    headers={"X-Bench-Step": step})
+        return response.status_code, response.headers.get("Location"), response.get_data()
+
+
+class _HttpAgent:
+    """One simulated browser, calling a local server over HTTP with its own cookies."""
+
+    def __init__(self, app, url):
+        class NoRedirect(urllib.request.HTTPRedirectHandler):
+            def redirect_request(self, *args):
+                return None
+
+        self.url = url
+        self.opener = urllib.request.build_opener(NoRedirect, urllib.request.HTTPCookieProcessor())
+
+    def request(self, method, path, step, form=None, json_body=None):
+        data, headers = None, {"X-Bench-Step": step}
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        elif json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.url + urllib.parse.quote(path), data=data, method=method,
+                                         headers=headers)
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                return response.status, response.headers.get("Location"), response.read()
+        except urllib.error.HTTPError as response:
+            return response.code, response.headers.get("Location"), response.read()
+
+
+# In the order an agent goes through them
+REPLAY_STEPS = ("login", "home", "call_sub_menu", "checklist", "toggle_item", "add_task", "toggle_task",
+                "toggle_subtask", "checklist (after clicks)", "new_call")
+
+
+class ReplayError(Exception):
+    """A replayed request got a response its script did not expect."""
+
+
+def _replay_agent(app, agent, username, rng, args, items, record):
+    """One agent's shift: log in, then take calls through the menus and checklist.
+
+    Every step states the response it expects: a status, and for a redirect
+    where it leads. Anything else, such as a redirect back to /login, raises
+    ReplayError and ends the shift.
+    """
+    from defaults import OBJECTION_CHECKLISTS
+    from extensions import db
+    from models import Task
+
+    def step(name, method, path, status=200, redirect=None, **body):
+        start = time.perf_counter()
+        got, location, data = agent.request(method, path, name, **body)
+        record(name, time.perf_counter() - start)
+        target = location and urllib.parse.unquote(urllib.parse.urlsplit(location).path)
+        if got != status or target != redirect:
+            raise ReplayError(f"{username} {name}: {method} {path} answered {got}"
+                              + (f" to {target}" if target else "")
+                              + f", expected {status}" + (f" to {redirect}" if redirect else ""))
+        return data
+
+    step("login", "POST", "/login", status=302, redirect="/",
+         form={"username": username, "password": "secret"})
+    for _call in range(args.calls):
+        call_type, checklist_type = rng.choice(sorted(items))
+        checklist = f"/checklist/{call_type}/{checklist_type}"
+        step("home", "GET", "/")
+        step("call_sub_menu", "GET", f"/call/{call_type}")
+        step("checklist", "GET", checklist)
+        for item_id in rng.sample(items[call_type, checklist_type],
+                                  min(args.clicks, len(items[call_type, checklist_type]))):
+            step("toggle_item", "POST", f"/api/items/{item_id}/toggle")
+        if (call_type, checklist_type) in OBJECTION_CHECKLISTS and rng.random() < 0.5:
+            # A second objection on this call: a custom Objection task and its sub-checklist
+            data = step("add_task", "POST", f"/api/checklist/{call_type}/{checklist_type}/tasks", status=201,
+                        json_body={"text": "Objection"})
+            task_id = json.loads(data)["id"]
+            step("toggle_task", "GET", f"/toggle_task/{task_id}", status=302, redirect=checklist)
+            with app.app_context():
+                subtask_ids = db.session.scalars(db.select(Task.id).filter_by(parent_task_id=task_id)
+                                                 .order_by(Task.id)).all()
+            if not subtask_ids:
+                raise ReplayError(f"{username} toggle_task: the Objection task got no sub-checklist")
+            for subtask_id in subtask_ids[:rng.randint(1, len(subtask_ids))]:
+                step("toggle_subtask", "GET", f"/toggle_subtask/{subtask_id}", status=302, redirect=checklist)
+        step("checklist (after clicks)", "GET", checklist)
+        step("new_call", "GET", f"/new_call/{call_type}/{checklist_type}", status=302, redirect=checklist)
+
+
+def _compare_baseline(results, baseline, tolerance):
+    """Regressions of this run against a stored one, as a list of messages."""
+    problems = []
+    if baseline["scenario"] != results["scenario"]:
+        return [f"the baseline was saved for {baseline['scenario']}, not {results['scenario']}"]
+    for name, base in baseline["steps"].items():
+        current = results["steps"].get(name)
+        if current is None:
+            problems.append(f"{name}: no longer run")
+            continue
+        # Statement counts are deterministic, so any increase is a regression
+        if current["statements"] > base["statements"] + 0.01:
+            problems.append(f"{name}: {current['statements']:.2f} SQL statements per request, "
+                            f"was {base['statements']:.2f}")
+        # Tail latencies, and rare steps, swing too much between runs to gate
+        # on; the median of a common step, within the tolerance and ignoring
+        # moves of a few milliseconds, does not
+        if (current["n"] >= 50 and current["p50_ms"] > base["p50_ms"] * (1 + tolerance)
+                and current["p50_ms"] - base["p50_ms"] > 5):
+            problems.append(f"{name}: p50 {current['p50_ms']:.2f}ms, was {base['p50_ms']:.2f}ms")
+    if results["requests_per_second"] < baseline["requests_per_second"] * (1 - tolerance):
+        problems.append(f"throughput {results['requests_per_second']:.1f} req/s, "
+                        f"was {baseline['requests_per_second']:.1f} req/s")
+    return problems
+
+
+def bench_replay(args):
+    """Replay agents' shifts (login, menus, checklist clicks, new call) and compare with a JSON baseline.
+
+    Every agent follows a script drawn from --seed, so runs are repeatable.
+    Latency is measured at the client; SQL statements are the app's own
+    per-request counts (see metrics.py), gathered per step from an
+    X-Bench-Step header. The event log's background writes are not
+    requests, so they are left out. An agent whose request gets a response
+    its script does not expect, e.g. a redirect to /login, fails the run,
+    as does an error in an agent's thread. With --baseline FILE the results are
+    compared with the run stored there, and the command fails on a
+    regression; --save-baseline stores this run instead. Statement counts
+    carry over between machines, timings only compare on the machine that
+    saved the baseline.
+    """
+    from flask import g, request
+    from werkzeug.security import generate_password_hash
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from defaults import DEFAULT_TASKS
+    from extensions import db
+    from models import User, TemplateItem
+    from services import provision_template
+
+    app = _setup_database({"PASSWORD_HASH_METHOD": args.method, "METRICS_ENABLED": True})
+    statements = {}
+    stats_lock = threading.Lock()
+
+    @app.teardown_request
+    def count_statements(exc):
+        with stats_lock:
+            statements.setdefault(request.headers.get("X-Bench-Step"), []).append(g.sql_statements)
+
+    with app.app_context():
+        pwhash = generate_password_hash("secret", args.method)
+        db.session.execute(db.insert(User), [{"username": f"agent{i}", "password_hash": pwhash}
+                                             for i in range(args.users)])
+        items = {}
+        for call_type, checklist_type in DEFAULT_TASKS:
+            template = provision_template(call_type, checklist_type)
+            items[call_type, checklist_type] = db.session.scalars(
+                db.select(TemplateItem.id).filter_by(template_id=template.id, parent_id=None)
+                .order_by(TemplateItem.position)).all()
+        db.session.commit()
+
+    server = None
+    url = None
+    if args.transport == "http":
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args):
+                pass
+
+        server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+    agent_class = _HttpAgent if server else _TestClientAgent
+
+    timings = {}
+    errors = []
+
+    def record(name, seconds):
+        with stats_lock:
+            timings.setdefault(name, []).append(seconds)
+
+    agents = iter(range(args.users))
+
+    def worker():
+        # No app context is held here: requests on this thread would share its g
+        while True:
+            with stats_lock:
+                index = next(agents, None)
+            if index is None:
+                return
+            try:
+                _replay_agent(app, agent_class(app, url), f"agent{index}",
+                              random.Random(args.seed * 100003 + index), args, items, record)
+            except Exception as exc:
+                # Handed to the main thread, which fails the run
+                with stats_lock:
+                    errors.append(exc if isinstance(exc, ReplayError) else repr(exc))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if server:
+        server.shutdown()
+    app.extensions["password_hasher"].shutdown()
+
+    requests_made = sum(len(step_timings) for step_timings in timings.values())
+    results = {
+        "scenario": {"users": args.users, "calls": args.calls, "clicks": args.clicks, "seed": args.seed,
+                     "threads": args.threads, "transport": args.transport, "method": args.method},
+        "python": sys.version.split()[0],
+        "requests": requests_made,
+        "requests_per_second": round(requests_made / elapsed, 1),
+        "steps": {},
+    }
+    print(f"{'step':<28} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'SQL/req':>8}")
+    for name in REPLAY_STEPS:
+        if name not in timings:
+            continue
+        step_timings = sorted(timings[name])
+        counts = statements.get(name, [0])
+        entry = results["steps"][name] = {
+            "n": len(step_timings),
+            "p50_ms": round(statistics.median(step_timings) * 1000, 3),
+            "p95_ms": round(_percentile(step_timings, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(step_timings, 0.99) * 1000, 3),
+            "statements": round(statistics.mean(counts), 3),
+        }
+        print(f"{name:<28} {entry['n']:>6} {entry['p50_ms']:>7.2f}ms {entry['p95_ms']:>7.2f}ms "
+              f"{entry['p99_ms']:>7.2f}ms {entry['statements']:>8.2f}")
+    print(f"{requests_made} requests in {elapsed:.1f}s = {results['requests_per_second']:.1f} req/s "
+          f"({args.threads} concurrent agents), failed agents={len(errors)}")
+    if errors:
+        sys.exit(f"{len(errors)} of {args.users} agents failed, e.g.:\n  "
+                 + "\n  ".join(str(error) for error in errors[:5]))
+
+    if args.baseline and args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            problems = _compare_baseline(results, json.load(f), args.tolerance)
+        if problems:
+            sys.exit("regressions against " + args.baseline + ":\n  " + "\n  ".join(problems))
+        print(f"no regressions against {args.baseline}")
+
+
+BENCHMARKS = {
+    "provision": bench_provision,
+    "concurrency": bench_concurrency,
+    "serve": bench_serve,
+    "startup": bench_startup,
+    "login": bench_login,
+    "delete": bench_delete,
+    "replay": bench_replay,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--users", type=int, default=50, help="number of simulated agents")
+    parser.add_argument("--calls", type=int, default=5, help="calls taken per agent (replay)")
+    parser.add_argument("--clicks", type=int, default=6, help="checklist items ticked per call (replay)")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the agents' scripts (replay)")
+    parser.add_argument("--transport", choices=["client", "http"], default="client",
+                        help="Flask test client, or a local HTTP server (replay)")
+    parser.add_argument("--baseline", help="JSON baseline to compare with, or to write with --save-baseline (replay)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline (replay)")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown against the baseline, as a fraction (replay)")
+    parser.add_argument("--processes", type=int, default=4, help="worker processes (concurrency)")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="agents per worker process (concurrency), or concurrent clients (serve, login, replay)")
+    parser.add_argument("--seconds", type=float, default=5, help="run time per mode (concurrency, serve)")
+    parser.add_argument("--runs", type=int, default=10,
+                        help="fresh interpreters to start (startup), or trees deleted per size (delete)")
+    parser.add_argument("--subtasks", type=int, default=1000, help="largest task tree to delete (delete)")
+    parser.add_argument("--max-ms", type=float, help="fail if startup p95 exceeds this (startup)")
+    parser.add_argument("--method", default="scrypt", help="password hash method (login, replay)")
+    parser.add_argument("--workers", type=int, default=2, help="server worker processes (serve)")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
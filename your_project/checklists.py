@@ -0,0 +1,619 @@
+"""
+Checklist pages and the JSON API used by checklist.js.
+"""
+import hashlib
+
+from flask import (Blueprint, Response, abort, current_app, g, render_template, redirect, url_for, request,
+                   flash, jsonify, session, make_response)
+from flask_login import login_required, current_user
+from markupsafe import Markup
+
+import sync
+from extensions import db, serialized_transaction, serialized_write
+from live import checklist_channel, event_stream
+from models import Task, ChecklistTemplate, TemplateItem, CallSession
+from services import (
+    ChecklistItem,
+    provision_template,
+    latest_call_session,
+    current_call_session,
+    toggle_item_state,
+    hide_items,
+    replace_item,
+    item_positions,
+    add_custom_task,
+    toggle_custom_task,
+    toggle_custom_subtask,
+    new_call_session,
+    edit_custom_task,
+    delete_custom_task,
+    load_checklist,
+)
+
+bp = Blueprint('checklists', __name__)
+
+CALL_TYPES = ["sales", "reengagement", "followup", "at-risk", "support", "introduction"]
+CHECKLIST_OPTIONS = ["voicemail", "start call"]
+
+
+@bp.url_value_preprocessor
+def known_checklist(endpoint, values):
+    # Checklist names come from the URL; only the app's own exist, so a
+    # typo or a crawler cannot create templates and calls
+    if values and (values.get('call_type', CALL_TYPES[0]) not in CALL_TYPES
+                   or values.get('checklist_type', CHECKLIST_OPTIONS[0]) not in CHECKLIST_OPTIONS):
+        abort(404)
+
+
+def static_shell(key, render):
+    """Serve a page that is identical for every user, with long-lived caching.
+
+    The page is rendered once per process and sent with a public max-age and
+    an ETag. Per-user parts (navbar and flash messages) are left out of the
+    shell and fetched from session_bar() by session_bar.js, which also sends
+    visitors who are not logged in to the login page. The view must not
+    touch the session, or the response varies by cookie and no shared
+    cache can keep it.
+    """
+    shells = current_app.extensions['menu_shells']
+    shell = shells.get(key)
+    if shell is None:
+        html = render()
+        etag = f"{current_app.config['RENDER_VERSION']}-{hashlib.md5(html.encode('utf-8')).hexdigest()}"
+        shell = shells[key] = (html, etag)
+    g.shared_response = True
+    response = make_response(shell[0])
+    response.set_etag(shell[1])
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['MENU_CACHE_SECONDS']
+    return response.make_conditional(request)
+
+
+@bp.route("/")
+def home():
+    return static_shell('home', lambda: render_template("home.html", call_types=CALL_TYPES, static_shell=True))
+
+
+@bp.route("/call/<call_type>")
+def call_sub_menu(call_type):
+    return static_shell(
+        ('call', call_type),
+        lambda: render_template("call_sub_menu.html", call_type=call_type,
+                                checklist_options=CHECKLIST_OPTIONS, static_shell=True),
+    )
+
+
+@bp.route("/session-bar")
+def session_bar():
+    """The per-user parts of a static shell: navbar links and flash messages."""
+    if not current_user.is_authenticated:
+        response = jsonify(login=url_for("auth.login"))
+        response.cache_control.no_store = True
+        return response
+    response = jsonify(nav=render_template("_session_nav.html"), flashes=render_template("_flashes.html"))
+    response.cache_control.no_store = True
+    return response
+
+
+@bp.route("/checklist/<call_type>/<checklist_type>")
+@login_required
+def checklist(call_type, checklist_type):
+    template = provision_template(call_type, checklist_type)
+    call_session = latest_call_session(current_user.id, template.id)
+    if call_session is None:
+        # Starting the first call is a write; only take the lock when needed
+        with serialized_transaction():
+            call_session = current_call_session(current_user.id, template)
+            db.session.commit()
+
+    # The page only changes when the call's version does, unless flash
+    # messages are waiting to be shown.
+    etag = f"{current_app.config['RENDER_VERSION']}-{call_session.id}-{call_session.version}"
+    cacheable = '_flashes' not in session
+    if cacheable and request.if_none_match.contains(etag):
+        response = make_response("", 304)
+        response.set_etag(etag)
+        return response
+
+    response = make_response(render_template(
+        "checklist.html", call_type=call_type, checklist_type=checklist_type,
+        task_list=Markup(render_task_list(template, call_session)), call_session=call_session
+    ))
+    if cacheable:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def render_task_list(template, call_session):
+    """The task rows of a call, cached per call version."""
+    key = f"tasks:{current_app.config['RENDER_VERSION']}-{call_session.id}-{call_session.version}"
+    fragment_cache = current_app.extensions['fragment_cache']
+    task_list = fragment_cache.get(key)
+    if task_list is None:
+        task_list = render_template("_task_list.html", tasks=load_checklist(template, call_session))
+        fragment_cache.set(key, task_list)
+    return task_list
+
+
+@bp.route("/checklist/<call_type>/<checklist_type>/rows")
+@login_required
+def checklist_rows(call_type, checklist_type):
+    """The current call's task rows, fetched by checklist.js after a live update."""
+    template = provision_template(call_type, checklist_type)
+    call_session = latest_call_session(current_user.id, template.id)
+    if call_session is None:
+        with serialized_transaction():
+            call_session = current_call_session(current_user.id, template)
+            db.session.commit()
+    return jsonify(session=call_session.id, version=call_session.version,
+                   html=render_task_list(template, call_session))
+
+
+@bp.route("/checklist/<call_type>/<checklist_type>/events")
+@login_required
+def checklist_events(call_type, checklist_type):
+    """Server-Sent Events announcing changes to this checklist (see live.py)."""
+    subscription = current_app.extensions['broker'].subscribe(
+        checklist_channel(current_user.id, call_type, checklist_type))
+    config = current_app.config
+    stream = (subscription, config['LIVE_COALESCE_SECONDS'], config['LIVE_HEARTBEAT_SECONDS'],
+              config['LIVE_STREAM_SECONDS'])
+    if 'checklist.live_stream' in request.environ:
+        # asgi.py sends the stream from its event loop (see live.asgi_app)
+        request.environ['checklist.live_stream'] = stream
+        body = ()
+    else:
+        body = event_stream(*stream)
+    response = Response(body, mimetype="text/event-stream")
+    response.cache_control.no_store = True
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route("/toggle_task/<int:task_id>")
+@login_required
+@serialized_write
+def toggle_task(task_id):
+    task = Task.query.get_or_404(task_id)
+    if task.user_id != current_user.id:
+        flash("Unauthorized", "danger")
+        return redirect(url_for("checklists.home"))
+    if toggle_custom_task(task):
+        flash("Objection sub-checklist initialized", "info")
+    db.session.commit()
+    return redirect(url_for("checklists.checklist", call_type=task.call_type, checklist_type=task.checklist_type))
+
+
+@bp.route("/toggle_subtask/<int:subtask_id>")
+@login_required
+@serialized_write
+def toggle_subtask(subtask_id):
+    subtask = Task.query.get_or_404(subtask_id)
+    if subtask.user_id != current_user.id:
+        flash("Unauthorized", "danger")
+        return redirect(url_for("checklists.home"))
+    toggle_custom_subtask(subtask)
+    db.session.commit()
+    return redirect(url_for("checklists.checklist", call_type=subtask.call_type, checklist_type=subtask.checklist_type))
+
+
+@bp.route("/add_task/<call_type>/<checklist_type>", methods=["POST"])
+@login_required
+@serialized_write
+def add_task(call_type, checklist_type):
+    text = request.form.get("task_text", "").strip()
+    if not text:
+        flash("Task cannot be empty", "warning")
+    else:
+        template = provision_template(call_type, checklist_type)
+        add_custom_task(current_call_session(current_user.id, template), text)
+        db.session.commit()
+        flash("Task added", "success")
+    return redirect(url_for("checklists.checklist", call_type=call_type, checklist_type=checklist_type))
+
+
+@bp.route("/delete_task/<int:task_id>")
+@login_required
+@serialized_write
+def delete_task(task_id):
+    task = Task.query.get_or_404(task_id)
+    if task.user_id != current_user.id:
+        flash("Unauthorized", "danger")
+        return redirect(url_for("checklists.home"))
+    delete_custom_task(task)
+    db.session.commit()
+    flash("Task deleted", "info")
+    return redirect(url_for("checklists.checklist", call_type=task.call_type, checklist_type=task.checklist_type))
+
+
+@bp.route("/edit_task/<int:task_id>", methods=["GET", "POST"])
+@login_required
+@serialized_write
+def edit_task(task_id):
+    task = Task.query.get_or_404(task_id)
+    if task.user_id != current_user.id:
+        flash("Unauthorized", "danger")
+        return redirect(url_for("checklists.home"))
+    if request.method == "POST":
+        new_text = request.form.get("task_text", "").strip()
+        if new_text:
+            edit_custom_task(task, new_text)
+            db.session.commit()
+            flash("Task updated", "success")
+            return redirect(url_for("checklists.checklist", call_type=task.call_type, checklist_type=task.checklist_type))
+        else:
+            flash("Task cannot be empty", "warning")
+    return render_template("edit_task.html", task=task)
+
+
+# ----- Template Item Routes -----
+# Template items are shared, so these only change the agent's current call.
+@bp.route("/toggle_item/<int:item_id>")
+@login_required
+@serialized_write
+def toggle_item(item_id):
+    item = TemplateItem.query.get_or_404(item_id)
+    template = db.session.get(ChecklistTemplate, item.template_id)
+    toggle_item_state(current_call_session(current_user.id, template), item)
+    db.session.commit()
+    return redirect(url_for("checklists.checklist", call_type=template.call_type, checklist_type=template.checklist_type))
+
+
+@bp.route("/delete_item/<int:item_id>")
+@login_required
+@serialized_write
+def delete_item(item_id):
+    item = TemplateItem.query.get_or_404(item_id)
+    template = db.session.get(ChecklistTemplate, item.template_id)
+    hide_items(current_call_session(current_user.id, template), item_positions(item))
+    db.session.commit()
+    flash("Task deleted", "info")
+    return redirect(url_for("checklists.checklist", call_type=template.call_type, checklist_type=template.checklist_type))
+
+
+@bp.route("/edit_item/<int:item_id>", methods=["GET", "POST"])
+@login_required
+@serialized_write
+def edit_item(item_id):
+    item = TemplateItem.query.get_or_404(item_id)
+    template = db.session.get(ChecklistTemplate, item.template_id)
+    if request.method == "POST":
+        new_text = request.form.get("task_text", "").strip()
+        if new_text:
+            replace_item(current_call_session(current_user.id, template), template, item, new_text)
+            db.session.commit()
+            flash("Task updated", "success")
+            return redirect(url_for("checklists.checklist", call_type=template.call_type, checklist_type=template.checklist_type))
+        else:
+            flash("Task cannot be empty", "warning")
+    return render_template("edit_task.html", task=item)
+
+
+# ----- JSON API -----
+# Used by checklist.html so a click costs one request and returns only the
+# changed state, instead of a redirect and a full re-render.
+def api_error(message, status):
+    return jsonify(error=message), status
+
+
+def op_time(op):
+    """A queued op's client timestamp: 0 if it has none, None if it is not a number."""
+    ts = op.get("ts")
+    if ts is None:
+        return 0
+    if isinstance(ts, bool) or not isinstance(ts, (int, float)) or ts != ts:
+        return None
+    return ts
+
+
+@bp.route("/api/tasks/<int:task_id>/toggle", methods=["POST"])
+@login_required
+@serialized_write
+def api_toggle_task(task_id):
+    task = Task.query.get_or_404(task_id)
+    if task.user_id != current_user.id:
+        return api_error("Unauthorized", 403)
+    if toggle_custom_task(task):
+        db.session.commit()
+        return jsonify(id=task.id, reload=True)
+    db.session.commit()
+    return jsonify(id=task.id, done=task.done)
+
+
+@bp.route("/api/tasks/<int:task_id>", methods=["DELETE"])
+@login_required
+@serialized_write
+def api_delete_task(task_id):
+    task = Task.query.get_or_404(task_id)
+    if task.user_id != current_user.id:
+        return api_error("Unauthorized", 403)
+    delete_custom_task(task)
+    db.session.commit()
+    return jsonify(id=task_id, deleted=True)
+
+
+@bp.route("/api/items/<int:item_id>/toggle", methods=["POST"])
+@login_required
+@serialized_write
+def api_toggle_item(item_id):
+    item = TemplateItem.query.get_or_404(item_id)
+    template = db.session.get(ChecklistTemplate, item.template_id)
+    done = toggle_item_state(current_call_session(current_user.id, template), item)
+    db.session.commit()
+    return jsonify(id=item_id, done=done)
+
+
+@bp.route("/api/items/<int:item_id>", methods=["DELETE"])
+@login_required
+@serialized_write
+def api_delete_item(item_id):
+    item = TemplateItem.query.get_or_404(item_id)
+    template = db.session.get(ChecklistTemplate, item.template_id)
+    hide_items(current_call_session(current_user.id, template), item_positions(item))
+    db.session.commit()
+    return jsonify(id=item_id, deleted=True)
+
+
+@bp.route("/api/checklist/<call_type>/<checklist_type>/tasks", methods=["POST"])
+@login_required
+@serialized_write
+def api_add_task(call_type, checklist_type):
+    text = str((request.get_json(silent=True) or {}).get("text", "")).strip()
+    if not text:
+        return api_error("Task cannot be empty", 400)
+    template = provision_template(call_type, checklist_type)
+    task = add_custom_task(current_call_session(current_user.id, template), text)
+    db.session.commit()
+    row = ChecklistItem(task.id, task.text, task.done, task.position, False, [])
+    html = render_template("_task_row.html", task=row)
+    return jsonify(id=task.id, text=task.text, done=task.done, html=html), 201
+
+
+BATCH_OPS = {"toggle", "add", "edit", "delete"}
+
+
+def apply_batch_op(op, template, call_session):
+    """Apply one queued client operation and return its result entry."""
+    kind = op.get("kind", "task")
+    action = op.get("op")
+    if action not in BATCH_OPS:
+        return {"ok": False, "error": "Unknown operation"}
+
+    if action == "add":
+        text = str(op.get("text", "")).strip()
+        if not text:
+            return {"ok": False, "error": "Task cannot be empty"}
+        task = add_custom_task(call_session, text)
+        row = ChecklistItem(task.id, task.text, task.done, task.position, False, [])
+        return {"ok": True, "kind": "task", "id": task.id, "done": task.done,
+                "html": render_template("_task_row.html", task=row)}
+
+    target_id = op.get("id")
+    if isinstance(target_id, bool) or not isinstance(target_id, int):
+        return {"ok": False, "error": "id must be a number"}
+    done = op.get("done")
+    done = None if done is None else bool(done)
+    if kind == "item":
+        item = db.session.get(TemplateItem, target_id)
+        if item is None or item.template_id != template.id:
+            return {"ok": False, "error": "Not found"}
+        if action == "toggle":
+            return {"ok": True, "done": toggle_item_state(call_session, item, done)}
+        if action == "delete":
+            hide_items(call_session, item_positions(item))
+            return {"ok": True, "deleted": True}
+        text = str(op.get("text", "")).strip()
+        if not text:
+            return {"ok": False, "error": "Task cannot be empty"}
+        task = replace_item(call_session, template, item, text)
+        return {"ok": True, "replaced_by": task.id}
+
+    task = db.session.get(Task, target_id)
+    if task is None or task.user_id != current_user.id or task.session_id != call_session.id:
+        return {"ok": False, "error": "Not found"}
+    if action == "toggle":
+        if toggle_custom_task(task, done):
+            return {"ok": True, "reload": True}
+        return {"ok": True, "done": task.done}
+    if action == "delete":
+        delete_custom_task(task)
+        return {"ok": True, "deleted": True}
+    text = str(op.get("text", "")).strip()
+    if not text:
+        return {"ok": False, "error": "Task cannot be empty"}
+    edit_custom_task(task, text)
+    return {"ok": True}
+
+
+@bp.route("/api/checklist/<call_type>/<checklist_type>/batch", methods=["POST"])
+@login_required
+@serialized_write
+def api_batch(call_type, checklist_type):
+    """Apply a queue of client operations in one transaction.
+
+    Body: {"session": id, "version": n, "ops": [{"op": "toggle" | "add" |
+    "edit" | "delete", "kind": "item" | "task", "id": ..., "done": bool,
+    "text": str, "ts": client timestamp}, ...]}
+
+    Ops are applied to the call they were queued in (the current call if
+    no session is given), in client timestamp order. Toggles that carry
+    the target "done" state make a replayed queue idempotent, so the last
+    writer wins. If the call's version moved on since the client's base
+    version, e.g. from another tab, the response flags a conflict so the
+    client can reload. An op whose ts or id is not a number fails on its
+    own, with an error result.
+    """
+    body = request.get_json(silent=True) or {}
+    ops = body.get("ops")
+    if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+        return api_error("ops must be a list of operations", 400)
+
+    template = provision_template(call_type, checklist_type)
+    call_session = None
+    if isinstance(body.get("session"), int):
+        call_session = db.session.get(CallSession, body["session"])
+        if call_session is not None and (call_session.user_id != current_user.id
+                                         or call_session.template_id != template.id):
+            call_session = None
+    if call_session is None:
+        call_session = current_call_session(current_user.id, template)
+    conflict = body.get("version") not in (None, call_session.version)
+
+    results = [None] * len(ops)
+    for index, op in enumerate(ops):
+        if op_time(op) is None:
+            results[index] = {"ok": False, "error": "ts must be a number"}
+    order = sorted((i for i, result in enumerate(results) if result is None), key=lambda i: op_time(ops[i]))
+    for index in order:
+        results[index] = apply_batch_op(ops[index], template, call_session)
+    db.session.commit()
+
+    return jsonify(session=call_session.id, version=call_session.version,
+                   conflict=conflict, results=results)
+
+
+SYNC_OPS = {"set_done", "add", "edit", "delete"}
+
+
+def apply_sync_op(op, key, template, call_session):
+    """Apply one change from a syncing client; returns the server key of an added task."""
+    action = op.get("op")
+    text = str(op.get("text", "")).strip()
+    done = bool(op.get("done"))
+    if not key:
+        return None
+    if action == "add":
+        if key[0] != "l" or not text:
+            return None
+        task = add_custom_task(call_session, text)
+        if done:
+            toggle_custom_subtask(task, True)
+        return f"t{task.id}"
+    if action not in SYNC_OPS or action == "edit" and not text or key[0] not in "it" or not key[1:].isdigit():
+        return None
+
+    if key[0] == "i":
+        item = TemplateItem.query.filter_by(template_id=template.id, position=int(key[1:]), parent_id=None).first()
+        if item is None:
+            return None
+        # An edited item is a custom task in its place
+        task = Task.query.filter_by(session_id=call_session.id, position=item.position, parent_task_id=None).first()
+        if action == "set_done":
+            if task is not None:
+                toggle_custom_subtask(task, done)
+            else:
+                toggle_item_state(call_session, item, done)
+        elif action == "edit":
+            if task is not None:
+                edit_custom_task(task, text)
+            else:
+                replace_item(call_session, template, item, text)
+        else:
+            hide_items(call_session, item_positions(item))
+            if task is not None:
+                delete_custom_task(task)
+        return None
+
+    task = db.session.get(Task, int(key[1:]))
+    if task is None or task.user_id != current_user.id or task.session_id != call_session.id:
+        return None
+    if action == "set_done":
+        toggle_custom_subtask(task, done)
+    elif action == "edit":
+        edit_custom_task(task, text)
+    else:
+        delete_custom_task(task)
+    return None
+
+
+@bp.route("/api/sync", methods=["POST"])
+@login_required
+@serialized_write
+def api_sync():
+    """Exchange changed tasks with a client that keeps its own copy (see sync.py).
+
+    Body: {"cursor": n, "changes": {"<call_type>/<checklist_type>": [{"op":
+    "set_done" | "add" | "edit" | "delete" | "reset", "key": ..., "done":
+    bool, "text": str, "ts": client timestamp}, ...]}}
+
+    Changes apply to the agent's current call, in timestamp order; "reset"
+    starts a new call. Response: {"cursor": n, "keys": {local key: server
+    key}, "conflicts": [...], "checklists": {"<call_type>/<checklist_type>":
+    {"reset": true, "tasks": {key: state or null}}}} with only the
+    checklists and tasks that other writers changed since the given cursor.
+    """
+    body = request.get_json(silent=True) or {}
+    cursor = body.get("cursor") or 0
+    changes = body.get("changes") or {}
+    if not isinstance(cursor, int) or not isinstance(changes, dict) or not all(
+        isinstance(ops, list) and all(isinstance(op, dict) for op in ops) for ops in changes.values()
+    ):
+        return api_error("cursor must be a number and changes a map of operation lists", 400)
+    for ops in changes.values():
+        for op in ops:
+            if op_time(op) is None:
+                return api_error("ts must be a number", 400)
+            if op.get("op") != "reset" and not (isinstance(op.get("key"), str) and op["key"]):
+                return api_error("Each change needs a key", 400)
+
+    window = sync.Window(cursor)
+    keys, conflicts = {}, []
+    for name, ops in changes.items():
+        call_type, _, checklist_type = name.partition("/")
+        if call_type not in CALL_TYPES or checklist_type not in CHECKLIST_OPTIONS:
+            return api_error(f"Unknown checklist {name!r}", 400)
+        template = provision_template(call_type, checklist_type)
+        call_session = current_call_session(current_user.id, template)
+        reset_at, changed = sync.changed_keys(call_session, window)
+        for op in sorted(ops, key=op_time):
+            ts = op_time(op)
+            if op.get("op") == "reset":
+                call_session = new_call_session(current_user.id, template)
+                reset_at, changed = None, {}
+                continue
+            key = keys.get(op["key"], op["key"])
+            changed_at = changed.get(key, reset_at)
+            if changed_at is not None and ts < sync.timestamp(changed_at):
+                conflicts.append({"checklist": name, "key": key})
+                continue
+            new_key = apply_sync_op(op, key, template, call_session)
+            if new_key:
+                keys[key] = new_key
+    window.mark_own()
+    db.session.commit()
+
+    next_cursor = window.end()
+    checklists = {}
+    for call_session in sync.current_sessions(current_user.id):
+        reset_at, changed = sync.changed_keys(call_session, window)
+        if reset_at is None and not changed:
+            continue
+        entry = checklists[f"{call_session.call_type}/{call_session.checklist_type}"] = {}
+        if reset_at is not None:
+            entry["reset"] = True
+        entry["tasks"] = sync.key_states(call_session, changed)
+    return jsonify(cursor=next_cursor, keys=keys, conflicts=conflicts, checklists=checklists)
+
+
+@bp.route("/api/cache-stats")
+@login_required
+def api_cache_stats():
+    return jsonify(users=current_app.extensions['user_cache'].stats(),
+                   fragments=current_app.extensions['fragment_cache'].stats(),
+                   live=current_app.extensions['broker'].stats(),
+                   events=current_app.extensions['event_writer'].stats())
+
+
+@bp.route('/new_call/<call_type>/<checklist_type>', methods=['GET'])
+@login_required
+@serialized_write
+def new_call(call_type, checklist_type):
+    # A new call is just a new session row; the previous call's state and
+    # custom tasks stay behind as history.
+    new_call_session(current_user.id, provision_template(call_type, checklist_type))
+    db.session.commit()
+
+    flash("Checklist has been refreshed for a new call.", "success")
+    return redirect(url_for('checklists.checklist', call_type=call_type, checklist_type=checklist_type))
@@ -0,0 +1,183 @@
+"""
+Retention and compaction of the task table.
+
+    flask --app app compact [--retention-days N] [--batch-size N]
+                            [--pause SECONDS] [--max-seconds SECONDS]
+
+Steps, in order:
+
+    objections   merge the duplicate Objection tasks of the old per-agent
+                 checklists (tasks with no call) into the oldest one per
+                 agent and checklist, then drop their duplicate subtasks.
+                 Tasks added during a call are what the agent asked for
+                 and are never merged.
+    orphans      delete tasks whose parent task no longer exists (left over
+                 from before ON DELETE CASCADE)
+    archive      move task trees older than the retention period into
+                 task_archive, except those of an agent's current calls
+    sync         drop the sync change log of finished calls (see sync.py)
+    vacuum       on SQLite, give freed pages back with incremental_vacuum
+
+Every step works in batches of at most ``batch_size`` rows, one short
+transaction each, with a pause in between so agents' writes get the lock.
+``max_seconds`` stops the job between batches; the next run carries on
+where it stopped. Incremental vacuum needs auto_vacuum=INCREMENTAL, which
+``--enable-incremental-vacuum`` turns on with a one-off full VACUUM. That
+locks the database for its duration, so run it outside business hours.
+"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import aliased
+
+from extensions import db, serialized_transaction
+from models import Task, TaskArchive, CallSession, SyncChange
+from services import task_subtree
+
+
+class Compactor:
+    def __init__(self, retention_days=365, batch_size=500, pause=0.05, max_seconds=None,
+                 vacuum_pages=1000):
+        self.cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        self.batch_size = batch_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        self.counts = {'objections merged': 0, 'subtasks deduplicated': 0, 'orphans deleted': 0,
+                       'tasks archived': 0, 'sync changes pruned': 0, 'pages vacuumed': 0}
+
+    def out_of_time(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def _batches(self, step):
+        """Run ``step`` in short write transactions until it finds nothing to do."""
+        while not self.out_of_time():
+            with serialized_transaction():
+                done = step()
+                db.session.commit()
+            if not done:
+                return
+            time.sleep(self.pause)
+
+    def run(self):
+        for step in (self._merge_objections, self._dedupe_subtasks, self._delete_orphans, self._archive,
+                     self._prune_sync_changes):
+            self._batches(step)
+        self._vacuum()
+        return self.counts
+
+    def _touch_sessions(self, session_ids):
+        # Pages and clients holding these calls' old versions must refetch them
+        session_ids.discard(None)
+        if session_ids:
+            db.session.execute(db.update(CallSession).where(CallSession.id.in_(session_ids)).values(
+                version=CallSession.version + 1
+            ))
+
+    # ----- Steps -----
+    # Each returns how many rows it changed in this batch.
+    def _merge_objections(self):
+        keep = aliased(Task)
+        duplicate_of = (db.select(db.func.min(keep.id)).where(
+            keep.user_id == Task.user_id,
+            keep.call_type == Task.call_type,
+            keep.checklist_type == Task.checklist_type,
+            keep.session_id.is_(None),
+            keep.parent_task_id.is_(None),
+            keep.text == "Objection",
+        ).scalar_subquery())
+        pairs = db.session.execute(
+            db.select(Task.id, duplicate_of).where(
+                Task.session_id.is_(None), Task.parent_task_id.is_(None), Task.text == "Objection",
+                Task.id != duplicate_of
+            ).limit(self.batch_size)
+        ).all()
+        for duplicate, kept in pairs:
+            # Subtasks move to the kept task; _dedupe_subtasks drops the repeats
+            db.session.execute(db.update(Task).where(Task.parent_task_id == duplicate).values(parent_task_id=kept))
+        db.session.execute(db.delete(Task).where(Task.id.in_([duplicate for duplicate, _kept in pairs])))
+        self.counts['objections merged'] += len(pairs)
+        return len(pairs)
+
+    def _dedupe_subtasks(self):
+        first = aliased(Task)
+        ids = db.session.scalars(
+            db.select(Task.id).where(
+                Task.session_id.is_(None),
+                Task.parent_task_id.is_not(None),
+                db.exists().where(first.parent_task_id == Task.parent_task_id, first.text == Task.text,
+                                  first.id < Task.id),
+            ).limit(self.batch_size)
+        ).all()
+        db.session.execute(db.delete(Task).where(Task.id.in_(ids)))
+        self.counts['subtasks deduplicated'] += len(ids)
+        return len(ids)
+
+    def _delete_orphans(self):
+        parent = aliased(Task)
+        rows = db.session.execute(
+            db.select(Task.id, Task.session_id).where(
+                Task.parent_task_id.is_not(None),
+                ~db.exists().where(parent.id == Task.parent_task_id),
+            ).limit(self.batch_size)
+        ).all()
+        db.session.execute(db.delete(Task).where(Task.id.in_([task_id for task_id, _session_id in rows])))
+        self._touch_sessions({session_id for _task_id, session_id in rows})
+        self.counts['orphans deleted'] += len(rows)
+        return len(rows)
+
+    def _archive(self):
+        current = (db.select(db.func.max(CallSession.id))
+                   .group_by(CallSession.user_id, CallSession.template_id))
+        roots = db.session.scalars(
+            db.select(Task.id).where(
+                Task.parent_task_id.is_(None),
+                Task.created_at < self.cutoff,
+                db.or_(Task.session_id.is_(None), Task.session_id.not_in(current)),
+            ).limit(self.batch_size)
+        ).all()
+        if not roots:
+            return 0
+        tree = db.session.scalars(db.select(task_subtree(roots).c.id)).all()
+        columns = [column.name for column in Task.__table__.columns]
+        db.session.execute(db.insert(TaskArchive).from_select(
+            columns, db.select(*[getattr(Task, name) for name in columns]).where(Task.id.in_(tree))
+        ))
+        # The subtasks go with their roots (ON DELETE CASCADE)
+        db.session.execute(db.delete(Task).where(Task.id.in_(roots)))
+        self.counts['tasks archived'] += len(tree)
+        return len(tree)
+
+    def _prune_sync_changes(self):
+        # Clients only ever sync an agent's current calls
+        current = (db.select(db.func.max(CallSession.id))
+                   .group_by(CallSession.user_id, CallSession.template_id))
+        ids = db.session.scalars(
+            db.select(SyncChange.id).where(SyncChange.session_id.not_in(current)).limit(self.batch_size)
+        ).all()
+        db.session.execute(db.delete(SyncChange).where(SyncChange.id.in_(ids)))
+        self.counts['sync changes pruned'] += len(ids)
+        return len(ids)
+
+    def _vacuum(self):
+        if db.engine.dialect.name != 'sqlite' or self.out_of_time():
+            return
+        if db.session.execute(db.text("PRAGMA auto_vacuum")).scalar() != 2:
+            self.counts['pages vacuumed'] = "skipped (auto_vacuum is not INCREMENTAL)"
+            return
+        free = db.session.execute(db.text("PRAGMA freelist_count")).scalar()
+        pages = min(free, self.vacuum_pages)
+        if not pages:
+            return  # incremental_vacuum(0) would free everything in one go
+        with serialized_transaction():
+            db.session.execute(db.text(f"PRAGMA incremental_vacuum({pages})")).all()
+            db.session.commit()
+        self.counts['pages vacuumed'] = pages
+
+
+def enable_incremental_vacuum():
+    """Switch a SQLite database to auto_vacuum=INCREMENTAL (runs a full VACUUM)."""
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("COMMIT")
+        conn.exec_driver_sql("VACUUM")
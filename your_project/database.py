@@ -0,0 +1,97 @@
+"""
+Database engine settings for the checklist app.
+
+Server databases get a tuned connection pool. SQLite gets WAL journaling,
+synchronous=NORMAL, a busy timeout and explicit BEGIN handling, so that
+writers can take the write lock up front (BEGIN IMMEDIATE) instead of
+failing with "database is locked" when a read transaction upgrades.
+
+Everything is read from the environment:
+
+    DATABASE_URL              database URI (default: SQLite in instance/)
+    DB_POOL_SIZE              pooled connections per process (default 10)
+    DB_MAX_OVERFLOW           extra connections under burst load (default 20)
+    DB_POOL_TIMEOUT           seconds to wait for a pooled connection (default 30)
+    DB_POOL_RECYCLE           seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING          1 to test connections on checkout (default 1)
+    DB_STATEMENT_TIMEOUT_MS   PostgreSQL statement_timeout (default off)
+    SQLITE_BUSY_TIMEOUT_MS    how long SQLite waits for a lock (default 5000)
+    SQLITE_TUNING             0 to keep SQLite's default journaling (default 1)
+
+Foreign keys are enforced on SQLite whatever the tuning setting, so that
+ON DELETE CASCADE removes subtasks there as it does on server databases.
+"""
+import os
+import sqlite3
+import threading
+
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_DATABASE_URI = 'sqlite:///checklist_app.db'
+
+# One writer at a time per process; see app.serialized_write
+sqlite_write_lock = threading.Lock()
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def sqlite_tuning_enabled():
+    return os.environ.get('SQLITE_TUNING', '1') == '1'
+
+
+def engine_options(uri):
+    """SQLAlchemy engine options for the given database URI."""
+    if uri.startswith('sqlite'):
+        return {'connect_args': {'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}}
+    options = {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+    }
+    statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+    if statement_timeout and uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    if not sqlite_tuning_enabled():
+        cursor.close()
+        return
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}")
+    cursor.close()
+    # Let SQLAlchemy emit BEGIN itself (see _sqlite_begin)
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(Engine, 'begin')
+def _sqlite_begin(conn):
+    if conn.dialect.name != 'sqlite' or not sqlite_tuning_enabled():
+        return
+    # Rows changed on the connection so far; see has_sqlite_writes
+    conn.info['sqlite_changes'] = conn.connection.dbapi_connection.total_changes
+    if has_app_context() and g.get('sqlite_write'):
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+    else:
+        conn.exec_driver_sql('BEGIN')
+
+
+def has_sqlite_writes(conn):
+    """Whether the transaction on a tuned SQLite connection has changed rows yet.
+
+    Such a transaction already holds the database's write lock.
+    """
+    return conn.connection.dbapi_connection.total_changes != conn.info.get('sqlite_changes')
@@ -0,0 +1,97 @@
+"""
+Default checklist contents, copied into the shared templates on first use.
+
+Only provisioning a template and the Objection sub-checklist need this
+data, so it is imported on demand rather than at app startup.
+"""
+DEFAULT_VOICEMAIL = [
+    {'text': 'Purpose', 'done': False},
+    {'text': 'Call to Action', 'done': False},
+    {'text': 'Timeframe', 'done': False}
+]
+
+DEFAULT_SALES_START = [
+    {'text': 'Rapport Question', 'done': False},
+    {'text': '2nd Open Question', 'done': False},
+    {'text': 'Value Add Item', 'done': False},
+    {'text': 'Great Ask for Sale', 'done': False},
+    {'text': 'Objection', 'done': False},
+    {'text': 'Implement Sale Now or "How & When"', 'done': False},
+    {'text': 'Anything Else they want to Ask?', 'done': False},
+    {'text': 'Summarise Call', 'done': False},
+    {'text': 'Book Followup or Next Steps', 'done': False}
+]
+
+DEFAULT_INTRODUCTION_START = [
+    {'text': 'Repport Question', 'done': False},
+    {'text': '2nd Open Question', 'done': False},
+    {'text': 'Value Add Item', 'done': False},
+    {'text': 'Learn their Current Situation', 'done': False},
+    {'text': 'Learn their Desired Situation', 'done': False},
+    {'text': 'Identify their Gap (& Problem Solve or Connect to Us)', 'done': False},
+    {'text': 'Additional Support Required?', 'done': False},
+    {'text': 'Anything Else they want to Ask?', 'done': False},
+    {'text': 'Summarise Call', 'done': False},
+    {'text': 'Book Next Call or Followup Steps', 'done': False}
+]
+
+DEFAULT_FOLLOWUP_START = [
+    {'text': 'Rapport Question', 'done': False},
+    {'text': '2nd Open Question', 'done': False},
+    {'text': 'Value Add Item', 'done': False},
+    {'text': 'Extra Support Required?', 'done': False},
+    {'text': 'Anything they want to Ask?', 'done': False},
+    {'text': 'Summarise Call', 'done': False},
+    {'text': 'Book Followup or Next Steps', 'done': False}
+]
+
+DEFAULT_AT_RISK_START = [
+    {'text': 'Rapport Question', 'done': False},
+    {'text': '2nd Open Question', 'done': False},
+    {'text': 'Uncover the Problem', 'done': False},
+    {'text': 'Problem Solve', 'done': False},
+    {'text': 'Objection', 'done': False},
+    {'text': 'Connect course to Motivation/Their Gap', 'done': False},
+    {'text': 'Great Ask for Sale', 'done': False},
+    {'text': 'Additional Support Required', 'done': False},
+    {'text': 'Summarise Call', 'done': False},
+    {'text': 'Book Followup or Next Steps', 'done': False}
+]
+
+DEFAULT_SUPPORT_START = [
+    {'text': 'Rapport Question', 'done': False},
+    {'text': '2nd Open Question', 'done': False},
+    {'text': 'Followup on Support Given Previously', 'done': False},
+    {'text': 'Value Add Item', 'done': False},
+    {'text': 'Objection', 'done': False},
+    {'text': 'Further Support Required?', 'done': False},
+    {'text': 'Anything Else they want to Ask?', 'done': False},
+    {'text': 'Summarise Call', 'done': False},
+    {'text': 'Book Followup or Next Steps', 'done': False}
+]
+
+DEFAULT_TASKS = {
+    ("sales", "voicemail"): DEFAULT_VOICEMAIL,
+    ("sales", "start call"): DEFAULT_SALES_START,
+    ("reengagement", "voicemail"): DEFAULT_VOICEMAIL,
+    ("reengagement", "start call"): DEFAULT_SALES_START,
+    ("followup", "voicemail"): DEFAULT_VOICEMAIL,
+    ("followup", "start call"): DEFAULT_FOLLOWUP_START,
+    ("at-risk", "voicemail"): DEFAULT_VOICEMAIL,
+    ("at-risk", "start call"): DEFAULT_AT_RISK_START,
+    ("support", "voicemail"): DEFAULT_VOICEMAIL,
+    ("support", "start call"): DEFAULT_SUPPORT_START,
+    ("introduction", "voicemail"): DEFAULT_VOICEMAIL,
+    ("introduction", "start call"): DEFAULT_INTRODUCTION_START,
+}
+
+DEFAULT_OBJECTION_SUBTASKS = [
+    {'text': 'Listen & Acknowledge', 'done': False},
+    {'text': 'Clarify & Question', 'done': False},
+    {'text': 'Address the Objection', 'done': False},
+    {'text': 'Confirm & Close', 'done': False}
+]
+
+
+# Checklists whose Objection task carries the objection sub-checklist
+OBJECTION_CHECKLISTS = {("sales", "start call"), ("support", "start call")}
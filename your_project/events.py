@@ -0,0 +1,132 @@
+"""
+Append-only log of what happens on calls, for QA and coaching.
+
+The service functions record events (task checked/unchecked, call
+started/finished) on the database session. When the transaction commits
+they are handed to the app's EventWriter, and a rollback drops them. The
+writer buffers events in memory and a background thread inserts them in
+batches, when EVENT_BATCH_SIZE events are waiting or every
+EVENT_FLUSH_SECONDS. A click therefore never waits on an extra commit.
+
+Events still buffered when the process exits are flushed at exit, but a
+crash can lose up to one interval of events. Event times are taken when
+the change happens, not when the batch is written.
+"""
+import atexit
+import logging
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+import database
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+CALL_STARTED = 'call_started'
+CALL_FINISHED = 'call_finished'
+TASK_CHECKED = 'task_checked'
+TASK_UNCHECKED = 'task_unchecked'
+
+
+def record_event(kind, call_session_id, user_id, item_id=None, task_id=None, position=None):
+    """Log an event if the current transaction commits."""
+    db.session.info.setdefault('pending_events', []).append({
+        'kind': kind, 'session_id': call_session_id, 'user_id': user_id, 'item_id': item_id,
+        'task_id': task_id, 'position': position, 'created_at': datetime.utcnow(),
+    })
+
+
+def record_toggle(done, call_session_id, user_id, **target):
+    record_event(TASK_CHECKED if done else TASK_UNCHECKED, call_session_id, user_id, **target)
+
+
+def _committed(session):
+    pending = session.info.pop('pending_events', None)
+    if pending and has_app_context():
+        current_app.extensions['event_writer'].extend(pending)
+
+
+def _rolled_back(session):
+    session.info.pop('pending_events', None)
+
+
+def init_app(app):
+    writer = EventWriter(app, batch_size=app.config['EVENT_BATCH_SIZE'],
+                         interval=app.config['EVENT_FLUSH_SECONDS'])
+    app.extensions['event_writer'] = writer
+    atexit.register(writer.flush)
+    if not event.contains(db.session, 'after_commit', _committed):
+        event.listen(db.session, 'after_commit', _committed)
+        event.listen(db.session, 'after_rollback', _rolled_back)
+
+
+class EventWriter:
+    """Buffers events and inserts them in batches from a background thread.
+
+    The thread is started on the first event, so processes that never
+    record one (CLI commands, pre-fork masters) don't run it.
+    """
+
+    def __init__(self, app, batch_size=500, interval=2.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+
+    def extend(self, events):
+        with self._lock:
+            self._buffer.extend(events)
+            full = len(self._buffer) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Insert everything buffered so far; returns the number of events written."""
+        from models import CallEvent
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            try:
+                with self.app.app_context():
+                    sqlite = db.engine.dialect.name == 'sqlite' and database.sqlite_tuning_enabled()
+                    # Queue behind request writers instead of racing them for the lock
+                    with database.sqlite_write_lock if sqlite else nullcontext():
+                        with db.engine.begin() as conn:
+                            conn.execute(db.insert(CallEvent), batch)
+            except Exception:
+                logger.exception("Writing %d call events failed; will retry", len(batch))
+                self.failures += 1
+                with self._lock:
+                    self._buffer[:0] = batch
+                return 0
+            self.written += len(batch)
+            self.batches += 1
+            return len(batch)
+
+    def stats(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return {'buffered': buffered, 'written': self.written, 'batches': self.batches,
+                'failures': self.failures}
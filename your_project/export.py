@@ -0,0 +1,146 @@
+"""
+Streaming exports of call history for analytics.
+
+Rows are read with a server-side cursor (``yield_per``) and written out
+chunk by chunk, so memory use does not grow with the date range. Each
+dataset is filtered on its own timestamp, with ``start`` inclusive and
+``end`` exclusive:
+
+    tasks     custom tasks, by Task.created_at
+    calls     one row per call and template item, by CallSession.started_at
+    events    the call event log, by CallEvent.created_at
+
+CSV needs nothing extra; Parquet needs the optional ``pyarrow`` package.
+"""
+import csv
+import io
+from datetime import datetime
+
+from extensions import db
+from models import User, Task, TemplateItem, CallSession, CallEvent
+
+CHUNK_ROWS = 1000
+
+
+def _tasks_query():
+    return db.select(
+        Task.id, User.username, Task.session_id, Task.call_type, Task.checklist_type, Task.text,
+        Task.done, Task.parent_task_id, Task.position, Task.created_at
+    ).join(User, User.id == Task.user_id).order_by(Task.id), Task.created_at
+
+
+def _calls_query():
+    return db.select(
+        CallSession.id.label('session_id'), User.username, CallSession.call_type, CallSession.checklist_type,
+        CallSession.started_at, TemplateItem.position, TemplateItem.text,
+        CallSession.done_mask.op('>>')(TemplateItem.position).bitwise_and(1).label('done'),
+        CallSession.hidden_mask.op('>>')(TemplateItem.position).bitwise_and(1).label('hidden'),
+    ).join(User, User.id == CallSession.user_id).join(
+        TemplateItem, TemplateItem.template_id == CallSession.template_id
+    ).order_by(CallSession.id, TemplateItem.position), CallSession.started_at
+
+
+def _events_query():
+    return db.select(
+        CallEvent.id, CallEvent.kind, User.username, CallEvent.session_id, CallEvent.item_id,
+        CallEvent.task_id, CallEvent.position, CallEvent.created_at
+    ).join(User, User.id == CallEvent.user_id).order_by(CallEvent.id), CallEvent.created_at
+
+
+DATASETS = {
+    'tasks': _tasks_query,
+    'calls': _calls_query,
+    'events': _events_query,
+}
+
+
+def iter_chunks(dataset, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """Yield (columns, rows) chunks of a dataset.
+
+    ``columns`` is a list of (name, SQL type) and ``rows`` a list of tuples.
+    An empty range still yields one chunk, so the output gets its header.
+    """
+    query, timestamp = DATASETS[dataset]()
+    if start is not None:
+        query = query.where(timestamp >= start)
+    if end is not None:
+        query = query.where(timestamp < end)
+    columns = [(column.name, column.type) for column in query.selected_columns]
+    result = db.session.execute(query.execution_options(yield_per=chunk_rows))
+    try:
+        empty = True
+        for partition in result.partitions():
+            empty = False
+            yield columns, partition
+        if empty:
+            yield columns, []
+    finally:
+        result.close()
+
+
+def stream_csv(chunks):
+    """CSV text, one piece per chunk, with a header row first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for index, (columns, rows) in enumerate(chunks):
+        if index == 0:
+            writer.writerow([name for name, _type in columns])
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only stream whose bytes are collected and taken as they arrive."""
+
+    def __init__(self):
+        self._pending = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._pending.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data, self._pending = b''.join(self._pending), []
+        return data
+
+
+def _arrow_schema(pa, columns):
+    types = {int: pa.int64(), bool: pa.bool_(), str: pa.string(), datetime: pa.timestamp('us')}
+    fields = []
+    for name, sql_type in columns:
+        try:
+            arrow_type = types.get(sql_type.python_type, pa.string())
+        except NotImplementedError:
+            arrow_type = pa.int64()  # the bit expressions of the calls dataset
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def stream_parquet(chunks):
+    """Parquet bytes, one row group per chunk."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet export needs the 'pyarrow' package installed") from exc
+    sink = _Sink()
+    writer = None
+    for columns, rows in chunks:
+        if writer is None:
+            writer = pq.ParquetWriter(sink, _arrow_schema(pa, columns))
+        names = [name for name, _type in columns]
+        writer.write_table(pa.Table.from_pylist([dict(zip(names, row)) for row in rows], schema=writer.schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'parquet': (stream_parquet, 'application/vnd.apache.parquet'),
+}
@@ -0,0 +1,63 @@
+"""
+Flask extensions shared by the checklist app's modules.
+
+They are created unbound here and attached to an app by ``create_app``, so
+any number of apps can live in one process (e.g. one per test).
+"""
+import functools
+from contextlib import contextmanager
+
+from flask import g
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+
+import database
+
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+
+
+@contextmanager
+def serialized_transaction():
+    """Hold SQLite's single-writer slot for the transaction run inside.
+
+    On SQLite this takes a process-wide lock and the transaction starts with
+    BEGIN IMMEDIATE, so concurrent writers queue for the lock instead of
+    failing with "database is locked" when a read transaction tries to
+    upgrade. The caller commits; anything left uncommitted is rolled back.
+    Nested inside another serialized transaction, the block just runs in
+    it. So does a block entered after the caller has already written: its
+    transaction holds the write lock, and its changes are kept. Other
+    databases run the block unchanged.
+    """
+    if (db.engine.dialect.name != 'sqlite' or not database.sqlite_tuning_enabled()
+            or g.get('sqlite_write')):
+        yield
+        return
+    db.session.flush()
+    if db.session().in_transaction() and database.has_sqlite_writes(db.session.connection()):
+        g.sqlite_write = True
+        try:
+            yield
+        finally:
+            g.sqlite_write = False
+        return
+    with database.sqlite_write_lock:
+        # End any read transaction so the next one begins IMMEDIATE
+        db.session.rollback()
+        g.sqlite_write = True
+        try:
+            yield
+        finally:
+            db.session.rollback()
+            g.sqlite_write = False
+
+
+def serialized_write(view):
+    """Run a view that writes as SQLite's single writer (see serialized_transaction)."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with serialized_transaction():
+            return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,198 @@
+"""
+Live updates: push checklist changes to every open page of that checklist.
+
+The service functions mark each call session they change. Once the
+transaction commits, the marks are handed to the request, and after the
+response is built the new (session, version) of each changed call is
+published on the agent's checklist channel. checklist.js listens on
+events(): a Server-Sent Events stream that coalesces a burst of changes
+into one message. The page then fetches only the task rows.
+
+Under asgi.py (see asgi_app) the streams run on the event loop and hold
+no thread, so a process serves any number of open pages. Under a WSGI
+server each open stream holds a thread for up to LIVE_STREAM_SECONDS:
+use threaded workers (gunicorn -k gthread --threads N) with more threads
+in total than agents keep checklists open, as a plain sync worker is
+blocked by a single open page.
+"""
+import asyncio
+import contextlib
+import io
+import json
+import time
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+
+from extensions import db
+
+
+def checklist_channel(user_id, call_type, checklist_type):
+    return f"checklist:{user_id}:{call_type}:{checklist_type}"
+
+
+def mark_changed(session_id):
+    """Publish the call's new version if the current transaction commits."""
+    if session_id is not None:
+        db.session.info.setdefault('changed_sessions', set()).add(session_id)
+
+
+def _committed(session):
+    changed = session.info.pop('changed_sessions', None)
+    if changed and has_app_context():
+        g.setdefault('changed_sessions', set()).update(changed)
+
+
+def _rolled_back(session):
+    session.info.pop('changed_sessions', None)
+
+
+def init_app(app):
+    from pubsub import make_broker
+    app.extensions['broker'] = make_broker(app.config['PUBSUB_URL'])
+    app.after_request(publish_changes)
+    if not event.contains(db.session, 'after_commit', _committed):
+        event.listen(db.session, 'after_commit', _committed)
+        event.listen(db.session, 'after_rollback', _rolled_back)
+
+
+def publish_changes(response):
+    changed = g.pop('changed_sessions', None)
+    if not changed:
+        return response
+    from models import CallSession
+    broker = current_app.extensions['broker']
+    rows = db.session.execute(db.select(
+        CallSession.id, CallSession.user_id, CallSession.call_type, CallSession.checklist_type,
+        CallSession.version
+    ).where(CallSession.id.in_(changed))).all()
+    for session_id, user_id, call_type, checklist_type, version in rows:
+        broker.publish(checklist_channel(user_id, call_type, checklist_type),
+                       {'session': session_id, 'version': version})
+    return response
+
+
+def event_stream(subscription, coalesce, heartbeat, lifetime):
+    """Server-Sent Events from a subscription, one per burst of changes.
+
+    Messages arriving within ``coalesce`` seconds of each other are sent as
+    the newest one. A comment every ``heartbeat`` seconds keeps proxies from
+    closing the connection. After ``lifetime`` seconds the stream ends and
+    the browser reconnects, so no server thread is held indefinitely.
+    """
+    deadline = time.monotonic() + lifetime
+    try:
+        yield "retry: 2000\n\n"
+        while time.monotonic() < deadline:
+            message = subscription.get(timeout=heartbeat)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            burst_end = time.monotonic() + coalesce
+            while (remaining := burst_end - time.monotonic()) > 0:
+                newer = subscription.get(timeout=remaining)
+                if newer is None:
+                    break
+                message = max(message, newer, key=lambda m: (m['session'], m['version']))
+            yield f"data: {json.dumps(message)}\n\n"
+    finally:
+        subscription.close()
+
+
+async def async_event_stream(subscription, coalesce, heartbeat, lifetime):
+    """event_stream() for a coroutine: waits for messages without holding a thread."""
+    deadline = time.monotonic() + lifetime
+    try:
+        yield "retry: 2000\n\n"
+        while time.monotonic() < deadline:
+            message = await subscription.aget(timeout=heartbeat)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            burst_end = time.monotonic() + coalesce
+            while (remaining := burst_end - time.monotonic()) > 0:
+                newer = await subscription.aget(timeout=remaining)
+                if newer is None:
+                    break
+                message = max(message, newer, key=lambda m: (m['session'], m['version']))
+            yield f"data: {json.dumps(message)}\n\n"
+    finally:
+        subscription.close()
+
+
+def asgi_app(app, threads=10):
+    """Serve a Flask app over ASGI, with its live streams on the event loop.
+
+    Requests go through a2wsgi's pool of ``threads`` threads. A stream
+    request also runs through Flask, for the login check and the request
+    hooks, but on a short-lived thread of its own: the view only subscribes
+    and leaves the subscription in the WSGI environ, and the stream is then
+    sent from the event loop.
+    """
+    try:
+        from a2wsgi import WSGIMiddleware
+        from a2wsgi.wsgi import build_environ
+    except ImportError as exc:
+        raise RuntimeError("ASGI mode needs the 'a2wsgi' package installed") from exc
+    from werkzeug.exceptions import HTTPException
+
+    wsgi = WSGIMiddleware(app, workers=threads)
+    urls = app.url_map.bind('localhost')
+
+    def is_stream(scope):
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            return False
+        try:
+            return urls.match(scope['path'], method='GET')[0] == 'checklists.checklist_events'
+        except HTTPException:
+            return False
+
+    def call_view(environ):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = headers
+
+        body = app(environ, start_response)
+        try:
+            return started, b"".join(body)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    async def application(scope, receive, send):
+        if not is_stream(scope):
+            return await wsgi(scope, receive, send)
+        environ = build_environ(scope, io.BytesIO())
+        environ['checklist.live_stream'] = None  # the view fills it in
+        started, body = await asyncio.to_thread(call_view, environ)
+        stream = environ['checklist.live_stream']
+        headers = [(name.lower().encode('latin1'), value.encode('latin1'))
+                   for name, value in started['headers']
+                   if stream is None or name.lower() != 'content-length']
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': headers})
+        if stream is None:
+            # Not logged in, or an error: an ordinary response
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        async def pump():
+            async with contextlib.aclosing(async_event_stream(*stream)) as chunks:
+                async for chunk in chunks:
+                    await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b""})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if tasks[0] in done:
+            tasks[0].result()
+
+    return application
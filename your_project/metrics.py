@@ -0,0 +1,192 @@
+"""
+Per-request instrumentation, served in Prometheus text format at /metrics.
+
+Every request is timed from before_request to after_request, and cursor
+events on the app's engine count and time the SQL statements it runs.
+Each request then lands in histograms labelled with its endpoint (the
+view name, so URLs with ids don't add labels):
+
+    checklist_request_seconds{endpoint}         time to build the response
+    checklist_request_queries{endpoint}         SQL statements per request
+    checklist_request_query_seconds{endpoint}   SQL time per request
+    checklist_requests_total{endpoint,status}   responses by status code
+    checklist_slow_queries_total{endpoint}      statements over SLOW_QUERY_MS
+
+A statement slower than SLOW_QUERY_MS (0 turns this off) is logged as a
+warning with its endpoint, or "-" outside requests, and its SQL, never
+its parameters. The cost per request is a few perf_counter calls and one
+short lock to update the histograms, so this is meant to stay on in
+production; METRICS_ENABLED=0 removes the hooks and the endpoint.
+
+Streamed responses (live updates, exports) are timed until their first
+byte. The numbers are per process: with several workers, scrape each of
+them, or sum the series across them. Set METRICS_TOKEN to require
+"Authorization: Bearer <token>" on /metrics.
+"""
+import bisect
+import hmac
+import logging
+import threading
+import time
+
+from flask import Blueprint, Response, abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('metrics', __name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label value, as Prometheus expects."""
+
+    def __init__(self, name, help, label, buckets):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        # label value -> [count per bucket (the last one is +Inf), sum]
+        self._series = {}
+
+    def observe(self, label_value, value):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total) in sorted(self._series.items()):
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:g}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, *label_values):
+        self._values[label_values] = self._values.get(label_values, 0) + 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            labels = ",".join(f'{label}="{value}"' for label, value in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+class Metrics:
+    """The app's request and SQL metrics; updated from request threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_seconds = Histogram('checklist_request_seconds', 'Time to build a response.',
+                                         'endpoint', SECONDS_BUCKETS)
+        self.request_queries = Histogram('checklist_request_queries', 'SQL statements run by a request.',
+                                         'endpoint', QUERY_BUCKETS)
+        self.request_query_seconds = Histogram('checklist_request_query_seconds',
+                                               'Time a request spent in SQL statements.',
+                                               'endpoint', SECONDS_BUCKETS)
+        self.requests = Counter('checklist_requests_total', 'Responses sent.', ('endpoint', 'status'))
+        self.slow_queries = Counter('checklist_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS.',
+                                    ('endpoint',))
+
+    def observe_request(self, endpoint, status, seconds, queries, query_seconds):
+        with self._lock:
+            self.request_seconds.observe(endpoint, seconds)
+            self.request_queries.observe(endpoint, queries)
+            self.request_query_seconds.observe(endpoint, query_seconds)
+            self.requests.inc(endpoint, str(status))
+
+    def observe_slow_query(self, endpoint):
+        with self._lock:
+            self.slow_queries.inc(endpoint)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.request_seconds, self.request_queries, self.request_query_seconds,
+                           self.requests, self.slow_queries):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Instrument an app; call before other after_request hooks are added, so their SQL is counted."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.extensions['metrics'] = Metrics()
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(finish_failed_request)
+    app.register_blueprint(bp)
+    with app.app_context():
+        engine = db.engine
+    slow_seconds = app.config['SLOW_QUERY_MS'] / 1000
+    metrics = app.extensions['metrics']
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        # One statement runs at a time on a connection; a failed one is simply overwritten
+        conn.info['metrics_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def finish_statement(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['metrics_started']
+        if has_request_context() and 'metrics_started' in g:
+            g.sql_statements += 1
+            g.sql_seconds += seconds
+        if slow_seconds and seconds >= slow_seconds:
+            endpoint = (request.endpoint or 'none') if has_request_context() else '-'
+            metrics.observe_slow_query(endpoint)
+            logger.warning("Slow query (%.1f ms) in %s: %s", seconds * 1000, endpoint, " ".join(statement.split()))
+
+
+def start_request():
+    g.metrics_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+
+def _observe(status):
+    started = g.pop('metrics_started', None)
+    if started is None or request.endpoint == 'metrics.metrics':
+        return
+    current_app.extensions['metrics'].observe_request(
+        request.endpoint or 'none', status, time.perf_counter() - started, g.sql_statements, g.sql_seconds)
+
+
+def finish_request(response):
+    _observe(response.status_code)
+    return response
+
+
+def finish_failed_request(exc):
+    # Errors normally pass through finish_request as a 500 response; this
+    # catches requests that failed before one was built
+    _observe(500)
+
+
+@bp.route("/metrics")
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        abort(401)
+    return Response(current_app.extensions['metrics'].render(),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,377 @@
+"""
+Tiny schema migration runner for the checklist app.
+
+``db.create_all()`` only creates missing tables, so changes to existing
+tables (new columns, indexes) are applied here. Each migration is an
+idempotent function that receives a connection; the highest applied
+version is stored in the ``schema_version`` table.
+
+Every server process upgrades on startup (see app.create_app), so several
+may start on an old database at once. The upgrade holds the database's
+write lock from its first statement (BEGIN IMMEDIATE on SQLite, an
+advisory lock on PostgreSQL) and reads the version under it: the first
+process migrates, the others wait and find nothing left to do. A
+migration that rebuilds a large table can outlast SQLite's busy timeout,
+so for those run ``flask --app app upgrade-db`` as a release step and
+start the servers with UPGRADE_DB=0.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import g
+from sqlalchemy import bindparam, inspect, text
+
+import database
+
+
+def _has_index(conn, table, name):
+    return any(ix['name'] == name for ix in inspect(conn).get_indexes(table))
+
+
+def _add_column(conn, table, name, ddl):
+    if not any(col['name'] == name for col in inspect(conn).get_columns(table)):
+        quoted = conn.dialect.identifier_preparer.quote(table)
+        conn.execute(text(f"ALTER TABLE {quoted} ADD COLUMN {name} {ddl}"))
+
+
+def _drop_index(conn, table, name):
+    if _has_index(conn, table, name):
+        conn.execute(text(f"DROP INDEX {name}"))
+
+
+def _create_index(conn, name, table, columns):
+    if not _has_index(conn, table, name):
+        conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+
+# ----- Migrations -----
+def _task_lookup_indexes(conn):
+    # Covers the filter_by(user_id, call_type, checklist_type, parent_task_id) lookups
+    _create_index(conn, 'ix_task_lookup', 'task',
+                  ['user_id', 'call_type', 'checklist_type', 'parent_task_id'])
+    # Covers subtask loads (Task.subtasks) and the subtask deletes
+    _create_index(conn, 'ix_task_parent_task_id', 'task', ['parent_task_id'])
+
+
+def _backfill_checklist_provision(conn):
+    if not inspect(conn).has_table('checklist_provision'):
+        return  # superseded by the shared templates (migration 4)
+    # Checklists that already have tasks must not be provisioned a second time
+    conn.execute(text(
+        "INSERT INTO checklist_provision (user_id, call_type, checklist_type, created_at) "
+        "SELECT DISTINCT t.user_id, t.call_type, t.checklist_type, CURRENT_TIMESTAMP FROM task t "
+        "WHERE t.parent_task_id IS NULL AND NOT EXISTS ("
+        "SELECT 1 FROM checklist_provision p WHERE p.user_id = t.user_id "
+        "AND p.call_type = t.call_type AND p.checklist_type = t.checklist_type)"
+    ))
+
+
+def _call_sessions(conn):
+    _add_column(conn, 'task', 'position', 'INTEGER')
+    _add_column(conn, 'task', 'session_id', 'INTEGER REFERENCES call_session (id)')
+    _create_index(conn, 'ix_task_session_id', 'task', ['session_id'])
+    # Existing tasks predate positions; re-provision every checklist so the
+    # defaults get bit positions. The old rows move to call sessions in
+    # migration 10.
+    if inspect(conn).has_table('checklist_provision'):
+        conn.execute(text("DELETE FROM checklist_provision"))
+
+
+def _shared_templates(conn):
+    _add_column(conn, 'call_session', 'template_id', 'INTEGER REFERENCES checklist_template (id)')
+    _drop_index(conn, 'call_session', 'ix_call_session_lookup')
+    _create_index(conn, 'ix_call_session_template', 'call_session', ['user_id', 'template_id', 'id'])
+    # Per-agent copies of the defaults are replaced by the shared templates.
+    # Custom replacements of edited subtasks keep their position and are
+    # re-attached to the template parent when the checklist is built.
+    conn.execute(text(
+        "UPDATE task SET parent_task_id = NULL WHERE parent_task_id IN ("
+        "SELECT id FROM task WHERE session_id IS NULL AND position IS NOT NULL)"
+    ))
+    conn.execute(text("DELETE FROM task WHERE session_id IS NULL AND position IS NOT NULL"))
+    conn.execute(text("DROP TABLE IF EXISTS checklist_provision"))
+
+
+def _call_session_version(conn):
+    _add_column(conn, 'call_session', 'version', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def _completion_counters(conn):
+    _add_column(conn, 'user', 'is_supervisor', 'BOOLEAN NOT NULL DEFAULT FALSE')
+    _count_calls(conn)
+
+
+def _count_calls(conn):
+    # Count the calls made so far; from here on the app keeps these current
+    conn.execute(text("DELETE FROM call_stat"))
+    conn.execute(text("DELETE FROM item_stat"))
+    conn.execute(text(
+        "INSERT INTO call_stat (user_id, template_id, calls) "
+        "SELECT user_id, template_id, COUNT(*) FROM call_session GROUP BY user_id, template_id"
+    ))
+    conn.execute(text(
+        "INSERT INTO item_stat (user_id, template_id, position, done) "
+        "SELECT s.user_id, s.template_id, i.position, SUM((s.done_mask >> i.position) & 1) "
+        "FROM call_session s JOIN template_item i ON i.template_id = s.template_id "
+        "GROUP BY s.user_id, s.template_id, i.position"
+    ))
+
+
+def _rebuild_task_table(conn):
+    from models import Task
+    columns = ', '.join(column.name for column in Task.__table__.columns)
+    for index in Task.__table__.indexes:
+        _drop_index(conn, 'task', index.name)
+    conn.execute(text("ALTER TABLE task RENAME TO task_old"))
+    Task.__table__.create(conn)
+    conn.execute(text(f"INSERT INTO task ({columns}) SELECT {columns} FROM task_old"))
+    conn.execute(text("DROP TABLE task_old"))
+
+
+def _task_cascade(conn):
+    # Subtasks whose parent is gone would violate the constraint; their
+    # own subtasks become orphans in turn, so repeat until none are left
+    while conn.execute(text(
+        "DELETE FROM task WHERE parent_task_id IS NOT NULL "
+        "AND parent_task_id NOT IN (SELECT id FROM task)"
+    )).rowcount:
+        pass
+    if conn.dialect.name == 'sqlite':
+        # SQLite cannot alter a constraint: rebuild the table from the model
+        _rebuild_task_table(conn)
+        return
+    for foreign_key in inspect(conn).get_foreign_keys('task'):
+        if foreign_key['referred_table'] == 'task' and foreign_key['name']:
+            conn.execute(text(f"ALTER TABLE task DROP CONSTRAINT {foreign_key['name']}"))
+    conn.execute(text(
+        "ALTER TABLE task ADD CONSTRAINT task_parent_task_id_fkey FOREIGN KEY (parent_task_id) "
+        "REFERENCES task (id) ON DELETE CASCADE"
+    ))
+
+
+def _sync_changes(conn):
+    # The sync_change table itself comes from create_all(). Task ids become
+    # sync keys, so SQLite must stop reusing the ids of deleted tasks.
+    if conn.dialect.name != 'sqlite':
+        return
+    if 'AUTOINCREMENT' not in conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'task'"
+    )).scalar().upper():
+        _rebuild_task_table(conn)
+    # Continue after every id used so far, archived tasks included
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'task'"))
+    conn.execute(text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'task', COALESCE(MAX(id), 0) FROM ("
+        "SELECT MAX(id) AS id FROM task UNION ALL SELECT MAX(id) FROM task_archive)"
+    ))
+
+
+def _sync_change_txid(conn):
+    _add_column(conn, 'sync_change', 'txid', 'BIGINT')
+
+
+def _password_hash_length(conn):
+    # scrypt hashes are longer than the 150 characters of the first schema;
+    # SQLite ignores the length, server databases reject or cut the hash
+    table = conn.dialect.identifier_preparer.quote('user')
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN password_hash TYPE VARCHAR(255)"))
+    elif conn.dialect.name in ('mysql', 'mariadb'):
+        conn.execute(text(f"ALTER TABLE {table} MODIFY password_hash VARCHAR(255) NOT NULL"))
+
+
+def _drop_task_lookup_index(conn):
+    # Tasks are found by call, id or parent since the call sessions; once the
+    # legacy rows are moved (migration 10), nothing filters on these columns
+    _drop_index(conn, 'task', 'ix_task_lookup')
+
+
+def _legacy_template(conn, call_type, checklist_type):
+    from models import ChecklistTemplate
+    from services import insert_template_items
+
+    template_id = conn.execute(text(
+        "SELECT id FROM checklist_template WHERE call_type = :call_type AND checklist_type = :checklist_type"
+    ), {'call_type': call_type, 'checklist_type': checklist_type}).scalar()
+    if template_id is None:
+        template_id = conn.execute(
+            ChecklistTemplate.__table__.insert().returning(ChecklistTemplate.id),
+            {'call_type': call_type, 'checklist_type': checklist_type, 'created_at': datetime.utcnow()}
+        ).scalar_one()
+        insert_template_items(conn, template_id, call_type, checklist_type)
+    return template_id
+
+
+def _legacy_session(conn, user_id, call_type, checklist_type, template_id, started_at):
+    """The agent's first call on a template, started for the legacy tasks if there is none."""
+    session_id = conn.execute(text(
+        "SELECT MIN(id) FROM call_session WHERE user_id = :user_id AND template_id = :template_id"
+    ), {'user_id': user_id, 'template_id': template_id}).scalar()
+    if session_id is not None:
+        return session_id, False
+    session_id = conn.execute(text(
+        "INSERT INTO call_session (user_id, template_id, call_type, checklist_type, started_at, "
+        "done_mask, hidden_mask, version) VALUES (:user_id, :template_id, :call_type, :checklist_type, "
+        ":started_at, 0, 0, 0) RETURNING id"
+    ), {'user_id': user_id, 'template_id': template_id, 'call_type': call_type,
+        'checklist_type': checklist_type, 'started_at': started_at}).scalar_one()
+    # Syncing clients see the call start, as for any new call
+    txid = "txid_current()" if conn.dialect.name == 'postgresql' else "NULL"
+    conn.execute(text(
+        f"INSERT INTO sync_change (session_id, created_at, txid) VALUES (:session_id, :created_at, {txid})"
+    ), {'session_id': session_id, 'created_at': datetime.utcnow()})
+    return session_id, True
+
+
+def _legacy_tasks(conn):
+    # Before call sessions every agent had a copy of each default checklist
+    # (session_id and position both NULL). The copies of template items
+    # become bits on the agent's first call: done ones set, deleted ones
+    # hidden. The agent's own tasks move to that call with their subtasks.
+    rows = conn.execute(text(
+        "SELECT id, user_id, call_type, checklist_type, text, done, parent_task_id, created_at "
+        "FROM task WHERE session_id IS NULL ORDER BY id"
+    )).all()
+    checklists, children = {}, {}
+    for row in rows:
+        if row.parent_task_id is None:
+            checklists.setdefault((row.user_id, row.call_type, row.checklist_type), []).append(row)
+        else:
+            children.setdefault(row.parent_task_id, []).append(row)
+
+    def subtree(row):
+        yield row.id
+        for child in children.get(row.id, []):
+            yield from subtree(child)
+
+    started = False
+    for (user_id, call_type, checklist_type), tops in checklists.items():
+        template_id = _legacy_template(conn, call_type, checklist_type)
+        items = conn.execute(text(
+            "SELECT id, position, text, parent_id FROM template_item WHERE template_id = :template_id "
+            "ORDER BY position"
+        ), {'template_id': template_id}).all()
+        session_id, new = _legacy_session(conn, user_id, call_type, checklist_type, template_id,
+                                          min((row.created_at for row in tops if row.created_at),
+                                              default=datetime.utcnow()))
+        started |= new
+        unmatched = [item for item in items if item.parent_id is None]
+        done = hidden = 0
+        moved, deleted = [], []
+        for row in tops:
+            item = next((item for item in unmatched if item.text == row.text), None)
+            if item is None:
+                moved.extend(subtree(row))
+                continue
+            unmatched.remove(item)
+            deleted.append(row.id)
+            done |= bool(row.done) << item.position
+            sub_items = [sub for sub in items if sub.parent_id == item.id]
+            for child in children.get(row.id, []):
+                sub_item = next((sub for sub in sub_items if sub.text == child.text), None)
+                if sub_item is None:
+                    # Kept as a task of the call in its own right
+                    conn.execute(text("UPDATE task SET parent_task_id = NULL WHERE id = :id"), {'id': child.id})
+                    moved.extend(subtree(child))
+                else:
+                    sub_items.remove(sub_item)
+                    deleted.extend(subtree(child))
+                    done |= bool(child.done) << sub_item.position
+        for item in unmatched:
+            # Deleted by the agent, together with its sub-items
+            hidden |= 1 << item.position
+            for sub in items:
+                if sub.parent_id == item.id:
+                    hidden |= 1 << sub.position
+        if moved:
+            conn.execute(text("UPDATE task SET session_id = :session_id WHERE id IN :ids")
+                         .bindparams(bindparam('ids', expanding=True)), {'session_id': session_id, 'ids': moved})
+        if deleted:
+            conn.execute(text("DELETE FROM task WHERE id IN :ids")
+                         .bindparams(bindparam('ids', expanding=True)), {'ids': deleted})
+        if new:
+            conn.execute(text("UPDATE call_session SET done_mask = :done, hidden_mask = :hidden WHERE id = :id"),
+                         {'done': done, 'hidden': hidden, 'id': session_id})
+    if started:
+        _count_calls(conn)
+
+
+MIGRATIONS = [
+    (1, "Composite indexes for the Task checklist lookup", _task_lookup_indexes),
+    (2, "Provision markers for existing checklists", _backfill_checklist_provision),
+    (3, "Call sessions with bitmask task state", _call_sessions),
+    (4, "Shared checklist templates", _shared_templates),
+    (5, "Call session version counter", _call_session_version),
+    (6, "Supervisor role and completion counters", _completion_counters),
+    (7, "Delete subtasks with their parent task", _task_cascade),
+    (8, "Sync change log and unique task ids", _sync_changes),
+    (9, "Transaction ids of sync changes", _sync_change_txid),
+    (10, "Legacy tasks moved to call sessions", _legacy_tasks),
+    (11, "Room for scrypt password hashes", _password_hash_length),
+    (12, "Drop the unused task lookup index", _drop_task_lookup_index),
+]
+
+HEAD = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    if not inspect(conn).has_table('schema_version'):
+        return None
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+
+
+def _stamp(conn, version):
+    conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {'v': version})
+
+
+# Key of the PostgreSQL advisory lock held while upgrading
+UPGRADE_LOCK_KEY = 7_410_326_511
+
+
+@contextmanager
+def _locked_transaction(db):
+    """A transaction holding the database's write lock, so concurrent upgrades queue."""
+    if db.engine.dialect.name == 'sqlite':
+        if database.sqlite_tuning_enabled():
+            # database._sqlite_begin then starts the transaction IMMEDIATE
+            g.sqlite_write = True
+            try:
+                with db.engine.begin() as conn:
+                    yield conn
+            finally:
+                g.sqlite_write = False
+        else:
+            # pysqlite leaves BEGIN to us until the first INSERT/UPDATE/DELETE
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                yield conn
+                conn.commit()
+        return
+    with db.engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': UPGRADE_LOCK_KEY})
+        yield conn
+
+
+def upgrade(db):
+    """Create missing tables and apply any pending migrations."""
+    with db.engine.connect() as conn:
+        if current_version(conn) == HEAD:
+            return HEAD  # the usual case, without taking the write lock
+    with _locked_transaction(db) as conn:
+        fresh = not inspect(conn).has_table('task')
+        db.metadata.create_all(conn)
+        if not inspect(conn).has_table('schema_version'):
+            conn.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+        version = current_version(conn)
+        if fresh:
+            # create_all() already built the current schema
+            _stamp(conn, HEAD)
+            return HEAD
+        version = version or 0
+        for number, _description, migrate in MIGRATIONS:
+            if number > version:
+                migrate(conn)
+                _stamp(conn, number)
+                version = number
+    return version
@@ -0,0 +1,191 @@
+"""
+Database models of the checklist app.
+"""
+from datetime import datetime
+
+from flask import current_app
+from flask_login import UserMixin
+
+from extensions import db
+
+
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(150), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    # Supervisors can open the completion dashboard
+    is_supervisor = db.Column(db.Boolean, nullable=False, default=False)
+    
+    tasks = db.relationship('Task', backref='owner', lazy=True)
+
+    def set_password(self, password):
+        self.password_hash = current_app.extensions['password_hasher'].hash(password)
+        if self.id is not None:
+            current_app.extensions['user_cache'].invalidate(self.id)
+    
+    def check_password(self, password):
+        return current_app.extensions['password_hasher'].verify(self.password_hash, password)
+
+
+class Task(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    call_type = db.Column(db.String(50), nullable=False)
+    checklist_type = db.Column(db.String(50), nullable=False)
+    text = db.Column(db.String(250), nullable=False)
+    done = db.Column(db.Boolean, default=False)
+    # Deleting a task deletes its whole subtree in the database
+    parent_task_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), nullable=True)
+    # Relationship for subtasks (if any); passive_deletes leaves them to the cascade
+    subtasks = db.relationship('Task', backref=db.backref('parent', remote_side=[id]), lazy=True,
+                               order_by='Task.id', passive_deletes=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set when the task replaces an edited template item: the item's position
+    position = db.Column(db.Integer, nullable=True)
+    # Custom tasks belong to the call they were added in
+    session_id = db.Column(db.Integer, db.ForeignKey('call_session.id'), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_task_parent_task_id', 'parent_task_id'),
+        db.Index('ix_task_session_id', 'session_id'),
+        # Ids of deleted tasks are never handed out again: they live on in
+        # task_archive and in the keys of syncing clients
+        {'sqlite_autoincrement': True},
+    )
+
+
+class TaskArchive(db.Model):
+    """Cold storage for Task rows past the retention period (see compaction.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    call_type = db.Column(db.String(50), nullable=False)
+    checklist_type = db.Column(db.String(50), nullable=False)
+    text = db.Column(db.String(250), nullable=False)
+    done = db.Column(db.Boolean)
+    parent_task_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime)
+    position = db.Column(db.Integer, nullable=True)
+    session_id = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ChecklistTemplate(db.Model):
+    """A default checklist, stored once and shared by every agent."""
+    id = db.Column(db.Integer, primary_key=True)
+    call_type = db.Column(db.String(50), nullable=False)
+    checklist_type = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    items = db.relationship('TemplateItem', backref='template', lazy=True,
+                            order_by='TemplateItem.position')
+
+    __table_args__ = (
+        db.UniqueConstraint('call_type', 'checklist_type', name='uq_checklist_template'),
+    )
+
+
+class TemplateItem(db.Model):
+    """One item of a ChecklistTemplate; position is its bit in the CallSession masks."""
+    id = db.Column(db.Integer, primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('checklist_template.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    text = db.Column(db.String(250), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('template_item.id'), nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('template_id', 'position', name='uq_template_item_position'),
+    )
+
+
+class CallSession(db.Model):
+    """One call taken by an agent on a checklist.
+
+    Starting a new call is a single INSERT. The agent's progress through the
+    shared template is kept as two bitmasks indexed by TemplateItem.position,
+    so no template text is ever copied per agent or per call. The latest
+    session for a (user, template) pair is the agent's current state.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    template_id = db.Column(db.Integer, db.ForeignKey('checklist_template.id'), nullable=False)
+    call_type = db.Column(db.String(50), nullable=False)
+    checklist_type = db.Column(db.String(50), nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    done_mask = db.Column(db.BigInteger, nullable=False, default=0)
+    hidden_mask = db.Column(db.BigInteger, nullable=False, default=0)
+    # Bumped on every change to the call's checklist
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_call_session_template', 'user_id', 'template_id', 'id'),
+    )
+
+    def is_done(self, position):
+        return bool(self.done_mask >> position & 1)
+
+    def is_hidden(self, position):
+        return bool(self.hidden_mask >> position & 1)
+
+
+class CallStat(db.Model):
+    """Calls an agent has started on a checklist (see stats.py)."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('checklist_template.id'), primary_key=True)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ItemStat(db.Model):
+    """Calls in which an agent ticked a template item (see stats.py)."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('checklist_template.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    done = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CallEvent(db.Model):
+    """One entry of the append-only call event log (see events.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('call_session.id'), nullable=False)
+    # What was checked: a template item (with its position) or a custom task
+    item_id = db.Column(db.Integer, nullable=True)
+    task_id = db.Column(db.Integer, nullable=True)
+    position = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_call_event_session', 'session_id', 'id'),
+        db.Index('ix_call_event_user_time', 'user_id', 'created_at'),
+    )
+
+
+class SyncChange(db.Model):
+    """An item or custom task of a call that changed; the id is the sync cursor (see sync.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('call_session.id'), nullable=False)
+    # A template item's position (also set for a task that replaces the item),
+    # a custom task, or neither when the call was started
+    position = db.Column(db.Integer, nullable=True)
+    task_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # The writing transaction, on PostgreSQL only: there it is the cursor
+    txid = db.Column(db.BigInteger, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_sync_change_session', 'session_id', 'id'),
+    )
+
+
+class CachedUser(UserMixin):
+    """Identity of a logged-in user, as kept in the app's user cache.
+
+    Routes only need the id, username and role of current_user, so the
+    cache holds these plain values rather than ORM instances tied to one
+    request.
+    """
+
+    def __init__(self, id, username, is_supervisor=False):
+        self.id = id
+        self.username = username
+        self.is_supervisor = is_supervisor
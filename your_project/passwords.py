@@ -0,0 +1,70 @@
+"""
+Password hashing policy for the checklist app.
+
+Hashes use werkzeug's formats. The policy is a werkzeug method string with
+its cost, e.g. ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``. Stored
+hashes made under another method still verify, and login rehashes them.
+
+Hashing is deliberately slow, so it runs on a bounded thread pool (the
+hashlib KDFs release the GIL): at most PASSWORD_HASH_WORKERS hashes run at
+once, and at most PASSWORD_HASH_QUEUE more wait. Each of those holds a
+request thread, so when the server's thread count is known (SERVER_THREADS)
+at most half of its threads are let in. Further logins fail at once with
+PasswordPoolBusy (a 503) instead of piling up on the CPUs or tying up the
+threads other pages need.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords under one policy on a bounded pool.
+
+    ``workers=0`` hashes inline in the calling thread with no limit, as
+    werkzeug does on its own. ``threads`` is the number of request threads
+    of the server process, if known; at most half of them wait on hashes.
+    """
+
+    def __init__(self, method='scrypt', workers=None, queue=64, threads=None):
+        # Normalise e.g. "scrypt" to "scrypt:32768:8:1" so stored hashes compare
+        self.method = generate_password_hash('', method).split('$', 1)[0]
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.slots = self.workers + queue
+        if threads:
+            self.slots = min(self.slots, max(threads // 2, 1))
+        self._executor = None
+        self._slots = None
+        if self.workers:
+            self._executor = ThreadPoolExecutor(max_workers=min(self.workers, self.slots),
+                                                thread_name_prefix='password')
+            self._slots = threading.BoundedSemaphore(self.slots)
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
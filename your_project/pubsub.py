@@ -0,0 +1,150 @@
+"""
+Publish/subscribe for pushing checklist changes to open pages.
+
+MemoryBroker delivers within one process, which is enough for a single
+server process and for tests. RedisBroker delivers across processes and
+needs the optional ``redis`` package: one thread per process listens on
+Redis and hands the messages to the process's own subscriptions, so open
+pages share that one connection. Messages are JSON-serialisable dicts.
+
+A subscription is read with get() from a thread, or with aget() from an
+asyncio event loop, which waits without holding a thread (see
+live.asgi_app).
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Messages published on one channel since subscribing."""
+
+    def __init__(self, close):
+        self._queue = queue.Queue()
+        self._close = close
+        self._wake = None
+
+    def put(self, message):
+        self._queue.put(message)
+        wake = self._wake
+        if wake is not None:
+            wake()
+
+    def get(self, timeout=None):
+        """Next message, or None if none arrives within ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout=None):
+        """get() for a coroutine on an event loop; only one may wait at a time."""
+        loop = asyncio.get_running_loop()
+        arrived = asyncio.Event()
+        # Set before looking at the queue, so a message put meanwhile still wakes us
+        self._wake = lambda: loop.call_soon_threadsafe(arrived.set)
+        try:
+            try:
+                return self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                await asyncio.wait_for(arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            return self._queue.get_nowait()
+        finally:
+            self._wake = None
+
+    def close(self):
+        self._close(self)
+
+
+class MemoryBroker:
+    """In-process broker: a set of subscriber queues per channel."""
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(lambda sub: self._unsubscribe(channel, sub))
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, channel, subscription):
+        with self._lock:
+            subscribers = self._channels.get(channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._channels.pop(channel, None)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def stats(self):
+        with self._lock:
+            return {'channels': len(self._channels),
+                    'subscribers': sum(len(subs) for subs in self._channels.values())}
+
+
+class RedisBroker:
+    """Broker on Redis pub/sub, for running several app processes.
+
+    The listener thread starts with the first subscription and takes every
+    message under ``prefix``; those without a subscriber here are dropped.
+    """
+
+    def __init__(self, url, prefix='checklist:'):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("PUBSUB_URL needs the 'redis' package installed") from exc
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._local = MemoryBroker()
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='pubsub-listener', daemon=True)
+                self._listener.start()
+        return self._local.subscribe(channel)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+                for message in pubsub.listen():
+                    if message['type'] == 'pmessage':
+                        channel = message['channel'].decode()[len(self.prefix):]
+                        self._local.publish(channel, json.loads(message['data']))
+            except Exception:
+                # Pages miss the changes made meanwhile until their next reload
+                logger.exception("Lost the Redis pub/sub connection; reconnecting")
+                time.sleep(1)
+
+    def publish(self, channel, message):
+        self._client.publish(self.prefix + channel, json.dumps(message))
+
+    def stats(self):
+        return {'backend': 'redis', **self._local.stats()}
+
+
+def make_broker(url=None):
+    """Redis broker if a URL is configured, otherwise an in-process one."""
+    if url:
+        return RedisBroker(url)
+    return MemoryBroker()
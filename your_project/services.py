@@ -0,0 +1,305 @@
+"""
+Checklist templates and call sessions: the operations behind the routes.
+
+Callers commit; these functions only add, flush and update.
+"""
+from collections import namedtuple
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db, serialized_transaction
+from events import CALL_STARTED, CALL_FINISHED, record_event, record_toggle
+from live import mark_changed
+from stats import record_call_started, record_item_toggle
+from sync import record_change
+from models import Task, ChecklistTemplate, TemplateItem, CallSession
+
+
+# ----- Checklist Templates -----
+def provision_template(call_type, checklist_type):
+    """Return the shared template for a checklist, creating it on first use.
+
+    A miss takes the write lock and looks again, so on SQLite concurrent
+    first requests queue and all but the first find the template. On other
+    databases the unique (call_type, checklist_type) constraint settles the
+    race: the losers back off and read the winner's row. The template and
+    its items are committed in one transaction with two bulk INSERTs
+    (top-level items, then objection sub-items).
+    """
+    template = ChecklistTemplate.query.filter_by(call_type=call_type, checklist_type=checklist_type).first()
+    if template is not None:
+        return template
+    with serialized_transaction():
+        return _create_template(call_type, checklist_type)
+
+
+def _create_template(call_type, checklist_type):
+    template = ChecklistTemplate.query.filter_by(call_type=call_type, checklist_type=checklist_type).first()
+    if template is not None:
+        return template
+    try:
+        template = ChecklistTemplate(call_type=call_type, checklist_type=checklist_type)
+        db.session.add(template)
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return ChecklistTemplate.query.filter_by(call_type=call_type, checklist_type=checklist_type).one()
+    insert_template_items(db.session, template.id, call_type, checklist_type)
+    db.session.commit()
+    return template
+
+
+def insert_template_items(connection, template_id, call_type, checklist_type):
+    """Insert a new template's default items on a session or connection."""
+    from defaults import DEFAULT_TASKS, DEFAULT_OBJECTION_SUBTASKS, OBJECTION_CHECKLISTS
+
+    defaults = DEFAULT_TASKS.get((call_type, checklist_type), [])
+    rows = [
+        {'template_id': template_id, 'position': position, 'text': task_def['text']}
+        for position, task_def in enumerate(defaults)
+    ]
+    if not rows:
+        return
+    inserted = connection.execute(
+        db.insert(TemplateItem).returning(TemplateItem.id, TemplateItem.text,
+                                          sort_by_parameter_order=True), rows
+    ).all()
+    if (call_type, checklist_type) in OBJECTION_CHECKLISTS:
+        sub_rows = [
+            {'template_id': template_id, 'text': sub['text'], 'parent_id': item_id}
+            for item_id, text in inserted if text == "Objection"
+            for sub in DEFAULT_OBJECTION_SUBTASKS
+        ]
+        # Sub-item bits follow the top-level items
+        for position, row in enumerate(sub_rows, start=len(rows)):
+            row['position'] = position
+        if sub_rows:
+            connection.execute(db.insert(TemplateItem), sub_rows)
+
+
+# ----- Call Sessions -----
+ChecklistItem = namedtuple('ChecklistItem', 'id text done position is_default subtasks')
+
+
+def latest_call_session(user_id, template_id):
+    return CallSession.query.filter_by(
+        user_id=user_id, template_id=template_id
+    ).order_by(CallSession.id.desc()).first()
+
+
+def start_call_session(user_id, template):
+    call_session = CallSession(user_id=user_id, template_id=template.id,
+                               call_type=template.call_type, checklist_type=template.checklist_type)
+    db.session.add(call_session)
+    db.session.flush()
+    mark_changed(call_session.id)
+    record_change(call_session.id)
+    record_call_started(user_id, template.id)
+    record_event(CALL_STARTED, call_session.id, user_id)
+    return call_session
+
+
+def new_call_session(user_id, template):
+    """Finish the agent's current call on a template and start the next one."""
+    previous = latest_call_session(user_id, template.id)
+    if previous is not None:
+        record_event(CALL_FINISHED, previous.id, user_id)
+    return start_call_session(user_id, template)
+
+
+def current_call_session(user_id, template):
+    """Return the user's latest CallSession for a template, starting one if needed."""
+    call_session = latest_call_session(user_id, template.id)
+    if call_session is None:
+        call_session = start_call_session(user_id, template)
+    return call_session
+
+
+def touch_session(session_id, task=None):
+    """Bump a call's version after a change, recording the changed custom task if given."""
+    mark_changed(session_id)
+    db.session.execute(db.update(CallSession).where(CallSession.id == session_id).values(
+        version=CallSession.version + 1
+    ))
+    if task is not None and session_id is not None:
+        record_change(session_id, position=task.position, task_id=task.id)
+
+
+def toggle_item_state(call_session, item, done=None):
+    """Flip (or set, if done is given) a template item's bit on the session.
+
+    Returns the item's new done state. The item's completion counter moves
+    only when the bit actually changes.
+    """
+    bit = 1 << item.position
+    update = db.update(CallSession).where(CallSession.id == call_session.id)
+    if done is None:
+        # XOR, spelled (a | b) - (a & b) because SQLite has no XOR operator
+        done_mask = CallSession.done_mask.bitwise_or(bit) - CallSession.done_mask.bitwise_and(bit)
+    elif done:
+        update = update.where(CallSession.done_mask.bitwise_and(bit) == 0)
+        done_mask = CallSession.done_mask.bitwise_or(bit)
+    else:
+        update = update.where(CallSession.done_mask.bitwise_and(bit) != 0)
+        done_mask = CallSession.done_mask.bitwise_and(~bit)
+    new_mask = db.session.execute(
+        update.values(done_mask=done_mask, version=CallSession.version + 1).returning(CallSession.done_mask)
+    ).scalar_one_or_none()
+    if new_mask is None:
+        return done  # already in the requested state
+    mark_changed(call_session.id)
+    record_change(call_session.id, position=item.position)
+    new_done = bool(new_mask & bit)
+    record_item_toggle(call_session.user_id, call_session.template_id, item.position, new_done)
+    record_toggle(new_done, call_session.id, call_session.user_id, item_id=item.id, position=item.position)
+    return new_done
+
+
+def hide_items(call_session, positions):
+    mark_changed(call_session.id)
+    bits = 0
+    for position in positions:
+        bits |= 1 << position
+    db.session.execute(db.update(CallSession).where(CallSession.id == call_session.id).values(
+        hidden_mask=CallSession.hidden_mask.bitwise_or(bits), version=CallSession.version + 1
+    ))
+    for position in positions:
+        record_change(call_session.id, position=position)
+
+
+def replace_item(call_session, template, item, text):
+    """Replace a template item for this call with a custom task in its place."""
+    task = Task(
+        user_id=call_session.user_id,
+        call_type=template.call_type,
+        checklist_type=template.checklist_type,
+        text=text,
+        done=call_session.is_done(item.position),
+        position=item.position,
+        session_id=call_session.id
+    )
+    db.session.add(task)
+    hide_items(call_session, [item.position])
+    db.session.flush()
+    return task
+
+
+def item_positions(item):
+    """Positions of an item and its sub-items, which are hidden together."""
+    sub_positions = db.session.scalars(db.select(TemplateItem.position).filter_by(parent_id=item.id)).all()
+    return [item.position, *sub_positions]
+
+
+def add_custom_task(call_session, text):
+    task = Task(
+        user_id=call_session.user_id,
+        call_type=call_session.call_type,
+        checklist_type=call_session.checklist_type,
+        text=text,
+        done=False,
+        session_id=call_session.id
+    )
+    db.session.add(task)
+    db.session.flush()
+    touch_session(call_session.id, task)
+    return task
+
+
+def toggle_custom_task(task, done=None):
+    """Flip (or set, if done is given) a custom task's done state.
+
+    A custom Objection task on a sales/support start call is not toggled;
+    instead its sub-checklist is created on first click. Returns True when
+    that happened.
+    """
+    from defaults import DEFAULT_OBJECTION_SUBTASKS, OBJECTION_CHECKLISTS
+
+    if task.text == "Objection" and (task.call_type, task.checklist_type) in OBJECTION_CHECKLISTS:
+        if task.subtasks:
+            return False
+        for sub in DEFAULT_OBJECTION_SUBTASKS:
+            db.session.add(Task(
+                user_id=task.user_id,
+                call_type=task.call_type,
+                checklist_type=task.checklist_type,
+                text=sub['text'],
+                done=sub['done'],
+                parent_task_id=task.id,
+                session_id=task.session_id
+            ))
+        touch_session(task.session_id)
+        return True
+    toggle_custom_subtask(task, done)
+    return False
+
+
+def toggle_custom_subtask(task, done=None):
+    """Flip (or set, if done is given) a custom task or subtask's done state."""
+    task.done = not task.done if done is None else done
+    touch_session(task.session_id, task)
+    if task.session_id is not None:
+        record_toggle(task.done, task.session_id, task.user_id, task_id=task.id)
+
+
+def edit_custom_task(task, text):
+    task.text = text
+    touch_session(task.session_id, task)
+
+
+def task_subtree(task_ids):
+    """Recursive CTE of the given task ids and the ids of all their descendants."""
+    tree = db.select(Task.id).where(Task.id.in_(task_ids)).cte('subtree', recursive=True)
+    return tree.union_all(db.select(Task.id).join(tree, Task.parent_task_id == tree.c.id))
+
+
+def delete_custom_task(task):
+    session_id = task.session_id
+    touch_session(session_id, task)
+    # One DELETE; ON DELETE CASCADE removes the subtasks at any depth
+    db.session.execute(db.delete(Task).where(Task.id == task.id))
+
+
+def load_checklist(template, call_session):
+    """Build the checklist tree for a call.
+
+    Template items take their done/deleted state from the session bitmasks;
+    the custom tasks of this call are loaded with one SELECT. A custom task
+    with a position replaces an edited template item at that spot.
+    """
+    custom = Task.query.filter_by(session_id=call_session.id).order_by(Task.id).all()
+    by_position = {item.position: item for item in template.items}
+
+    nodes = {}
+    parents = {}
+    for item in template.items:
+        if call_session.is_hidden(item.position):
+            continue
+        key = ('item', item.id)
+        nodes[key] = ChecklistItem(item.id, item.text, call_session.is_done(item.position),
+                                   item.position, True, [])
+        parents[key] = ('item', item.parent_id) if item.parent_id else None
+    for task in custom:
+        key = ('task', task.id)
+        nodes[key] = ChecklistItem(task.id, task.text, task.done, task.position, False, [])
+        replaced = by_position.get(task.position)
+        if task.parent_task_id:
+            parents[key] = ('task', task.parent_task_id)
+        elif replaced is not None and replaced.parent_id:
+            parents[key] = ('item', replaced.parent_id)
+        else:
+            parents[key] = None
+
+    tasks = []
+    for key, node in nodes.items():
+        parent = parents[key]
+        if parent is None:
+            tasks.append(node)
+        elif parent in nodes:
+            nodes[parent].subtasks.append(node)
+
+    def order(node):
+        return (node.position is None, node.position or 0, not node.is_default, node.id)
+
+    for node in tasks:
+        node.subtasks.sort(key=order)
+    return sorted(tasks, key=order)
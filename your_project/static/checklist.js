@@ -0,0 +1,185 @@
+// Progressive enhancement for checklist.html. Clicks update the page at once
+// and are queued as operations; the queue is flushed to the batch endpoint
+// every few seconds (or straight away for adds), so a call costs one or two
+// commits instead of one per click. Changes made in other tabs arrive over
+// a Server-Sent Events stream and only the task rows are re-fetched. Links
+// and the form keep their normal targets for when JavaScript is unavailable.
+document.addEventListener('DOMContentLoaded', function () {
+    var FLUSH_INTERVAL = 2000;
+    var MAX_QUEUE = 10;
+
+    var list = document.getElementById('task-list');
+    var form = document.getElementById('add-task-form');
+    if (!list) {
+        return;
+    }
+
+    var session = parseInt(list.dataset.session, 10);
+    var version = parseInt(list.dataset.version, 10);
+    var queue = [];
+    var inflight = false;
+    var refreshPending = false;
+
+    function payload(ops) {
+        return JSON.stringify({session: session, version: version, ops: ops});
+    }
+
+    function enqueue(op) {
+        op.ts = Date.now();
+        // A newer toggle or delete of the same task supersedes a queued toggle
+        queue = queue.filter(function (queued) {
+            return !(queued.op === 'toggle' && queued.kind === op.kind && queued.id === op.id);
+        });
+        queue.push(op);
+        if (queue.length >= MAX_QUEUE) {
+            flush();
+        }
+    }
+
+    function applyResults(ops, data) {
+        var reload = data.conflict;
+        data.results.forEach(function (result, index) {
+            var op = ops[index];
+            var pending = queue.some(function (queued) {
+                return queued.kind === op.kind && queued.id === op.id;
+            });
+            if (op.op === 'toggle' && typeof result.done === 'boolean' && !pending) {
+                // Settle the optimistic state on what the server stored
+                var selector = 'a[data-op="toggle"][data-kind="' + op.kind + '"][data-id="' + op.id + '"]';
+                var link = list.querySelector(selector);
+                if (link) {
+                    link.classList.toggle('done-task', result.done);
+                }
+            }
+            if (result.html) {
+                list.insertAdjacentHTML('beforeend', result.html);
+            }
+            if (result.reload || (op.op === 'edit' && result.ok)) {
+                reload = true;
+            }
+        });
+        if (reload) {
+            window.location.reload();
+        }
+    }
+
+    function flush() {
+        if (inflight || queue.length === 0) {
+            return;
+        }
+        var ops = queue;
+        queue = [];
+        inflight = true;
+        fetch(list.dataset.batch, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {'Accept': 'application/json', 'Content-Type': 'application/json'},
+            body: payload(ops)
+        }).then(function (response) {
+            var type = response.headers.get('Content-Type') || '';
+            if (type.indexOf('application/json') === -1) {
+                // Redirected to the login page; reload to follow it
+                window.location.reload();
+                return;
+            }
+            if (!response.ok) {
+                throw new Error('Batch rejected: ' + response.status);
+            }
+            return response.json().then(function (data) {
+                session = data.session;
+                version = data.version;
+                applyResults(ops, data);
+            });
+        }).catch(function () {
+            // Keep the operations and retry on the next tick
+            queue = ops.concat(queue);
+        }).then(function () {
+            inflight = false;
+            if (refreshPending) {
+                refresh();
+            }
+        });
+    }
+
+    function refresh() {
+        // Local changes go first; their response may already carry the update
+        if (inflight || queue.length) {
+            refreshPending = true;
+            return;
+        }
+        refreshPending = false;
+        fetch(list.dataset.rows, {
+            credentials: 'same-origin',
+            headers: {'Accept': 'application/json'}
+        }).then(function (response) {
+            return response.ok ? response.json() : null;
+        }).then(function (data) {
+            if (!data) {
+                return;
+            }
+            if (inflight || queue.length) {
+                refreshPending = true;
+                return;
+            }
+            session = data.session;
+            version = data.version;
+            list.innerHTML = data.html;
+        });
+    }
+
+    if (window.EventSource && list.dataset.events) {
+        new EventSource(list.dataset.events).onmessage = function (event) {
+            var change = JSON.parse(event.data);
+            if (change.session > session || (change.session === session && change.version > version)) {
+                refresh();
+            }
+        };
+    }
+
+    function removeRow(row) {
+        var next = row.nextElementSibling;
+        if (next && next.classList.contains('objection-subchecklist')) {
+            next.remove();
+        }
+        row.remove();
+    }
+
+    list.addEventListener('click', function (event) {
+        var link = event.target.closest('a[data-op]');
+        if (!link) {
+            return;
+        }
+        event.preventDefault();
+        var op = {op: link.dataset.op, kind: link.dataset.kind, id: parseInt(link.dataset.id, 10)};
+        if (op.op === 'toggle') {
+            op.done = !link.classList.contains('done-task');
+            link.classList.toggle('done-task', op.done);
+        } else {
+            removeRow(link.closest('li'));
+        }
+        enqueue(op);
+    });
+
+    if (form) {
+        form.addEventListener('submit', function (event) {
+            var input = form.querySelector('input[name="task_text"]');
+            event.preventDefault();
+            if (!input.value.trim()) {
+                return;
+            }
+            enqueue({op: 'add', text: input.value});
+            input.value = '';
+            flush();
+        });
+    }
+
+    setInterval(flush, FLUSH_INTERVAL);
+
+    // Hand anything still queued to the browser when the agent navigates away
+    window.addEventListener('pagehide', function () {
+        if (queue.length) {
+            navigator.sendBeacon(list.dataset.batch, new Blob([payload(queue)], {type: 'application/json'}));
+            queue = [];
+        }
+    });
+});
@@ -0,0 +1,18 @@
+// Fills in the per-user parts (navbar links and flash messages) of pages
+// that are served as shared, cacheable shells.
+(function () {
+    var script = document.currentScript;
+    fetch(script.dataset.src, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+        .then(function (response) {
+            return response.json();
+        })
+        .then(function (data) {
+            if (data.login) {
+                // The shell is served to everyone; its pages need a login
+                window.location.replace(data.login);
+                return;
+            }
+            document.getElementById('session-nav').innerHTML = data.nav;
+            document.getElementById('session-flashes').innerHTML = data.flashes;
+        });
+})();
@@ -0,0 +1,79 @@
+"""
+Completion counters behind the supervisor dashboard.
+
+Rather than scanning every call, two small tables are kept up to date as
+agents work. CallStat counts the calls an agent started on each
+checklist. ItemStat counts, per agent and template item, the calls in
+which that item is ticked: +1 when its bit is set and -1 when it is
+cleared. A completion rate is then ItemStat.done / CallStat.calls. The
+dashboard reads O(agents x items) rows, however long the history is.
+
+Counters are upserts (INSERT .. ON CONFLICT DO UPDATE, or ON DUPLICATE KEY
+UPDATE on MySQL) in the caller's transaction, so they commit or roll back
+with the change they count.
+"""
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from extensions import db
+from models import User, TemplateItem, CallStat, ItemStat
+
+
+def _increment(model, keys, column, delta):
+    name = db.engine.dialect.name
+    values = {**keys, column: delta}
+    if name in ('postgresql', 'sqlite'):
+        dialect = postgresql if name == 'postgresql' else sqlite
+        statement = dialect.insert(model).values(**values).on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: getattr(model, column) + delta},
+        )
+    elif name in ('mysql', 'mariadb'):
+        # The conflict is on the primary key, which is made of the keys
+        statement = mysql.insert(model).values(**values).on_duplicate_key_update(
+            {column: getattr(model, column) + delta},
+        )
+    else:
+        raise NotImplementedError(f"no counter upsert for the {name} dialect")
+    db.session.execute(statement)
+
+
+def record_call_started(user_id, template_id):
+    _increment(CallStat, {'user_id': user_id, 'template_id': template_id}, 'calls', 1)
+
+
+def record_item_toggle(user_id, template_id, position, done):
+    _increment(ItemStat, {'user_id': user_id, 'template_id': template_id, 'position': position},
+               'done', 1 if done else -1)
+
+
+def item_rates(template_id):
+    """Per item: (position, text, calls, done) summed over every agent."""
+    calls = db.session.scalar(db.select(db.func.coalesce(db.func.sum(CallStat.calls), 0))
+                              .where(CallStat.template_id == template_id))
+    done = (db.select(ItemStat.position, db.func.sum(ItemStat.done).label('done'))
+            .where(ItemStat.template_id == template_id)
+            .group_by(ItemStat.position).subquery())
+    rows = db.session.execute(
+        db.select(TemplateItem.position, TemplateItem.text, db.func.coalesce(done.c.done, 0))
+        .outerjoin(done, done.c.position == TemplateItem.position)
+        .where(TemplateItem.template_id == template_id)
+        .order_by(TemplateItem.position)
+    ).all()
+    return [(position, text, calls, item_done) for position, text, item_done in rows]
+
+
+def agent_rates(template_id):
+    """Per agent: (username, calls, {position: done})."""
+    agents = db.session.execute(
+        db.select(User.id, User.username, CallStat.calls)
+        .join(CallStat, CallStat.user_id == User.id)
+        .where(CallStat.template_id == template_id)
+        .order_by(User.username)
+    ).all()
+    done = {}
+    for user_id, position, count in db.session.execute(
+        db.select(ItemStat.user_id, ItemStat.position, ItemStat.done).where(ItemStat.template_id == template_id)
+    ):
+        done.setdefault(user_id, {})[position] = count
+    return [(username, calls, done.get(user_id, {})) for user_id, username, calls in agents]
+
@@ -0,0 +1,111 @@
+"""
+Supervisor dashboard: completion rates per checklist item and per agent,
+and streaming exports of the call history (see export.py).
+
+The rates come from the counters in stats.py. Supervisors are granted
+and revoked from the command line, with effect on the next request:
+
+    flask --app app supervisor grant USERNAME
+    flask --app app supervisor export calls --start 2024-01-01 --end 2025-01-01 -o calls.csv
+"""
+import functools
+from datetime import datetime
+
+import click
+from flask import Blueprint, Response, abort, current_app, render_template, request, stream_with_context
+from flask_login import login_required, current_user
+
+from checklists import CALL_TYPES, CHECKLIST_OPTIONS
+from extensions import db
+from models import User, ChecklistTemplate
+from stats import item_rates, agent_rates
+import export
+
+bp = Blueprint('supervisor', __name__, cli_group='supervisor')
+
+
+def supervisor_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Not the cached identity: a revoke must hold on every worker at once
+        if not db.session.scalar(db.select(User.is_supervisor).where(User.id == current_user.id)):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@bp.route("/supervisor")
+@login_required
+@supervisor_required
+def dashboard():
+    call_type = request.args.get("call_type", "sales")
+    checklist_type = request.args.get("checklist_type", "start call")
+    position = request.args.get("item", type=int)
+    template = ChecklistTemplate.query.filter_by(call_type=call_type, checklist_type=checklist_type).first()
+    items = item_rates(template.id) if template else []
+    agents = agent_rates(template.id) if template else []
+    selected = next((item for item in items if item[0] == position), None)
+    return render_template("supervisor.html", call_type=call_type, checklist_type=checklist_type,
+                           call_types=CALL_TYPES, checklist_options=CHECKLIST_OPTIONS,
+                           items=items, agents=agents, selected=selected)
+
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        abort(400, f"Not an ISO date: {value}")
+
+
+@bp.route("/supervisor/export/<dataset>.<fmt>")
+@login_required
+@supervisor_required
+def export_dataset(dataset, fmt):
+    """Stream a dataset for ?start=&end= (ISO dates, end exclusive) as CSV or Parquet."""
+    if dataset not in export.DATASETS or fmt not in export.FORMATS:
+        abort(404)
+    start, end = _parse_date(request.args.get("start")), _parse_date(request.args.get("end"))
+    stream, mimetype = export.FORMATS[fmt]
+    response = Response(stream_with_context(stream(export.iter_chunks(dataset, start, end))), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{dataset}.{fmt}"'
+    response.cache_control.no_store = True
+    return response
+
+
+@bp.cli.command("export")
+@click.argument("dataset", type=click.Choice(sorted(export.DATASETS)))
+@click.option("--start", type=click.DateTime(), help="first day included")
+@click.option("--end", type=click.DateTime(), help="first day excluded")
+@click.option("--format", "fmt", type=click.Choice(sorted(export.FORMATS)), default="csv")
+@click.option("-o", "--output", type=click.File("wb"), default="-", help="file to write (default stdout)")
+def export_command(dataset, start, end, fmt, output):
+    """Stream a dataset of the call history to a file."""
+    stream, _mimetype = export.FORMATS[fmt]
+    for chunk in stream(export.iter_chunks(dataset, start, end)):
+        output.write(chunk)
+    output.flush()
+
+
+def _set_supervisor(username, value):
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named {username!r}")
+    user.is_supervisor = value
+    db.session.commit()
+    current_app.extensions['user_cache'].invalidate(user.id)
+
+
+@bp.cli.command("grant")
+@click.argument("username")
+def grant_command(username):
+    """Let a user open the supervisor dashboard."""
+    _set_supervisor(username, True)
+    print(f"{username} is now a supervisor")
+
+
+@bp.cli.command("revoke")
+@click.argument("username")
+def revoke_command(username):
+    """Take the supervisor dashboard away from a user."""
+    _set_supervisor(username, False)
+    print(f"{username} is no longer a supervisor")
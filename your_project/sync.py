@@ -0,0 +1,159 @@
+"""
+Delta sync with clients that keep their own copy of the checklists, such
+as the desktop app (templates/example.py).
+
+Every change to a call's items or custom tasks also inserts a SyncChange
+row in the same transaction. A client sends the cursor of its last sync
+and gets back only the tasks that changed since then in the agent's
+current calls, keyed as
+
+    i<position>   a template item: {"done": ...}, or {"text": ..., "done": ...}
+                  once it has been edited (replaced by a custom task)
+    t<task id>    a custom task: {"text": ..., "done": ...}
+    l<anything>   a task the client added and the server has not seen yet
+
+with null for a deleted task, and "reset" when a new call was started.
+The same keys address the client's own changes (see checklists.api_sync).
+Conflicts are settled per key, last writer wins: a client change older
+than the server's latest change to that key is dropped, and the client
+gets the server's state back.
+
+The cursor must never pass a change that has yet to commit. On SQLite,
+writes are serialized, so change ids commit in order and the cursor is
+the highest id. On PostgreSQL concurrent writers commit out of id order,
+so each change also records its transaction id, and the cursor is the
+oldest transaction still running when it is handed out (the snapshot's
+xmin): every change of an older transaction is committed by then. Changes
+of transactions at or above the cursor may be sent twice, which is
+harmless, as clients get the current state of each key.
+"""
+from datetime import datetime, timezone
+
+from extensions import db
+from models import Task, TemplateItem, CallSession, SyncChange
+
+
+def _by_transaction():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def record_change(session_id, position=None, task_id=None):
+    values = {'session_id': session_id, 'position': position, 'task_id': task_id,
+              'created_at': datetime.utcnow()}
+    if _by_transaction():
+        values['txid'] = db.func.txid_current()
+    db.session.execute(db.insert(SyncChange).values(**values))
+
+
+def last_cursor():
+    """Cursor for a client that has every change committed so far."""
+    if _by_transaction():
+        return db.session.scalar(db.select(db.func.txid_snapshot_xmin(db.func.txid_current_snapshot())))
+    return db.session.scalar(db.select(db.func.coalesce(db.func.max(SyncChange.id), 0)))
+
+
+class Window:
+    """The changes a client with cursor ``after`` lacks, less the request's own.
+
+    Create it before the request makes changes, call mark_own() just before
+    committing them and end() just after. end() returns the client's next
+    cursor; changes read after it are the ones to send back.
+    """
+
+    def __init__(self, after):
+        self.after = after
+        # SQLite: the request holds the write lock, so the ids from here to
+        # own_end are its own changes
+        self.seen = None if _by_transaction() else last_cursor()
+        self.own_end = self.own_txid = self.until = None
+
+    def mark_own(self):
+        if _by_transaction():
+            self.own_txid = db.session.scalar(db.select(db.func.txid_current_if_assigned()))
+        else:
+            self.own_end = last_cursor()
+
+    def end(self):
+        # Taken before the changes are read, so none committed in between is skipped
+        self.until = last_cursor()
+        return self.until
+
+    def condition(self):
+        if _by_transaction():
+            own = self.own_txid if self.own_txid is not None else db.func.txid_current_if_assigned()
+            return db.and_(SyncChange.txid >= self.after, SyncChange.txid.is_distinct_from(own))
+        if self.until is None:
+            return db.and_(SyncChange.id > self.after, SyncChange.id <= self.seen)
+        condition = db.and_(SyncChange.id > self.after, SyncChange.id <= self.until)
+        if self.own_end is not None and self.own_end > self.seen:
+            condition = db.and_(condition, ~SyncChange.id.between(self.seen + 1, self.own_end))
+        return condition
+
+
+def timestamp(value):
+    """Seconds since the epoch of a naive UTC datetime, as sent by clients."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def current_sessions(user_id):
+    """The agent's latest call on each checklist."""
+    latest = (db.select(db.func.max(CallSession.id)).where(CallSession.user_id == user_id)
+              .group_by(CallSession.template_id))
+    return db.session.scalars(db.select(CallSession).where(CallSession.id.in_(latest))).all()
+
+
+def changed_keys(call_session, window):
+    """Changes to a call within a Window: (reset time or None, {key: time}).
+
+    Sub-items and subtasks of the Objection sub-checklist are left out.
+    """
+    top_level = set(db.session.scalars(db.select(TemplateItem.position).where(
+        TemplateItem.template_id == call_session.template_id, TemplateItem.parent_id.is_(None)
+    )))
+    rows = db.session.execute(
+        db.select(SyncChange.position, SyncChange.task_id, db.func.max(SyncChange.created_at))
+        .where(SyncChange.session_id == call_session.id, window.condition())
+        .group_by(SyncChange.position, SyncChange.task_id)
+    ).all()
+    reset, keys = None, {}
+    for position, task_id, changed_at in rows:
+        if position is None and task_id is None:
+            reset = changed_at
+            continue
+        if position is not None and position not in top_level:
+            continue
+        key = f"i{position}" if position is not None else f"t{task_id}"
+        keys[key] = max(changed_at, keys.get(key, changed_at))
+    if task_ids := [int(key[1:]) for key in keys if key[0] == "t"]:
+        for task_id in db.session.scalars(db.select(Task.id).where(
+            Task.id.in_(task_ids), Task.parent_task_id.is_not(None)
+        )):
+            del keys[f"t{task_id}"]
+    return reset, keys
+
+
+def key_states(call_session, keys):
+    """The current state of each key on a call: a dict, or None if deleted."""
+    positions = [int(key[1:]) for key in keys if key[0] == "i"]
+    task_ids = [int(key[1:]) for key in keys if key[0] == "t"]
+    replacements = {task.position: task for task in Task.query.filter(
+        Task.session_id == call_session.id, Task.position.in_(positions), Task.parent_task_id.is_(None)
+    )} if positions else {}
+    tasks = {task.id: task for task in Task.query.filter(
+        Task.id.in_(task_ids), Task.session_id == call_session.id
+    )} if task_ids else {}
+    states = {}
+    for key in keys:
+        number = int(key[1:])
+        if key[0] == "i":
+            task = replacements.get(number)
+            if task is not None:
+                states[key] = {"text": task.text, "done": bool(task.done)}
+            elif call_session.is_hidden(number):
+                states[key] = None
+            else:
+                states[key] = {"done": call_session.is_done(number)}
+        else:
+            task = tasks.get(number)
+            states[key] = None if task is None else {"text": task.text, "done": bool(task.done)}
+    return states
@@ -2,7 +2,320 @@ import tkinter as tk
 from tkinter import ttk, messagebox, font, simpledialog
 import json
 from datetime import datetime, date
+import copy
 import os
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from http.cookiejar import CookieJar
+
+
+def apply_op(checklists, op):
+    # Apply one journaled change to the checklists data (used live and on replay).
+    tasks = checklists[op['call_type']][op['checklist_type']]['tasks']
+    kind = op['op']
+    if kind == 'set_done':
+        tasks[op['index']]['done'] = op['done']
+    elif kind == 'add':
+        task = {'text': op['text'], 'done': op.get('done', False)}
+        if 'key' in op:
+            task['key'] = op['key']
+        tasks.insert(op.get('index', len(tasks)), task)
+    elif kind == 'edit':
+        tasks[op['index']]['text'] = op['text']
+    elif kind == 'delete':
+        del tasks[op['index']]
+    elif kind == 'reset':
+        for task in tasks:
+            task['done'] = False
+    elif kind == 'rekey':
+        for task in tasks:
+            if task.get('key') == op['key']:
+                task['key'] = op['new_key']
+
+
+def atomic_write(path, text):
+    # Write to a temp file, fsync it and rename it over the target, so a crash
+    # leaves either the old file or the new one, never a half-written one.
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    try:
+        # Make the rename itself durable (not possible on Windows)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class JournalStore:
+    """
+    Keeps the checklists on disk as a JSON snapshot plus an append-only journal.
+
+    Every change is recorded as a small operation (see apply_op). A background
+    thread waits `debounce` seconds to gather a burst of clicks, then appends
+    the operations to the journal and fsyncs it, so the Tk main loop never
+    waits on the disk. Once the journal holds `compact_every` operations the
+    thread writes a fresh snapshot (temp file + rename) and empties the
+    journal, so startup replays at most that many operations.
+
+    Operations carry a sequence number and the snapshot records the last one
+    it includes; replay skips anything older, so a crash between writing the
+    snapshot and emptying the journal does not apply a change twice.
+    """
+    def __init__(self, path, debounce=0.5, compact_every=200):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + '.journal'
+        self.debounce = debounce
+        self.compact_every = compact_every
+        self._cond = threading.Condition()
+        self._pending = []
+        self._compact_requested = False
+        self._closed = False
+        self._thread = None
+        self._seq = 0
+        # The writer thread's own copy of the data, as of the last written operation
+        self._disk_state = None
+        self._disk_seq = 0
+        self._journal_entries = 0
+
+    def load(self):
+        # Snapshot first, then the journaled changes made since it was written.
+        data, seq = {}, 0
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    snapshot = json.load(f)
+                if 'seq' in snapshot and 'checklists' in snapshot:
+                    data, seq = snapshot['checklists'], snapshot['seq']
+                else:
+                    data = snapshot  # a plain checklists.json from before the journal
+            except Exception:
+                data = {}
+        entries = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # the last append was cut short by a crash
+                    if op['seq'] <= seq:
+                        continue
+                    try:
+                        apply_op(data, op)
+                    except (KeyError, IndexError):
+                        pass
+                    seq = op['seq']
+                    entries += 1
+        self._seq = self._disk_seq = seq
+        self._journal_entries = entries
+        return data
+
+    def start(self, checklists):
+        # Start writing in the background. The first write is a snapshot, which
+        # also saves whatever load_data filled in (presets, daily refresh).
+        self._disk_state = copy.deepcopy(checklists)
+        self._compact_requested = True
+        self._thread = threading.Thread(target=self._run, name='checklist-writer', daemon=True)
+        self._thread.start()
+
+    def record(self, op):
+        with self._cond:
+            self._seq += 1
+            self._pending.append(dict(op, seq=self._seq))
+            self._cond.notify()
+
+    def close(self):
+        # Write everything still pending and stop the writer thread.
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not (self._pending or self._compact_requested or self._closed):
+                    self._cond.wait()
+                closed = self._closed
+            if not closed:
+                time.sleep(self.debounce)
+            with self._cond:
+                batch, self._pending = self._pending, []
+                compact, self._compact_requested = self._compact_requested, False
+                closed = self._closed
+            self._write(batch, compact or closed)
+            if closed:
+                return
+
+    def _write(self, batch, compact):
+        for op in batch:
+            apply_op(self._disk_state, op)
+        if batch:
+            self._disk_seq = batch[-1]['seq']
+        try:
+            if compact or self._journal_entries + len(batch) >= self.compact_every:
+                snapshot = {'version': 1, 'seq': self._disk_seq, 'checklists': self._disk_state}
+                atomic_write(self.path, json.dumps(snapshot, indent=4))
+                atomic_write(self.journal_path, '')
+                self._journal_entries = 0
+            elif batch:
+                with open(self.journal_path, 'a') as f:
+                    f.write(''.join(json.dumps(op) + '\n' for op in batch))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._journal_entries += len(batch)
+        except OSError as exc:
+            # The changes are in _disk_state; try again with a full snapshot
+            print(f"Saving checklists failed: {exc}", file=sys.stderr)
+            with self._cond:
+                self._compact_requested = True
+
+
+def local_key():
+    # Key of a task added here, until the server gives it one (see SyncWorker).
+    return 'l' + uuid.uuid4().hex[:12]
+
+
+class SyncWorker:
+    """
+    Exchanges changes with the Flask server's /api/sync endpoint.
+
+    Local changes are queued in an outbox, keyed as the server expects
+    (i<position> for preset items, t<id> for custom tasks, l<...> for tasks
+    the server has not seen yet). A background thread sends them in one batch
+    `debounce` seconds after a change, and asks for the server's changes every
+    `interval` seconds even when nothing changed here. Only changed tasks are
+    sent either way, and the cursor of the last sync makes the server do the
+    same. The outbox and cursor are kept in `state_path`, so changes made
+    offline are sent after a restart.
+
+    Replies are put on `inbox` for the Tk main loop (see ChecklistApp.poll_sync),
+    as widgets and checklist data must only be touched from there.
+    """
+    def __init__(self, url, username, password, state_path, interval=10, debounce=1):
+        self.url = url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.state_path = state_path
+        self.interval = interval
+        self.debounce = debounce
+        self.inbox = queue.Queue()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        self.cursor = 0
+        self.outbox = []
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, 'r') as f:
+                    state = json.load(f)
+                self.cursor, self.outbox = state['cursor'], state['outbox']
+            except Exception:
+                pass
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='checklist-sync', daemon=True)
+        self._thread.start()
+    
+    def record(self, call_type, checklist_type, change):
+        with self._cond:
+            self.outbox.append(dict(change, checklist=f"{call_type}/{checklist_type}", ts=time.time()))
+            self._cond.notify()
+    
+    def close(self, timeout=5):
+        # Try one last sync, without holding up the window for long.
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                if not (self.outbox or self._closed):
+                    self._cond.wait(self.interval)
+                closed = self._closed
+            if not closed:
+                time.sleep(self.debounce)
+            self.sync_once()
+            if closed:
+                return
+    
+    def sync_once(self):
+        # Send the outbox and fetch the server's changes; False if the server is unreachable.
+        with self._cond:
+            batch = list(self.outbox)
+            cursor = self.cursor
+        self._save(cursor, batch)
+        changes = {}
+        for change in batch:
+            change = dict(change)
+            changes.setdefault(change.pop('checklist'), []).append(change)
+        try:
+            reply = self._post({'cursor': cursor, 'changes': changes})
+        except (OSError, ValueError) as exc:
+            print(f"Sync failed: {exc}", file=sys.stderr)
+            return False
+        keys = reply.get('keys', {})
+        with self._cond:
+            del self.outbox[:len(batch)]
+            # Changes queued meanwhile may still use the local key of an added task
+            for change in self.outbox:
+                if change.get('key') in keys:
+                    change['key'] = keys[change['key']]
+            self.cursor = reply['cursor']
+            outbox = list(self.outbox)
+        self._save(reply['cursor'], outbox)
+        self.inbox.put(reply)
+        return True
+    
+    def _save(self, cursor, outbox):
+        try:
+            atomic_write(self.state_path, json.dumps({'cursor': cursor, 'outbox': outbox}))
+        except OSError as exc:
+            print(f"Saving the sync outbox failed: {exc}", file=sys.stderr)
+    
+    def _post(self, body, login=True):
+        request = urllib.request.Request(self.url + '/api/sync', data=json.dumps(body).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with self.opener.open(request, timeout=30) as response:
+            is_json = response.headers.get_content_type() == 'application/json'
+            data = response.read()
+        if not is_json:
+            # Sent to the login page: sign in and try again once
+            if not login:
+                raise ValueError("the server did not accept the sync credentials")
+            form = urllib.parse.urlencode({'username': self.username, 'password': self.password}).encode('utf-8')
+            self.opener.open(self.url + '/login', data=form, timeout=30).close()
+            return self._post(body, login=False)
+        return json.loads(data)
+
+
+class TaskRow:
+    # The widgets of one displayed task, with the text and style last given to its button.
+    def __init__(self, frame, button, key=None):
+        self.frame = frame
+        self.button = button
+        self.key = key
+        self.text = None
+        self.style = None
+
 
 class ChecklistApp:
     def __init__(self, root):
@@ -58,9 +371,24 @@ class ChecklistApp:
         self.call_types = ["sales", "reengagement", "followup", "at-risk", "support", "introduction"]
         self.checklist_options = ["voicemail", "start call"]
         
-        # Data file and checklists structure: data is organized by call type then checklist option
+        # Data file and checklists structure: data is organized by call type then checklist option.
+        # Changes are journaled next to it and written in the background (see JournalStore).
         self.data_file = "checklists.json"
+        self.store = JournalStore(self.data_file)
         self.checklists = self.load_data()
+        self.store.start(self.checklists)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Optional sync with the Flask server, configured from the environment
+        self.sync = None
+        if os.environ.get('CHECKLIST_SYNC_URL'):
+            self.sync = SyncWorker(os.environ['CHECKLIST_SYNC_URL'],
+                                   os.environ.get('CHECKLIST_SYNC_USER', ''),
+                                   os.environ.get('CHECKLIST_SYNC_PASSWORD', ''),
+                                   os.path.splitext(self.data_file)[0] + '.sync.json',
+                                   interval=float(os.environ.get('CHECKLIST_SYNC_SECONDS', 10)))
+            self.sync.start()
+            self.root.after(500, self.poll_sync)
         
         # The container which we will use to switch between views
         self.container = ttk.Frame(self.root, style='Custom.TFrame', padding="10")
@@ -76,7 +404,7 @@ class ChecklistApp:
         
         # Instance variables for Objection mini sub-checklist (Sales, Start Call only)
         self.objection_subchecklist_data = None
-        # (We recreate the mini checklist UI each time in display_tasks)
+        # (Its widgets are kept and updated in place, see update_objection_subchecklist)
         
         self.show_home_page()
     
@@ -84,16 +412,11 @@ class ChecklistApp:
         # Remove all widgets from the container
         for widget in self.container.winfo_children():
             widget.destroy()
+        self.tasks_frame = None
     
     def load_data(self):
-        data = {}
         today = date.today().isoformat()
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                try:
-                    data = json.load(f)
-                except Exception:
-                    data = {}
+        data = self.store.load()
         
         # Define preset tasks for each call type / checklist option.
         default_voicemail_tasks = [
@@ -172,7 +495,8 @@ class ChecklistApp:
                 if option not in data[ct]:
                     data[ct][option] = {
                         'daily_refresh': False,
-                        'tasks': preset_tasks.get((ct, option), []),
+                        # Copied, as some call types share a preset list
+                        'tasks': copy.deepcopy(preset_tasks.get((ct, option), [])),
                         'last_refresh': today
                     }
                 else:
@@ -181,17 +505,140 @@ class ChecklistApp:
                     if not checklist.get("tasks"):
                         preset = preset_tasks.get((ct, option), [])
                         if preset:
-                            checklist["tasks"] = preset
+                            checklist["tasks"] = copy.deepcopy(preset)
                     # If daily refresh is enabled and the last refresh date isn't today, reset tasks' done status.
                     if checklist.get('daily_refresh', False) and checklist.get('last_refresh', '') != today:
                         for task in checklist.get('tasks', []):
                             task['done'] = False
                         checklist['last_refresh'] = today
+                # Give every task its sync key: preset tasks are known to the
+                # server by position, anything else is new to it.
+                tasks = data[ct][option]['tasks']
+                used = {task['key'] for task in tasks if 'key' in task}
+                for task in tasks:
+                    if 'key' not in task:
+                        task['key'] = next((f"i{position}" for position, preset
+                                            in enumerate(preset_tasks.get((ct, option), []))
+                                            if preset['text'] == task['text'] and f"i{position}" not in used),
+                                           local_key())
+                        used.add(task['key'])
+        self.preset_tasks = preset_tasks
         return data
     
-    def save_data(self):
-        with open(self.data_file, 'w') as f:
-            json.dump(self.checklists, f, indent=4)
+    def save_data(self, op, sync=True):
+        # Journal one change; the store writes it to disk off the main loop.
+        self.store.record(op)
+        # Queue it for the server too, unless it came from there
+        if sync and self.sync is not None and op['op'] != 'rekey':
+            change = {'op': op['op']}
+            for field in ('key', 'done', 'text'):
+                if field in op:
+                    change[field] = op[field]
+            self.sync.record(op['call_type'], op['checklist_type'], change)
+    
+    def apply_change(self, kind, call_type=None, checklist_type=None, sync=True, **fields):
+        # Change a checklist (the current one by default) in memory and save the change.
+        op = dict(op=kind, call_type=call_type or self.current_call_type,
+                  checklist_type=checklist_type or self.current_checklist_type, **fields)
+        if 'index' in op and kind != 'add':
+            # The task's sync key, before the change moves or removes it
+            op['key'] = self.checklists[op['call_type']][op['checklist_type']]['tasks'][op['index']].get('key')
+        apply_op(self.checklists, op)
+        if (kind == 'rekey' and self.tasks_frame is not None and op['key'] in self.task_rows
+                and (op['call_type'], op['checklist_type']) == (self.current_call_type, self.current_checklist_type)):
+            # The row follows its task to the new key
+            row = self.task_rows.pop(op['key'])
+            row.key = op['new_key']
+            self.task_rows[row.key] = row
+        self.save_data(op, sync)
+    
+    def on_close(self):
+        if self.sync is not None:
+            self.sync.close()
+        self.store.close()
+        self.root.destroy()
+    
+    def find_task(self, call_type, checklist_type, key):
+        for index, task in enumerate(self.checklists[call_type][checklist_type]['tasks']):
+            if task.get('key') == key:
+                return index
+        return None
+    
+    def sync_new_call(self, call_type, checklist_type):
+        # A new call on the server starts from the presets with no custom tasks,
+        # while here edits, deletions and custom tasks carry over. Send them again.
+        tasks = self.checklists[call_type][checklist_type]['tasks']
+        presets = self.preset_tasks.get((call_type, checklist_type), [])
+        kept = set()
+        for task in list(tasks):
+            key = task.get('key') or ''
+            if key.startswith('i') and key[1:].isdigit() and int(key[1:]) < len(presets):
+                kept.add(int(key[1:]))
+                if task['text'] != presets[int(key[1:])]['text']:
+                    self.sync.record(call_type, checklist_type, {'op': 'edit', 'key': key, 'text': task['text']})
+            else:
+                new_key = local_key()
+                self.apply_change('rekey', call_type, checklist_type, sync=False, key=key, new_key=new_key)
+                self.sync.record(call_type, checklist_type, {'op': 'add', 'key': new_key, 'text': task['text']})
+        for position in range(len(presets)):
+            if position not in kept:
+                self.sync.record(call_type, checklist_type, {'op': 'delete', 'key': f"i{position}"})
+    
+    def apply_remote(self, call_type, checklist_type, key, state):
+        # Bring one task in line with the server's state (None: deleted there).
+        index = self.find_task(call_type, checklist_type, key)
+        if state is None:
+            if index is not None:
+                self.apply_change('delete', call_type, checklist_type, sync=False, index=index)
+            return
+        if index is None:
+            tasks = self.checklists[call_type][checklist_type]['tasks']
+            presets = self.preset_tasks.get((call_type, checklist_type), [])
+            text = state.get('text')
+            index = len(tasks)
+            if key.startswith('i'):
+                # A preset item back on the server: put it back in its place
+                position = int(key[1:])
+                if text is None and position < len(presets):
+                    text = presets[position]['text']
+                index = next((i for i, task in enumerate(tasks) if task.get('key', '').startswith('i')
+                              and task['key'][1:].isdigit() and int(task['key'][1:]) > position), index)
+            if text is not None:
+                self.apply_change('add', call_type, checklist_type, sync=False, text=text, key=key,
+                                  done=state['done'], index=index)
+            return
+        task = self.checklists[call_type][checklist_type]['tasks'][index]
+        if state.get('text') is not None and state['text'] != task['text']:
+            self.apply_change('edit', call_type, checklist_type, sync=False, index=index, text=state['text'])
+        if state['done'] != task['done']:
+            self.apply_change('set_done', call_type, checklist_type, sync=False, index=index, done=state['done'])
+    
+    def poll_sync(self):
+        # Apply the server's replies on the main loop, then check again shortly.
+        changed = set()
+        while True:
+            try:
+                reply = self.sync.inbox.get_nowait()
+            except queue.Empty:
+                break
+            for ct, options in self.checklists.items():
+                for cl in options:
+                    for local, server in reply.get('keys', {}).items():
+                        if self.find_task(ct, cl, local) is not None:
+                            self.apply_change('rekey', ct, cl, sync=False, key=local, new_key=server)
+            for name, entry in reply.get('checklists', {}).items():
+                ct, _, cl = name.partition('/')
+                if cl not in self.checklists.get(ct, {}):
+                    continue
+                if entry.get('reset'):
+                    self.apply_change('reset', ct, cl, sync=False)
+                    self.sync_new_call(ct, cl)
+                for key, state in entry.get('tasks', {}).items():
+                    self.apply_remote(ct, cl, key, state)
+                changed.add((ct, cl))
+        if (self.current_call_type, self.current_checklist_type) in changed and self.tasks_frame is not None:
+            self.display_tasks()
+        self.root.after(500, self.poll_sync)
     
     def show_home_page(self):
         # Unbind keys used for previous shortcuts.
@@ -269,6 +716,7 @@ class ChecklistApp:
         self.tasks_frame = ttk.Frame(self.container, style='Custom.TFrame')
         self.tasks_frame.pack(fill=tk.BOTH, expand=True)
         
+        self.build_task_list()
         self.display_tasks()
         
         # New Call button: Resets the checklist for a new call.
@@ -282,9 +730,9 @@ class ChecklistApp:
     def new_call(self):
         # Reset the current checklist by marking all tasks as not done and clearing the objection mini checklist.
         if self.current_call_type and self.current_checklist_type:
-            for task in self.checklists[self.current_call_type][self.current_checklist_type]['tasks']:
-                task['done'] = False
-            self.save_data()
+            self.apply_change('reset')
+            if self.sync is not None:
+                self.sync_new_call(self.current_call_type, self.current_checklist_type)
         # Reset the objection sub-checklist (if any)
         self.objection_subchecklist_data = None
         self.display_tasks()
@@ -296,92 +744,120 @@ class ChecklistApp:
             messagebox.showwarning("Warning", "Task cannot be empty")
             return
         
-        ct = self.current_call_type
-        cl = self.current_checklist_type
-        self.checklists[ct][cl]['tasks'].append({'text': task_text, 'done': False})
-        self.save_data()
+        self.apply_change('add', text=task_text, key=local_key())
         self.display_tasks()
         self.task_entry.delete(0, tk.END)
     
-    def display_tasks(self):
-        # Clear existing tasks in tasks_frame
-        for widget in self.tasks_frame.winfo_children():
-            widget.destroy()
-            
-        ct = self.current_call_type
-        cl = self.current_checklist_type
-        tasks = self.checklists[ct][cl]['tasks']
-        
-        # Create a canvas + scrollbar to allow scrolling if the list is long
+    def build_task_list(self):
+        # Create the scrollable area for the task rows. This happens once per
+        # checklist page; display_tasks then reuses the rows inside it.
         canvas = tk.Canvas(self.tasks_frame, bg=self.colors['bg'], highlightthickness=0)
         scrollbar = ttk.Scrollbar(self.tasks_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas, style='Custom.TFrame')
+        self.scrollable_frame = ttk.Frame(canvas, style='Custom.TFrame')
     
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        self.scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
         
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
     
         scrollbar.pack(side="right", fill="y")
         canvas.pack(side="left", fill="both", expand=True)
+        
+        self.task_rows = {}
+        self.objection_frame = None
+        self.objection_buttons = []
+        self.objection_row = None
     
-        # Display each task – including a button to toggle done, an edit and a delete button.
-        for i, task in enumerate(tasks):
-            frame = ttk.Frame(scrollable_frame, style='Custom.TFrame')
-            frame.pack(fill=tk.X, pady=5)
+    def display_tasks(self):
+        # Bring the rows in line with the tasks. Each row belongs to one task by its
+        # key, so existing rows are kept and only reconfigured where their text or
+        # style changed; rows are created or destroyed only for tasks that were added
+        # or deleted, and only moved when the order of the tasks changed.
+        tasks = self.checklists[self.current_call_type][self.current_checklist_type]['tasks']
+        keys = {task['key'] for task in tasks}
+        for key in [key for key in self.task_rows if key not in keys]:
+            self.task_rows.pop(key).frame.destroy()
+        for task in tasks:
+            if task['key'] not in self.task_rows:
+                self.task_rows[task['key']] = self.create_task_row(task['key'])
+            self.update_task_row(task)
+        frames = [self.task_rows[task['key']].frame for task in tasks]
+        if [frame for frame in self.scrollable_frame.pack_slaves() if frame is not self.objection_frame] != frames:
+            # New rows are packed last; put them, and the mini checklist, in their place.
+            for frame in frames:
+                frame.pack_forget()
+                frame.pack(fill=tk.X, pady=5)
+            self.objection_row = None
+        self.update_objection_subchecklist()
     
-            # Special handling for Objection task in Sales or Support (Start Call).
-            if ct in ["sales", "support"] and cl == "start call" and task['text'] == "Objection":
-                style_val = 'Accent.TButton'
-                if (self.objection_subchecklist_data is not None and all(item['done'] for item in self.objection_subchecklist_data)):
-                    style_val = 'Completed.TButton'
-                task_btn = ttk.Button(frame, text=task['text'],
-                                      command=lambda i=i: self.open_objection_subchecklist(), style=style_val)
-            else:
-                btn_style = 'Completed.TButton' if task['done'] else 'Accent.TButton'
-                task_btn = ttk.Button(frame, text=task['text'],
-                                      command=lambda i=i: self.toggle_task(i), style=btn_style)
-            task_btn.pack(side=tk.LEFT, fill=tk.X, expand=True)
+    def create_task_row(self, key):
+        # One row: a button to toggle done, an edit and a delete button.
+        frame = ttk.Frame(self.scrollable_frame, style='Custom.TFrame')
+        frame.pack(fill=tk.X, pady=5)
+        row = TaskRow(frame, None, key)
+        
+        # The buttons act on the row's task, whatever its position (or key) by then.
+        # Objection rows open the mini sub-checklist instead (see toggle_task).
+        row.button = ttk.Button(frame, command=lambda: self.toggle_task(row.key))
+        row.button.pack(side=tk.LEFT, fill=tk.X, expand=True)
     
-            edit_btn = ttk.Button(frame, text="✏️", command=lambda i=i: self.edit_task(i))
-            edit_btn.pack(side=tk.LEFT, padx=5)
-            edit_btn.config(width=2)
+        edit_btn = ttk.Button(frame, text="✏️", command=lambda: self.edit_task(row.key))
+        edit_btn.pack(side=tk.LEFT, padx=5)
+        edit_btn.config(width=2)
     
-            delete_btn = ttk.Button(frame, text="🗑️", command=lambda i=i: self.delete_task(i))
-            delete_btn.pack(side=tk.LEFT, padx=5)
-            delete_btn.config(width=2)
+        delete_btn = ttk.Button(frame, text="🗑️", command=lambda: self.delete_task(row.key))
+        delete_btn.pack(side=tk.LEFT, padx=5)
+        delete_btn.config(width=2)
+        return row
+    
+    def update_task_row(self, task):
+        # Reconfigure the task's row only where it differs from the task.
+        row = self.task_rows[task['key']]
+        if self.is_objection(task):
+            # Special handling for Objection task in Sales or Support (Start Call).
+            done = (self.objection_subchecklist_data is not None
+                    and all(item['done'] for item in self.objection_subchecklist_data))
+        else:
+            done = task['done']
+        style = 'Completed.TButton' if done else 'Accent.TButton'
+        if row.text != task['text']:
+            row.button.config(text=task['text'])
+            row.text = task['text']
+        if row.style != style:
+            row.button.config(style=style)
+            row.style = style
     
-            # If this is an Objection row and a mini sub-checklist exists, render it.
-            if ct in ["sales", "support"] and cl == "start call" and task['text'] == "Objection" and self.objection_subchecklist_data is not None:
-                self.render_objection_subchecklist(scrollable_frame)
+    def is_objection(self, task):
+        return (self.current_call_type in ["sales", "support"] and self.current_checklist_type == "start call"
+                and task['text'] == "Objection")
     
-    def toggle_task(self, task_idx):
+    def toggle_task(self, key):
         ct = self.current_call_type
         cl = self.current_checklist_type
+        task_idx = self.find_task(ct, cl, key)
+        task = self.checklists[ct][cl]['tasks'][task_idx]
         # For Sales or Support, Start Call Objection tasks trigger the mini sub-checklist.
-        if ct in ["sales", "support"] and cl == "start call" and self.checklists[ct][cl]['tasks'][task_idx]['text'] == "Objection":
+        if ct in ["sales", "support"] and cl == "start call" and task['text'] == "Objection":
             self.open_objection_subchecklist()
             return
         else:
-            self.checklists[ct][cl]['tasks'][task_idx]['done'] = not self.checklists[ct][cl]['tasks'][task_idx]['done']
-            self.save_data()
-            self.display_tasks()
+            self.apply_change('set_done', index=task_idx, done=not task['done'])
+            self.update_task_row(task)
     
-    def edit_task(self, task_idx):
+    def edit_task(self, key):
         ct = self.current_call_type
         cl = self.current_checklist_type
+        task_idx = self.find_task(ct, cl, key)
         task = self.checklists[ct][cl]['tasks'][task_idx]
         new_text = simpledialog.askstring("Edit Task", "Edit the task:", initialvalue=task['text'])
-        if new_text is not None and new_text.strip() != "":
-            task['text'] = new_text.strip()
-            self.save_data()
+        # The dialog runs the event loop, so a sync may have moved the task meanwhile
+        task_idx = self.find_task(ct, cl, task['key'])
+        if new_text is not None and new_text.strip() != "" and task_idx is not None:
+            self.apply_change('edit', index=task_idx, text=new_text.strip())
             self.display_tasks()
     
-    def delete_task(self, task_idx):
-        ct = self.current_call_type
-        cl = self.current_checklist_type
-        del self.checklists[ct][cl]['tasks'][task_idx]
-        self.save_data()
+    def delete_task(self, key):
+        self.apply_change('delete', index=self.find_task(self.current_call_type, self.current_checklist_type, key))
         self.display_tasks()
     
     def open_objection_subchecklist(self):
@@ -393,23 +869,44 @@ class ChecklistApp:
                 {'text': 'Address the Objection', 'done': False},
                 {'text': 'Confirm & Close', 'done': False}
             ]
-        # Refresh to show the objection sub-checklist
-        self.display_tasks()
+        # Show the objection sub-checklist
+        self.update_objection_subchecklist()
     
-    def render_objection_subchecklist(self, parent):
-        # Render the mini objection checklist vertically.
-        sub_frame = ttk.Frame(parent, style='Custom.TFrame')
-        sub_frame.pack(fill=tk.X, padx=20, pady=(0, 5))
-        for idx, subtask in enumerate(self.objection_subchecklist_data):
-            btn_style = 'Completed.TButton' if subtask['done'] else 'Accent.TButton'
-            btn = ttk.Button(sub_frame, text=subtask['text'], style=btn_style,
-                             command=lambda i=idx: self.toggle_objection_item(i))
-            btn.pack(fill=tk.X, padx=5, pady=2)
+    def update_objection_subchecklist(self):
+        # Keep the mini objection checklist under the first Objection row, creating
+        # its buttons once and afterwards only restyling the ones that changed.
+        tasks = self.checklists[self.current_call_type][self.current_checklist_type]['tasks']
+        task = next((task for task in tasks if self.is_objection(task)), None)
+        if task is None or self.objection_subchecklist_data is None:
+            if self.objection_frame is not None:
+                self.objection_frame.destroy()
+            self.objection_frame = None
+            self.objection_buttons = []
+            self.objection_row = None
+            return
+        if self.objection_frame is None:
+            self.objection_frame = ttk.Frame(self.scrollable_frame, style='Custom.TFrame')
+            for idx, subtask in enumerate(self.objection_subchecklist_data):
+                btn = ttk.Button(self.objection_frame, text=subtask['text'],
+                                 command=lambda i=idx: self.toggle_objection_item(i))
+                btn.pack(fill=tk.X, padx=5, pady=2)
+                self.objection_buttons.append(TaskRow(self.objection_frame, btn))
+        row = self.task_rows[task['key']]
+        if row is not self.objection_row:
+            # Render the mini objection checklist vertically, right under its row.
+            self.objection_frame.pack(fill=tk.X, padx=20, pady=(0, 5), after=row.frame)
+            self.objection_row = row
+        for row, subtask in zip(self.objection_buttons, self.objection_subchecklist_data):
+            style = 'Completed.TButton' if subtask['done'] else 'Accent.TButton'
+            if row.style != style:
+                row.button.config(style=style)
+                row.style = style
+        self.update_task_row(task)
     
     def toggle_objection_item(self, index):
         # Toggle the mini sub-checklist item.
         self.objection_subchecklist_data[index]['done'] = not self.objection_subchecklist_data[index]['done']
-        self.display_tasks()
+        self.update_objection_subchecklist()
 
     def get_support_start_call_tasks(self):
         """
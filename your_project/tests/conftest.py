@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a temporary database.
+
+    Tests push an app context only around their own database work: requests
+    made while one is pushed would share its g, and with it the logged-in user.
+    """
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        # Cheap hashes keep logins fast
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'PASSWORD_HASH_WORKERS': 0,
+        'TESTING': True,
+    })
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+    app.extensions['password_hasher'].shutdown()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def agent(app, client):
+    """A registered agent, logged in on ``client``; returns the user id."""
+    from models import User
+    client.post('/register', data={'username': 'agent', 'password': 'secret'})
+    client.post('/login', data={'username': 'agent', 'password': 'secret'})
+    with app.app_context():
+        return db.session.scalar(db.select(User.id).filter_by(username='agent'))
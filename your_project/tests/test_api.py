@@ -0,0 +1,47 @@
+from extensions import db
+from models import CallSession, ItemStat, Task, TemplateItem
+from services import provision_template
+
+URL = '/api/checklist/sales/start call/tasks'
+
+
+def test_item_toggle_flips_its_bit_on_the_current_call(app, client, agent):
+    with app.app_context():
+        template = provision_template('sales', 'start call')
+        db.session.commit()
+        item_id = db.session.scalar(db.select(TemplateItem.id).filter_by(template_id=template.id, position=2))
+
+    assert client.post(f'/api/items/{item_id}/toggle').json == {'id': item_id, 'done': True}
+    with app.app_context():
+        assert db.session.scalar(db.select(CallSession.done_mask).filter_by(user_id=agent)) == 0b100
+        assert db.session.scalar(db.select(ItemStat.done).filter_by(user_id=agent, position=2)) == 1
+
+    assert client.post(f'/api/items/{item_id}/toggle').json == {'id': item_id, 'done': False}
+    with app.app_context():
+        assert db.session.scalar(db.select(CallSession.done_mask).filter_by(user_id=agent)) == 0
+        assert db.session.scalar(db.select(ItemStat.done).filter_by(user_id=agent, position=2)) == 0
+    assert client.post('/api/items/999999/toggle').status_code == 404
+
+
+def test_task_toggle_flips_the_agents_own_task(app, client, agent):
+    task_id = client.post(URL, json={'text': 'Follow up'}).json['id']
+
+    assert client.post(f'/api/tasks/{task_id}/toggle').json == {'id': task_id, 'done': True}
+    assert client.post(f'/api/tasks/{task_id}/toggle').json == {'id': task_id, 'done': False}
+    assert client.post('/api/tasks/999999/toggle').status_code == 404
+
+    other = app.test_client()
+    other.post('/register', data={'username': 'other', 'password': 'secret'})
+    other.post('/login', data={'username': 'other', 'password': 'secret'})
+    assert other.post(f'/api/tasks/{task_id}/toggle').status_code == 403
+    with app.app_context():
+        assert db.session.get(Task, task_id).done is False
+
+
+def test_objection_task_toggle_opens_its_sub_checklist(app, client, agent):
+    task_id = client.post(URL, json={'text': 'Objection'}).json['id']
+
+    assert client.post(f'/api/tasks/{task_id}/toggle').json == {'id': task_id, 'reload': True}
+    with app.app_context():
+        task = db.session.get(Task, task_id)
+        assert task.done is False and len(task.subtasks) == 4
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import database
+from extensions import db
+from models import User
+from passwords import PasswordHasher
+
+
+def test_register_hashes_outside_the_write_lock(app, client):
+    hasher = app.extensions['password_hasher']
+    hash_password = hasher.hash
+    held = []
+
+    def hash_and_check(password):
+        held.append(database.sqlite_write_lock.locked())
+        return hash_password(password)
+
+    hasher.hash = hash_and_check
+    response = client.post('/register', data={'username': 'agent', 'password': 'secret'})
+
+    assert response.headers['Location'] == '/login'
+    assert held == [False]
+    assert client.post('/login', data={'username': 'agent', 'password': 'secret'}).headers['Location'] == '/'
+
+
+def test_register_rejects_a_taken_username(app, client):
+    client.post('/register', data={'username': 'agent', 'password': 'secret'})
+    response = client.post('/register', data={'username': 'agent', 'password': 'other'})
+
+    assert response.headers['Location'] == '/register'
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(User)) == 1
+
+
+def test_full_hashing_pool_sheds_logins_at_once(app, client):
+    client.post('/register', data={'username': 'agent', 'password': 'secret'})
+    hasher = app.extensions['password_hasher'] = PasswordHasher('pbkdf2:sha256:1000', workers=1, queue=0)
+    release = threading.Event()
+    busy = threading.Thread(target=hasher._run, args=(release.wait,))
+    busy.start()
+    try:
+        started = time.monotonic()
+        response = client.post('/login', data={'username': 'agent', 'password': 'secret'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '2'
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        busy.join()
+    assert client.post('/login', data={'username': 'agent', 'password': 'secret'}).headers['Location'] == '/'
+
+
+def test_hashing_holds_at_most_half_the_server_threads():
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=8, queue=8, threads=10)
+    assert hasher.slots == 5
+    hasher.shutdown()
@@ -0,0 +1,16 @@
+URL = '/api/checklist/sales/start call'
+
+
+def test_malformed_ops_fail_on_their_own(client, agent):
+    task_id = client.post(f'{URL}/tasks', json={'text': 'Follow up'}).json['id']
+
+    response = client.post(f'{URL}/batch', json={'ops': [
+        {'op': 'toggle', 'id': task_id, 'done': True, 'ts': 2},
+        {'op': 'toggle', 'id': task_id, 'done': False, 'ts': 'later'},
+        {'op': 'toggle', 'id': 'x', 'done': False, 'ts': 1},
+        {'op': 'toggle', 'kind': 'item', 'id': [1], 'done': True, 'ts': 3.5},
+    ]})
+
+    assert response.status_code == 200
+    assert [result['ok'] for result in response.json['results']] == [True, False, False, False]
+    assert response.json['results'][0]['done'] is True
@@ -0,0 +1,44 @@
+from compaction import Compactor
+from extensions import db
+from models import Task
+
+URL = '/api/checklist/sales/start call/tasks'
+
+
+def add_objection(client):
+    task_id = client.post(URL, json={'text': 'Objection'}).json['id']
+    client.get(f'/toggle_task/{task_id}')  # creates its sub-checklist
+    return task_id
+
+
+def test_objections_added_during_a_call_are_kept(app, client, agent):
+    first, second = add_objection(client), add_objection(client)
+
+    with app.app_context():
+        counts = Compactor(pause=0).run()
+        assert counts['objections merged'] == 0 and counts['subtasks deduplicated'] == 0
+        assert db.session.get(Task, first) is not None
+        subtask_ids = [task.id for task in db.session.get(Task, second).subtasks]
+    assert len(subtask_ids) == 4
+    assert client.post(f'/api/tasks/{subtask_ids[0]}/toggle').json['done'] is True
+
+
+def test_legacy_duplicate_objections_are_merged(app, agent):
+    with app.app_context():
+        def legacy(text, parent=None):
+            task = Task(user_id=agent, call_type='sales', checklist_type='start call', text=text,
+                        parent_task_id=parent)
+            db.session.add(task)
+            db.session.flush()
+            return task.id
+
+        kept, duplicate = legacy('Objection'), legacy('Objection')
+        for parent in (kept, duplicate):
+            legacy('Acknowledge', parent)
+        db.session.commit()
+
+        counts = Compactor(pause=0).run()
+
+        assert counts['objections merged'] == 1 and counts['subtasks deduplicated'] == 1
+        assert db.session.get(Task, duplicate) is None
+        assert [task.text for task in db.session.get(Task, kept).subtasks] == ['Acknowledge']
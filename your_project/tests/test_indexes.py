@@ -0,0 +1,61 @@
+from sqlalchemy import event
+
+from extensions import db
+from models import CallSession, ChecklistTemplate
+from services import current_call_session, latest_call_session, load_checklist, provision_template
+
+
+def query_plans(app, run):
+    """The query plan of each SELECT that ``run`` makes, with its parameters."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            run()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        connection = db.session.connection().connection.dbapi_connection
+        return {statement: " ".join(row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + statement,
+                                                                          parameters))
+                for statement, parameters in statements}
+
+
+def plan_of(plans, table):
+    return next(plan for statement, plan in plans.items() if f"FROM {table}" in statement)
+
+
+def test_call_lookup_uses_its_index(app, agent):
+    with app.app_context():
+        template = provision_template('sales', 'start call')
+        current_call_session(agent, template)
+        db.session.commit()
+        template_id = template.id
+
+    plans = query_plans(app, lambda: latest_call_session(agent, template_id))
+    assert 'ix_call_session_template' in plan_of(plans, 'call_session')
+
+
+def test_checklist_tasks_load_by_call(app, agent):
+    with app.app_context():
+        template = provision_template('sales', 'start call')
+        call_session = current_call_session(agent, template)
+        db.session.commit()
+        ids = template.id, call_session.id
+
+    def load():
+        load_checklist(db.session.get(ChecklistTemplate, ids[0]), db.session.get(CallSession, ids[1]))
+
+    plans = query_plans(app, load)
+    assert 'ix_task_session_id' in plan_of(plans, 'task')
+
+
+def test_subtask_lookup_uses_parent_index(app):
+    with app.app_context():
+        rows = db.session.execute(db.text("EXPLAIN QUERY PLAN SELECT id FROM task WHERE parent_task_id = :parent"),
+                                  {'parent': 1}).all()
+    assert 'ix_task_parent_task_id' in " ".join(row[-1] for row in rows)
@@ -0,0 +1,76 @@
+import asyncio
+
+from extensions import db
+from live import asgi_app
+from models import ChecklistTemplate, TemplateItem
+
+
+def request(path, cookie, method='GET'):
+    return {'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+             'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+             'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+             'server': ('localhost', 80), 'client': ('127.0.0.1', 1234)}
+
+
+def test_open_streams_hold_no_threads(app, client, agent):
+    app.config.update(LIVE_COALESCE_SECONDS=0.05, LIVE_HEARTBEAT_SECONDS=1)
+    client.get('/checklist/sales/start call')
+    cookie = f"session={client.get_cookie('session').value}"
+    with app.app_context():
+        item_id = db.session.scalar(db.select(TemplateItem.id).join(ChecklistTemplate).where(
+            ChecklistTemplate.call_type == 'sales', TemplateItem.position == 0))
+    application = asgi_app(app, threads=2)
+
+    async def run():
+        closed = asyncio.Event()
+        bodies = [[] for _ in range(20)]
+
+        async def open_stream(body):
+            async def receive():
+                await closed.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                body.append(message.get('body', b'') if message['type'] == 'http.response.body' else b'')
+
+            await application(request('/checklist/sales/start call/events', cookie), receive, send)
+
+        async def toggle():
+            sent = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                sent.append(message)
+
+            await application(request(f'/api/items/{item_id}/toggle', cookie, 'POST'), receive, send)
+            return sent[0]['status']
+
+        streams = [asyncio.ensure_future(open_stream(body)) for body in bodies]
+        while not all(b'retry' in b''.join(body) for body in bodies):
+            await asyncio.sleep(0.01)
+        # 20 open streams, 2 threads: a click still gets one
+        assert await asyncio.wait_for(toggle(), 5) == 200
+        async with asyncio.timeout(5):
+            while not all(b'data:' in b''.join(body) for body in bodies):
+                await asyncio.sleep(0.01)
+        closed.set()
+        await asyncio.wait_for(asyncio.gather(*streams), 5)
+
+    asyncio.run(run())
+    assert app.extensions['broker'].stats()['subscribers'] == 0
+
+
+def test_streams_need_a_login(app):
+    application = asgi_app(app, threads=2)
+    sent = []
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(request('/checklist/sales/start call/events', ''), receive, send))
+    assert sent[0]['status'] == 302
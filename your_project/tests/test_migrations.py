@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_mock_engine
+from werkzeug.security import generate_password_hash
+
+import migrations
+from app import create_app
+from extensions import db
+from models import CallSession, ChecklistTemplate, Task, TemplateItem
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_workers_starting_together_upgrade_once(tmp_path):
+    path = tmp_path / 'boot.db'
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    workers = [subprocess.Popen([sys.executable, '-c', 'from app import create_app; create_app()'],
+                                cwd=PROJECT, env=env, stderr=subprocess.PIPE) for _ in range(6)]
+    failures = [worker.stderr.read().decode() for worker in workers if worker.wait()]
+    assert failures == []
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT version FROM schema_version").fetchall() == [(migrations.HEAD,)]
+
+
+# The schema and rows of the app before call sessions and shared templates
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL, username VARCHAR(150) NOT NULL, password_hash VARCHAR(150) NOT NULL,
+    PRIMARY KEY (id), UNIQUE (username)
+);
+CREATE TABLE task (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, call_type VARCHAR(50) NOT NULL,
+    checklist_type VARCHAR(50) NOT NULL, text VARCHAR(250) NOT NULL, done BOOLEAN,
+    parent_task_id INTEGER, created_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id),
+    FOREIGN KEY(parent_task_id) REFERENCES task (id)
+);
+"""
+
+
+def test_legacy_tasks_move_to_a_first_call(tmp_path):
+    from defaults import DEFAULT_TASKS
+    path = tmp_path / 'baseline.db'
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.execute("INSERT INTO user VALUES (1, 'danny', ?)",
+                     (generate_password_hash('secret', 'pbkdf2:sha256:1000'),))
+
+        def legacy(text, done=False, parent=None):
+            return conn.execute(
+                "INSERT INTO task (user_id, call_type, checklist_type, text, done, parent_task_id, created_at) "
+                "VALUES (1, 'sales', 'start call', ?, ?, ?, '2025-02-06 05:53:44.794706')", (text, done, parent)
+            ).lastrowid
+
+        # The copied defaults, less the one the agent deleted; one is ticked
+        defaults = [task['text'] for task in DEFAULT_TASKS['sales', 'start call']]
+        for position, text in enumerate(defaults):
+            if position != 3:
+                legacy(text, done=position == 1)
+        legacy('My custom legacy task', done=True)
+        objection = legacy('Objection')
+        legacy('Listen & Acknowledge', done=True, parent=objection)
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'TESTING': True})
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(Task)
+                                 .where(Task.session_id.is_(None))) == 0
+        call_session = db.session.scalars(db.select(CallSession)).one()
+        template = db.session.scalars(db.select(ChecklistTemplate)).one()
+        positions = {item.text: item.position for item in db.session.scalars(
+            db.select(TemplateItem).filter_by(template_id=template.id, parent_id=None))}
+        assert call_session.done_mask == 1 << positions[defaults[1]]
+        assert call_session.is_hidden(positions[defaults[3]])
+        tasks = {task.text: task for task in db.session.scalars(db.select(Task))}
+        assert set(tasks) == {'My custom legacy task', 'Objection', 'Listen & Acknowledge'}
+        assert tasks['Listen & Acknowledge'].parent_task_id == tasks['Objection'].id
+        assert all(task.session_id == call_session.id for task in tasks.values())
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'danny', 'password': 'secret'})
+    page = client.get('/checklist/sales/start call').get_data(as_text=True)
+    assert 'My custom legacy task' in page
+    assert defaults[3] not in page
+    with app.app_context():
+        db.engine.dispose()
+    app.extensions['password_hasher'].shutdown()
+
+
+@pytest.mark.parametrize('url, statements', [
+    ('postgresql://', ['ALTER TABLE "user" ALTER COLUMN password_hash TYPE VARCHAR(255)']),
+    ('mysql://', ['ALTER TABLE user MODIFY password_hash VARCHAR(255) NOT NULL']),
+    # SQLite does not enforce lengths
+    ('sqlite://', []),
+])
+def test_password_hash_column_fits_scrypt_hashes(url, statements):
+    executed = []
+    engine = create_mock_engine(url, lambda sql, *args, **kwargs: executed.append(str(sql)))
+    migrations._password_hash_length(engine)
+    assert executed == statements
+    assert len(generate_password_hash('secret', 'scrypt')) <= 255
@@ -0,0 +1,36 @@
+from flask import g, request_tearing_down
+
+URL = '/checklist/sales/start call'
+# SQL statements for a render whose task rows are not cached yet, however
+# many tasks have subtasks
+BUDGET = 5
+
+
+def statements_per_render(app, client):
+    counts = []
+
+    def count(sender, **extra):
+        counts.append(g.sql_statements)
+
+    client.get(URL)  # warms the user and template caches
+    app.extensions['fragment_cache'].clear()
+    with request_tearing_down.connected_to(count, app):
+        assert client.get(URL).status_code == 200
+    return counts[0]
+
+
+def add_objections(client, number):
+    for _ in range(number):
+        task_id = client.post('/api/checklist/sales/start call/tasks', json={'text': 'Objection'}).json['id']
+        client.get(f'/toggle_task/{task_id}')  # creates its sub-checklist
+
+
+def test_checklist_render_stays_within_budget(app, client, agent):
+    add_objections(client, 1)
+    few = statements_per_render(app, client)
+    add_objections(client, 5)
+    many = statements_per_render(app, client)
+
+    assert few <= BUDGET
+    # Subtasks are loaded together, not per task
+    assert many == few
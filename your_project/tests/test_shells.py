@@ -0,0 +1,31 @@
+from flask import Flask
+
+from app import render_digest, static_file_hash
+
+
+def test_menu_shells_can_be_shared(client, agent):
+    anonymous = client.application.test_client()
+    for page_client in (anonymous, client):
+        for path in ('/', '/call/sales'):
+            response = page_client.get(path)
+            assert response.status_code == 200
+            assert response.cache_control.public and not response.cache_control.private
+            assert 'Cookie' not in response.vary
+            assert 'Set-Cookie' not in response.headers
+
+    assert anonymous.get('/session-bar').json == {'login': '/login'}
+    assert set(client.get('/session-bar').json) == {'nav', 'flashes'}
+
+
+def test_render_version_follows_static_assets(tmp_path):
+    (tmp_path / 'templates').mkdir()
+    (tmp_path / 'templates' / 'page.html').write_text('<script src="app.js"></script>')
+    (tmp_path / 'static').mkdir()
+    script = tmp_path / 'static' / 'app.js'
+    script.write_text('one')
+    app = Flask('digest', root_path=str(tmp_path))
+    before = render_digest(app)
+
+    script.write_text('two')
+    static_file_hash.cache_clear()
+    assert render_digest(app) != before
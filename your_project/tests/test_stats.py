@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy.dialects import mysql
+
+import stats
+from extensions import db
+
+
+def increments(app, monkeypatch, dialect_name):
+    """The statements record_call_started runs as if on ``dialect_name``."""
+    executed = []
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'name', dialect_name)
+        monkeypatch.setattr(db.session, 'execute', executed.append)
+        stats.record_call_started(1, 2)
+    return executed
+
+
+def test_mysql_counters_upsert_on_the_primary_key(app, monkeypatch):
+    [statement] = increments(app, monkeypatch, 'mysql')
+    sql = str(statement.compile(dialect=mysql.dialect()))
+    assert sql.startswith('INSERT INTO call_stat (user_id, template_id, calls)')
+    assert sql.endswith('ON DUPLICATE KEY UPDATE calls = (call_stat.calls + %s)')
+
+
+def test_unknown_dialects_are_refused(app, monkeypatch):
+    with pytest.raises(NotImplementedError):
+        increments(app, monkeypatch, 'mssql')
@@ -0,0 +1,18 @@
+from extensions import db
+from models import User
+
+
+def set_role(app, user_id, value):
+    # As the CLI does from another process: this app's user cache is left alone
+    with app.app_context():
+        db.session.execute(db.update(User).where(User.id == user_id).values(is_supervisor=value))
+        db.session.commit()
+
+
+def test_role_changes_hold_before_the_user_cache_expires(app, client, agent):
+    assert client.get('/supervisor').status_code == 403
+    set_role(app, agent, True)
+    assert client.get('/supervisor').status_code == 200
+    set_role(app, agent, False)
+    assert client.get('/supervisor').status_code == 403
+    assert client.get('/supervisor/export/calls.csv').status_code == 403
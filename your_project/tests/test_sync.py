@@ -0,0 +1,39 @@
+import sync
+from extensions import db
+from models import CallSession
+
+NAME = 'sales/start call'
+
+
+def test_malformed_changes_are_rejected(client, agent):
+    for op in ({'op': 'set_done', 'key': '', 'done': True},
+               {'op': 'set_done', 'done': True},
+               {'op': 'set_done', 'key': 'i1', 'done': True, 'ts': 'soon'},
+               {'op': 'set_done', 'key': 'i1', 'done': True, 'ts': [1]}):
+        response = client.post('/api/sync', json={'cursor': 0, 'changes': {NAME: [op]}})
+        assert response.status_code == 400, op
+
+
+def test_sync_returns_changes_of_others_only(app, client, agent, monkeypatch):
+    cursor = client.post('/api/sync', json={'cursor': 0, 'changes': {NAME: []}}).json['cursor']
+
+    # Another writer commits between this request's commit and its cursor
+    end = sync.Window.end
+
+    def commit_another_change(window):
+        call_session = db.session.scalars(db.select(CallSession).order_by(CallSession.id.desc())).first()
+        sync.record_change(call_session.id, position=2)
+        db.session.commit()
+        return end(window)
+
+    monkeypatch.setattr(sync.Window, 'end', commit_another_change)
+    response = client.post('/api/sync', json={'cursor': cursor, 'changes': {
+        NAME: [{'op': 'set_done', 'key': 'i1', 'done': True, 'ts': 1}],
+    }})
+
+    assert response.status_code == 200
+    assert list(response.json['checklists'][NAME]['tasks']) == ['i2']
+    monkeypatch.undo()
+    # The next sync starts past both changes
+    again = client.post('/api/sync', json={'cursor': response.json['cursor'], 'changes': {}})
+    assert again.json['checklists'] == {}
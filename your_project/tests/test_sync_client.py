@@ -0,0 +1,63 @@
+import importlib.util
+import os
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from extensions import db
+from models import Task, TemplateItem
+
+NAME = 'sales/start call'
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'example.py')
+
+
+@pytest.fixture
+def example():
+    pytest.importorskip('tkinter')
+    spec = importlib.util.spec_from_file_location('example', EXAMPLE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def server(app):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    thread.join()
+
+
+def test_desktop_client_syncs_with_the_server(app, client, agent, example, server, tmp_path):
+    client.get('/checklist/sales/start call')
+    with app.app_context():
+        item = db.session.scalars(db.select(TemplateItem).filter_by(parent_id=None)
+                                  .order_by(TemplateItem.position)).first()
+        item_id, item_key = item.id, f"i{item.position}"
+    worker = example.SyncWorker(server, 'agent', 'secret', str(tmp_path / 'sync.json'))
+    assert worker.sync_once()
+    worker.inbox.get_nowait()
+
+    # A task added offline gets its server key
+    local = example.local_key()
+    worker.record('sales', 'start call', {'op': 'add', 'key': local, 'text': 'Call back', 'done': False})
+    assert worker.sync_once()
+    reply = worker.inbox.get_nowait()
+    server_key = reply['keys'][local]
+    with app.app_context():
+        assert db.session.get(Task, int(server_key[1:])).text == 'Call back'
+
+    # The web page ticks an item: the client gets it on its next sync
+    assert client.post(f'/api/items/{item_id}/toggle').json['done'] is True
+    assert worker.sync_once()
+    assert worker.inbox.get_nowait()['checklists'][NAME]['tasks'] == {item_key: {'done': True}}
+
+    # A new call started on the web resets the client's checklist
+    client.get('/new_call/sales/start call')
+    assert worker.sync_once()
+    assert worker.inbox.get_nowait()['checklists'][NAME]['reset'] is True
+    assert worker.sync_once()
+    assert worker.inbox.get_nowait()['checklists'] == {}
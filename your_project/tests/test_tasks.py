@@ -0,0 +1,31 @@
+from extensions import db
+from models import Task
+from services import current_call_session, delete_custom_task, provision_template
+
+DEPTH = 30
+
+
+def test_deleting_a_task_removes_its_whole_tree(app, agent):
+    with app.app_context():
+        # The cascade is the database's, so it needs foreign keys enforced
+        assert db.session.execute(db.text('PRAGMA foreign_keys')).scalar() == 1
+        call_session = current_call_session(agent, provision_template('sales', 'start call'))
+
+        def add(parent, text):
+            task = Task(user_id=agent, call_type='sales', checklist_type='start call',
+                        session_id=call_session.id, text=text, parent_task_id=parent)
+            db.session.add(task)
+            db.session.flush()
+            return task.id
+
+        kept = add(None, 'Other task')
+        root = parent = add(None, 'Root')
+        for depth in range(1, DEPTH):
+            add(parent, f"Leaf {depth}")
+            parent = add(parent, f"Level {depth}")
+        db.session.commit()
+
+        delete_custom_task(db.session.get(Task, root))
+        db.session.commit()
+
+        assert db.session.scalars(db.select(Task.id)).all() == [kept]
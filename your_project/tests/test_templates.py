@@ -0,0 +1,57 @@
+import threading
+
+from extensions import db
+from models import CallSession, ChecklistTemplate, TemplateItem, User
+from services import provision_template
+
+
+def test_concurrent_first_visits_create_one_template(app):
+    clients = []
+    for i in range(16):
+        client = app.test_client()
+        client.post('/register', data={'username': f'agent{i}', 'password': 'secret'})
+        client.post('/login', data={'username': f'agent{i}', 'password': 'secret'})
+        clients.append(client)
+    start = threading.Barrier(len(clients))
+    statuses = []
+
+    def visit(client):
+        start.wait()
+        statuses.append(client.get('/checklist/sales/start call').status_code)
+
+    threads = [threading.Thread(target=visit, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * len(clients)
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(ChecklistTemplate)) == 1
+        assert db.session.scalar(db.select(db.func.count()).select_from(TemplateItem)) > 0
+
+
+def test_provisioning_keeps_the_callers_uncommitted_writes(app):
+    with app.test_request_context():
+        db.session.add(User(username='added', password_hash='x'))
+        db.session.execute(db.insert(User).values(username='inserted', password_hash='x'))
+        provision_template('sales', 'start call')
+        db.session.commit()
+
+    with app.app_context():
+        assert set(db.session.scalars(db.select(User.username))) == {'added', 'inserted'}
+
+
+def test_unknown_checklists_are_not_found(app, client, agent):
+    for method, path in (('GET', '/call/junk1'),
+                         ('GET', '/checklist/junk1/whatever'),
+                         ('GET', '/checklist/sales/whatever/rows'),
+                         ('POST', '/add_task/junk1/start call'),
+                         ('POST', '/api/checklist/junk1/voicemail/tasks'),
+                         ('POST', '/api/checklist/sales/junk2/batch'),
+                         ('GET', '/new_call/junk1/voicemail')):
+        assert client.open(path, method=method, json={'text': 'x', 'ops': []}).status_code == 404, path
+
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(ChecklistTemplate)) == 0
+        assert db.session.scalar(db.select(db.func.count()).select_from(CallSession)) == 0